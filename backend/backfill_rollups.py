@@ -0,0 +1,23 @@
+from server import db, rebuild_rollups
+
+def backfill_rollups():
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    
+    print("📈 Rebuilding analytics rollups from history...")
+    
+    try:
+        # One write transaction so /admin/analytics never sees a half-built table
+        cursor.execute('BEGIN IMMEDIATE')
+        rows = rebuild_rollups(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    print(f"✅ Wrote {rows} rollup rows")
+
+if __name__ == "__main__":
+    backfill_rollups()
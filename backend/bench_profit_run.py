@@ -0,0 +1,366 @@
+"""Benchmark and regression gate for the daily profit run.
+
+For each size, builds a database with that many active investments (spread over every day of
+the 42-day term, so about 1/42 of them mature during the run), then runs process_daily_profits
+in a fresh process the way the scheduler would, on the event loop, and records:
+
+  * wall time of the run
+  * peak RSS of the process
+  * the longest time another connection had to wait for the write lock
+  * latency of API requests issued while the run was in progress
+
+Results are written as JSON and compared with a stored baseline; the exit status is 1 when
+any metric is worse than the baseline by more than --threshold, or when a measured size has no
+baseline to compare against (unless --allow-missing-baseline). --max-api-p99-ms adds an absolute
+ceiling on API p99 during the run that applies with or without a baseline. It is off by default
+because process_daily_profits still runs on the event loop, so p99 grows with the batch (about
+5 s at 100k investments); set it once the run yields the loop.
+
+    python bench_profit_run.py                                   # 10k, 100k
+    python bench_profit_run.py --sizes 1000000 --allow-missing-baseline
+    python bench_profit_run.py --update-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+# 1M is opt-in: building it takes minutes, and with the run holding the loop only one or two
+# API probes land during it, so its p99 is too noisy to gate on
+DEFAULT_SIZES = "10000,100000"
+DEFAULT_OUTPUT = ROOT_DIR / "benchmarks" / "profit_run.json"
+DEFAULT_BASELINE = ROOT_DIR / "benchmarks" / "profit_run_baseline.json"
+INVESTMENTS_PER_USER = 2
+BUILD_BATCH = 100000
+PROBE_INTERVAL = 0.02
+# metric -> smallest absolute increase that counts, so tiny runs don't fail on noise
+GATED_METRICS = {
+    "wall_seconds": 0.05,
+    "peak_rss_mb": 10,
+    "max_lock_hold_seconds": 0.05,
+    "api_p99_ms": 50,
+}
+
+
+def child_env(db_path):
+    env = dict(os.environ)
+    env.update({
+        "FLEXINVEST_DB_PATH": str(db_path),
+        # Completion emails fail fast instead of reaching a real server
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": "9",
+        "SMTP_START_TLS": "false",
+        "LOG_LEVEL": "CRITICAL",
+        "SLOW_QUERY_MS": "600000",
+        "LOOP_LAG_MONITOR": "false",
+    })
+    return env
+
+
+def run_child(args, db_path):
+    """Run this script in a fresh interpreter and return the JSON it prints last"""
+    result = subprocess.run(
+        [sys.executable, __file__, *args, "--db", str(db_path)],
+        env=child_env(db_path), cwd=ROOT_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# ---- child: build a database with N active investments ----
+
+def build_database(size):
+    from generate_dataset import INSERTS
+    from seed import hash_password
+    from server import db, INVESTMENT_PACKAGES, rebuild_stats_counters
+
+    now = datetime.now(timezone.utc)
+    password = hash_password("Password0!")
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA synchronous = OFF")
+
+    started = time.perf_counter()
+    for start in range(0, size, BUILD_BATCH):
+        users, wallets, investments = [], [], []
+        for index in range(start, min(size, start + BUILD_BATCH)):
+            if index % INVESTMENTS_PER_USER == 0:
+                user_id = str(uuid.uuid4())
+                created = (now - timedelta(days=60)).isoformat()
+                users.append((user_id, f"bench{index}@example.com", password, f"Bench User {index}", "08000000000", True, created))
+                wallets.append((str(uuid.uuid4()), user_id, 0.0, created))
+            package = INVESTMENT_PACKAGES[index % len(INVESTMENT_PACKAGES)]
+            days = index % package["duration"]
+            begun = now - timedelta(days=days)
+            investments.append((
+                str(uuid.uuid4()), user_id, package["id"], package["capital"], package["daily_profit"],
+                package["duration"], package["total_return"], days, days * package["daily_profit"], "active",
+                begun.isoformat(), (begun + timedelta(days=package["duration"])).isoformat(), begun.isoformat()
+            ))
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.executemany(INSERTS["users"], users)
+        cursor.executemany(INSERTS["wallets"], wallets)
+        cursor.executemany(INSERTS["investments"], investments)
+        conn.commit()
+
+    cursor.execute("BEGIN IMMEDIATE")
+    rebuild_stats_counters(cursor)
+    conn.commit()
+    conn.close()
+    return {"investments": size, "build_seconds": round(time.perf_counter() - started, 3)}
+
+
+# ---- child: run and measure one profit run ----
+
+class LockProbe(threading.Thread):
+    """Repeatedly takes and releases the write lock from its own connection; the longest
+    wait is how long the profit run kept every other writer out"""
+
+    def __init__(self, db_path):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.stopped = threading.Event()
+        self.max_wait = 0.0
+        self.attempts = 0
+
+    def run(self):
+        import sqlite3
+        conn = sqlite3.connect(self.db_path, timeout=3600, isolation_level=None)
+        while not self.stopped.is_set():
+            started = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            self.max_wait = max(self.max_wait, time.perf_counter() - started)
+            conn.execute("COMMIT")
+            self.attempts += 1
+            self.stopped.wait(PROBE_INTERVAL)
+        conn.close()
+
+
+class ApiProbe(threading.Thread):
+    """Issues requests against the served app from outside its event loop, the way a client
+    would, so requests that arrive while the loop is busy queue up and show as latency"""
+
+    def __init__(self, base_url):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.stopped = threading.Event()
+        self.requests = []
+
+    def run(self):
+        import httpx
+        with httpx.Client(base_url=self.base_url, timeout=3600) as client:
+            while not self.stopped.is_set():
+                started = time.perf_counter()
+                client.get("/health/live")
+                self.requests.append((started, time.perf_counter()))
+                self.stopped.wait(PROBE_INTERVAL)
+
+    def latencies(self, begin, end):
+        """Latencies of requests in flight at any point between begin and end, sorted"""
+        return sorted(finished - started for started, finished in self.requests if finished >= begin and started <= end)
+
+
+def percentile(ordered, fraction):
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def measure_run(db_path):
+    import uvicorn
+    import server
+
+    conn = server.db.get_connection()
+    active = conn.execute("SELECT COUNT(*) FROM investments WHERE status = 'active'").fetchone()[0]
+    conn.close()
+
+    # Serve the app on this loop without its lifespan, so the scheduler doesn't also run the job
+    port = free_port()
+    web = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, lifespan="off", log_level="critical"))
+    serving = asyncio.create_task(web.serve())
+    while not web.started:
+        await asyncio.sleep(0.01)
+
+    api_probe = ApiProbe(f"http://127.0.0.1:{port}/api")
+    lock_probe = LockProbe(db_path)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    api_probe.start()
+    lock_probe.start()
+    await asyncio.sleep(0.5)
+
+    started = time.perf_counter()
+    # As the scheduler runs it: a coroutine on the application's event loop
+    await asyncio.create_task(server.process_daily_profits())
+    finished = time.perf_counter()
+    wall = finished - started
+
+    # Let requests that queued behind the run complete before stopping
+    await asyncio.sleep(0.5)
+    api_probe.stopped.set()
+    lock_probe.stopped.set()
+    await asyncio.to_thread(api_probe.join)
+    await asyncio.to_thread(lock_probe.join)
+    web.should_exit = True
+    await serving
+
+    conn = server.db.get_connection()
+    run = conn.execute("SELECT outcome, detail FROM job_runs ORDER BY id DESC LIMIT 1").fetchone()
+    conn.close()
+    if run is None or run["outcome"] != "success":
+        raise RuntimeError(f"profit run did not succeed: {dict(run) if run else None}")
+
+    ordered = api_probe.latencies(started, finished) or [0.0]
+    return {
+        "investments": active,
+        "completed": json.loads(run["detail"])["completed"],
+        "wall_seconds": round(wall, 3),
+        "investments_per_second": round(active / wall, 1) if wall else None,
+        "baseline_rss_mb": round(rss_before / 1024, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "max_lock_hold_seconds": round(lock_probe.max_wait, 3),
+        "api_requests": len(ordered),
+        "api_p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "api_p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "api_max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+# ---- parent: orchestrate, store, compare ----
+
+def ceiling_breaches(results, max_api_p99_ms):
+    """Absolute limits that hold regardless of the baseline"""
+    if not max_api_p99_ms:
+        return []
+    return [
+        f"{size} investments: api_p99_ms {result['api_p99_ms']} > {max_api_p99_ms} ceiling"
+        for size, result in results.items()
+        if result["api_p99_ms"] > max_api_p99_ms
+    ]
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for size, current in results.items():
+        previous = baseline.get(size)
+        if not previous:
+            continue
+        for metric, floor in GATED_METRICS.items():
+            before, after = previous.get(metric), current.get(metric)
+            if before is None or after is None:
+                continue
+            if after > before * (1 + threshold) and after - before > floor:
+                regressions.append(f"{size} investments: {metric} {before} -> {after} (+{(after / before - 1) * 100 if before else float('inf'):.0f}%)")
+    return regressions
+
+
+def main(args):
+    workdir = Path(args.workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    results = {}
+
+    for size in [int(size) for size in args.sizes.split(",")]:
+        template = workdir / f"profit_run_{size}.db"
+        if not template.exists() or args.rebuild:
+            template.unlink(missing_ok=True)
+            print(f"🏗️  Building {size:,} active investments...")
+            built = run_child(["--build", str(size)], template)
+            print(f"   built in {built['build_seconds']}s")
+
+        # Each run advances every investment by a day, so always start from a copy
+        scratch = workdir / f"profit_run_{size}.run.db"
+        shutil.copyfile(template, scratch)
+        print(f"⏱️  Running process_daily_profits over {size:,} investments...")
+        results[str(size)] = run_child(["--measure"], scratch)
+        scratch.unlink()
+        result = results[str(size)]
+        print(f"   {result['wall_seconds']}s wall, {result['peak_rss_mb']} MB peak RSS, "
+              f"{result['max_lock_hold_seconds']}s longest lock hold, API p99 {result['api_p99_ms']} ms "
+              f"over {result['api_requests']} requests")
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\n💾 Results written to {output}")
+
+    breaches = ceiling_breaches(results, args.max_api_p99_ms)
+    if breaches:
+        print("\n❌ Absolute ceilings exceeded:")
+        for breach in breaches:
+            print(f"   • {breach}")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        if breaches:
+            print(f"🚫 Baseline not updated: {baseline_path}")
+            return 1
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline = json.loads(baseline_path.read_text())["results"] if baseline_path.exists() else {}
+        baseline.update(results)
+        baseline_path.write_text(json.dumps({**report, "results": baseline}, indent=2))
+        print(f"📌 Baseline updated: {baseline_path}")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text())["results"] if baseline_path.exists() else {}
+    missing = [size for size in results if size not in baseline]
+    if missing:
+        print(f"\n⚠️  NO BASELINE for {', '.join(f'{int(size):,}' for size in missing)} investments in {baseline_path}: "
+              f"these sizes were not gated. Run with --update-baseline to record one.")
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ Regressions beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"   • {regression}")
+    if breaches or regressions or (missing and not args.allow_missing_baseline):
+        return 1
+    print(f"\n✅ No regressions beyond {args.threshold:.0%} against {baseline_path}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark process_daily_profits and gate regressions")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated active investment counts")
+    parser.add_argument("--workdir", default=str(Path(os.environ.get("TMPDIR", "/tmp")) / "flexinvest-bench"),
+                        help="where the generated databases are kept between runs")
+    parser.add_argument("--rebuild", action="store_true", help="regenerate databases even if present")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown, e.g. 0.2 = 20%%")
+    parser.add_argument("--update-baseline", action="store_true", help="record these results as the new baseline")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="warn instead of failing when a measured size has no baseline")
+    parser.add_argument("--max-api-p99-ms", type=float, default=0,
+                        help="fail when API p99 during the run exceeds this, baseline or not (default: off)")
+    # Internal: the per-size child processes
+    parser.add_argument("--build", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build:
+        print(json.dumps(build_database(args.build)))
+    elif args.measure:
+        print(json.dumps(asyncio.run(measure_run(args.db))))
+    else:
+        sys.exit(main(args))
@@ -0,0 +1,262 @@
+"""Fill a FlexInvest database with a large synthetic dataset for benchmarking.
+
+Builds on seed.py: the admins are seeded the same way, then users, wallets, bank accounts,
+investments at every stage of their 42-day term, deposits with proofs, withdrawals and
+complaints are bulk-inserted with executemany, one transaction per batch of users. Passwords
+come from a small pool hashed in parallel up front, so bcrypt does not dominate the run.
+Counters, analytics rollups and the search indexes are rebuilt at the end.
+
+    python generate_dataset.py --users 1000000
+    FLEXINVEST_DB_PATH=/tmp/big.db python generate_dataset.py --users 200000 --batch 20000
+"""
+import argparse
+import base64
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone, timedelta
+
+# Bulk statements here are slow by design; keep the server's slow-query log for real outliers
+os.environ.setdefault("SLOW_QUERY_MS", "60000")
+
+from seed import hash_password, simple_seed
+from server import (
+    db, DB_PATH, INVESTMENT_PACKAGES, SEARCH_INDEXES,
+    rebuild_stats_counters, rebuild_rollups, _search_index_statements
+)
+
+FIRST_NAMES = [
+    "Adaeze", "Chinedu", "Emeka", "Funmilayo", "Ibrahim", "Ngozi", "Oluwaseun", "Tunde", "Yetunde", "Zainab",
+    "Bola", "Chiamaka", "Damilola", "Efosa", "Folake", "Garba", "Halima", "Ifeanyi", "Kemi", "Musa"
+]
+LAST_NAMES = [
+    "Adeyemi", "Okafor", "Balogun", "Eze", "Mohammed", "Nwosu", "Ogunleye", "Bello", "Okonkwo", "Adebayo",
+    "Ibe", "Lawal", "Obi", "Usman", "Afolabi", "Chukwu", "Danjuma", "Edet", "Fashola", "Igwe"
+]
+BANKS = ["First Bank", "GTBank", "Access Bank", "Zenith Bank", "UBA", "Fidelity Bank", "Opay", "Kuda"]
+COMPLAINT_SUBJECTS = [
+    ("Deposit not reflected", "I made a transfer yesterday and my wallet has not been credited."),
+    ("Withdrawal delay", "My withdrawal has been pending for more than two days."),
+    ("Profit not credited", "Today's profit did not show on my dashboard."),
+    ("Change bank details", "Please help me update my bank account details."),
+    ("Login issue", "I keep getting logged out of the app."),
+]
+# 1x1 PNG; --proof-kb pads it out to a realistic upload size
+PROOF_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+HISTORY_DAYS = 365
+TERM_DAYS = 42
+
+
+def password_for(index, pool_size):
+    return f"Password{index % pool_size}!"
+
+
+def hash_password_pool(pool_size, workers):
+    """bcrypt every distinct password once, across processes"""
+    passwords = [password_for(index, pool_size) for index in range(pool_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(hash_password, passwords, chunksize=max(1, pool_size // (workers * 4))))
+
+
+def iso(moment):
+    return moment.isoformat()
+
+
+def generate_batch(rng, start, count, now, password_hashes, proof):
+    """Rows for users start..start+count, grouped by table"""
+    rows = {table: [] for table in ("users", "wallets", "bank_accounts", "investments", "deposits", "withdrawals", "complaints")}
+    pool_size = len(password_hashes)
+
+    for index in range(start, start + count):
+        user_id = str(uuid.uuid4())
+        email = f"user{index}@example.com"
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        joined = now - timedelta(days=rng.uniform(0, HISTORY_DAYS))
+        verified = rng.random() < 0.95
+        rows["users"].append((
+            user_id, email, password_hashes[index % pool_size], name, f"080{rng.randrange(10**8):08d}", verified, iso(joined)
+        ))
+
+        balance = 0.0
+        if not verified:
+            rows["wallets"].append((str(uuid.uuid4()), user_id, balance, iso(joined)))
+            continue
+
+        bank = None
+        if rng.random() < 0.7:
+            bank = (rng.choice(BANKS), f"{rng.randrange(10**10):010d}", name)
+            rows["bank_accounts"].append((str(uuid.uuid4()), user_id, *bank, iso(joined), iso(joined)))
+
+        # Investments anywhere in their term: just started, mid-way, about to mature, or done
+        capital_total = 0.0
+        for _ in range(rng.choice((0, 1, 1, 1, 2, 2, 3))):
+            package = rng.choice(INVESTMENT_PACKAGES)
+            started = joined + timedelta(days=rng.uniform(0, (now - joined).days or 1))
+            days = min((now - started).days, TERM_DAYS)
+            status = "completed" if days >= TERM_DAYS else "active"
+            profit = days * package["daily_profit"]
+            capital_total += package["capital"]
+            if status == "completed":
+                balance += package["capital"] + profit
+            rows["investments"].append((
+                str(uuid.uuid4()), user_id, package["id"], package["capital"], package["daily_profit"],
+                package["duration"], package["total_return"], days, profit, status,
+                iso(started), iso(started + timedelta(days=TERM_DAYS)), iso(started)
+            ))
+
+        # Approved deposits cover the capital plus some spare; a few more are pending or rejected
+        spare = rng.choice((0, 5000, 10000, 20000))
+        deposit_total = capital_total + spare
+        deposit_count = rng.randint(1, 3)
+        for number in range(deposit_count):
+            if number == deposit_count - 1:
+                amount = deposit_total
+            else:
+                amount = round(deposit_total * rng.uniform(0.2, 0.5), -2)
+            deposit_total -= amount
+            if amount <= 0:
+                continue
+            created = joined + timedelta(hours=rng.uniform(1, 48))
+            rows["deposits"].append((
+                str(uuid.uuid4()), user_id, email, name, amount, proof, "proof.png",
+                "approved", None, iso(created), iso(created)
+            ))
+        balance += spare
+        extra = rng.random()
+        if extra < 0.08:
+            status = "pending" if extra < 0.05 else "rejected"
+            created = now - timedelta(hours=rng.uniform(0, 72))
+            rows["deposits"].append((
+                str(uuid.uuid4()), user_id, email, name, float(rng.choice((10000, 20000, 50000))), proof, "proof.png",
+                status, "Proof unclear" if status == "rejected" else None, iso(created), iso(created)
+            ))
+
+        if bank and balance > 0:
+            for _ in range(rng.choice((0, 0, 1, 2))):
+                amount = round(min(balance, rng.uniform(1000, 30000)), -2)
+                if amount <= 0:
+                    break
+                status = rng.choices(("approved", "pending", "rejected"), weights=(80, 15, 5))[0]
+                if status == "approved":
+                    balance -= amount
+                created = now - timedelta(days=rng.uniform(0, (now - joined).days or 1))
+                rows["withdrawals"].append((
+                    str(uuid.uuid4()), user_id, email, name, amount, *bank,
+                    status, None, iso(created), iso(created)
+                ))
+
+        if rng.random() < 0.1:
+            subject, message = rng.choice(COMPLAINT_SUBJECTS)
+            status = rng.choices(("open", "resolved", "closed"), weights=(30, 50, 20))[0]
+            created = now - timedelta(days=rng.uniform(0, 30))
+            rows["complaints"].append((
+                str(uuid.uuid4()), user_id, email, name, subject, message, status,
+                None if status == "open" else "This has been resolved, thank you for your patience.",
+                iso(created), iso(created)
+            ))
+
+        rows["wallets"].append((str(uuid.uuid4()), user_id, round(balance, 2), iso(joined)))
+
+    return rows
+
+
+INSERTS = {
+    "users": "INSERT INTO users (id, email, password, full_name, phone, is_verified, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "wallets": "INSERT INTO wallets (id, user_id, balance, created_at) VALUES (?, ?, ?, ?)",
+    "bank_accounts": '''INSERT INTO bank_accounts (id, user_id, bank_name, account_number, account_name, created_at, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)''',
+    "investments": '''INSERT INTO investments (id, user_id, package_id, capital, daily_profit, duration, total_return,
+                                               days_completed, profit_earned, status, start_date, end_date, created_at)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+    "deposits": '''INSERT INTO deposits (id, user_id, user_email, user_name, amount, proof_image, proof_filename,
+                                         status, admin_note, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+    "withdrawals": '''INSERT INTO withdrawals (id, user_id, user_email, user_name, amount, bank_name, account_number,
+                                               account_name, status, admin_note, created_at, updated_at)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+    "complaints": '''INSERT INTO complaints (id, user_id, user_email, user_name, subject, message, status,
+                                             admin_response, created_at, updated_at)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+}
+
+
+def generate_dataset(users, batch_size, pool_size, workers, proof_kb, seed):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    proof = base64.b64encode(PROOF_PNG + b"\0" * max(0, proof_kb * 1024 - len(PROOF_PNG))).decode("utf-8")
+
+    print(f"🌱 Generating {users:,} users into {DB_PATH}")
+    simple_seed(str(DB_PATH))
+
+    started = time.perf_counter()
+    print(f"🔐 Hashing {pool_size} distinct passwords on {workers} processes...")
+    password_hashes = hash_password_pool(pool_size, workers)
+    print(f"✅ Hashed in {time.perf_counter() - started:.1f}s")
+
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    # Bulk-load settings for this connection only; a crash mid-load means regenerating anyway
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.execute("PRAGMA cache_size = -262144")
+
+    # Index the search tables once at the end instead of once per row
+    for fts in SEARCH_INDEXES:
+        for suffix in ("ai", "ad", "au"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+
+    totals = {table: 0 for table in INSERTS}
+    try:
+        for start in range(0, users, batch_size):
+            count = min(batch_size, users - start)
+            rows = generate_batch(rng, start, count, now, password_hashes, proof)
+            cursor.execute("BEGIN IMMEDIATE")
+            for table, statement in INSERTS.items():
+                if rows[table]:
+                    cursor.executemany(statement, rows[table])
+                    totals[table] += len(rows[table])
+            conn.commit()
+            elapsed = time.perf_counter() - started
+            print(f"   {start + count:,}/{users:,} users ({(start + count) / elapsed:,.0f} users/s)")
+
+        print("🔁 Rebuilding counters, rollups and search indexes...")
+        cursor.execute("BEGIN IMMEDIATE")
+        rebuild_stats_counters(cursor)
+        rollups = rebuild_rollups(cursor)
+        # Recreates the dropped triggers and re-indexes every row from the source tables
+        for statement in _search_index_statements():
+            cursor.execute(statement)
+        # Everything changed; make cached ETags and sync cursors look again
+        cursor.execute("UPDATE change_versions SET version = version + 1")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        # Never leave the search tables without their triggers
+        for statement in _search_index_statements():
+            cursor.execute(statement)
+        conn.commit()
+        raise
+    finally:
+        conn.close()
+
+    print(f"\n✅ Done in {time.perf_counter() - started:.1f}s")
+    for table, count in totals.items():
+        print(f"   • {table}: {count:,}")
+    print(f"   • daily_rollups: {rollups:,}")
+    print("\n📋 Login credentials:")
+    print(f"   user<N>@example.com / Password<N % {pool_size}>!  (e.g. user0@example.com / Password0!)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a large synthetic FlexInvest dataset")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=50000, help="users per transaction")
+    parser.add_argument("--password-pool", type=int, default=256, help="distinct passwords to bcrypt")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes for password hashing")
+    parser.add_argument("--proof-kb", type=int, default=0, help="pad each deposit proof to this size")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    generate_dataset(args.users, args.batch, args.password_pool, args.workers, args.proof_kb, args.seed)
@@ -8,8 +8,8 @@ DB_PATH = "flexinvest.db"
 def hash_password(password):
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
-def simple_seed():
-    conn = sqlite3.connect(DB_PATH)
+def simple_seed(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
     now = datetime.now(timezone.utc).isoformat()
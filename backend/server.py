@@ -1,9 +1,16 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks, Request, Response, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import StreamingResponse
 import os
 import logging
+import logging.handlers
+import queue
+import atexit
+import contextvars
+import functools
+from contextlib import contextmanager
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional
@@ -19,17 +26,31 @@ from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr
 import base64
 import asyncio
+import anyio.to_thread
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import sqlite3
 import json
 from contextlib import asynccontextmanager
 import secrets
+import socket
+import hashlib
+import re
+import csv
+import io
+import bisect
+import math
+import time
+import threading
+import sys
+import traceback
+import inspect
+from collections import deque
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # SQLite Database Configuration
-DB_PATH = ROOT_DIR / "flexinvest.db"
+DB_PATH = Path(os.environ.get('FLEXINVEST_DB_PATH', ROOT_DIR / "flexinvest.db"))
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'flexinvest-secret-key-2024')
@@ -42,6 +63,7 @@ SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
 SMTP_EMAIL = os.environ.get('SMTP_EMAIL', 'flexinvest@gmail.com')
 SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD', 'APP_PASSWORD')
 SMTP_DISPLAY_NAME = os.environ.get('SMTP_DISPLAY_NAME', 'FlexInvest')
+SMTP_START_TLS = os.environ.get('SMTP_START_TLS', 'true').lower() == 'true'
 
 # Company Bank Account (Static)
 COMPANY_BANK = {
@@ -69,12 +91,1384 @@ SUPPORT_LINKS = {
     "email": "isquarecapitalventure@gmail.com"
 }
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Pagination
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Sections returned by /user/dashboard
+DASHBOARD_FIELDS = ["profile", "wallet", "bank_account", "packages", "investments", "recent_transactions", "summary"]
+DASHBOARD_RECENT_TRANSACTIONS = 10
+
+# Admin review queues: table -> columns returned in listings
+ADMIN_QUEUE_TABLES = {
+    "deposits": "id, user_id, user_email, user_name, amount, status, admin_note, created_at, updated_at",
+    "withdrawals": "*",
+    "complaints": "*",
+}
+
+# Rollup metrics served by /admin/analytics -> SQL that rebuilds them from history
+# as (day, dimension, count, amount) rows
+ROLLUP_METRICS = {
+    "signups": "SELECT substr(created_at, 1, 10), '', COUNT(*), 0 FROM users GROUP BY 1",
+    "deposits": "SELECT substr(updated_at, 1, 10), '', COUNT(*), SUM(amount) FROM deposits WHERE status = 'approved' GROUP BY 1",
+    "withdrawals": "SELECT substr(updated_at, 1, 10), '', COUNT(*), SUM(amount) FROM withdrawals WHERE status = 'approved' GROUP BY 1",
+    "new_investments": "SELECT substr(created_at, 1, 10), package_id, COUNT(*), SUM(capital) FROM investments GROUP BY 1, 2",
+    # Scheduled payouts by the day each investment matures
+    "maturities": "SELECT substr(end_date, 1, 10), package_id, COUNT(*), SUM(total_return) FROM investments GROUP BY 1, 2",
+    # Completed payouts; history has no completion time so end_date stands in for it
+    "payouts": "SELECT substr(end_date, 1, 10), package_id, COUNT(*), SUM(capital + profit_earned) FROM investments WHERE status = 'completed' GROUP BY 1, 2",
+}
+ANALYTICS_BUCKETS = {
+    "day": "day",
+    "week": "date(day, '-6 days', 'weekday 1')",
+    "month": "substr(day, 1, 7) || '-01'",
+}
+ANALYTICS_DEFAULT_DAYS = 30
+
+# Full-text indexes: fts table -> (source table, indexed columns)
+SEARCH_INDEXES = {
+    "users_fts": ("users", ["full_name", "email", "phone"]),
+    "complaints_fts": ("complaints", ["subject", "message", "admin_response", "user_name", "user_email"]),
+}
+
+# /admin/search types -> (fts table, result columns, bm25 weights per indexed column)
+SEARCH_TYPES = {
+    "users": ("users_fts", "t.id, t.email, t.full_name, t.phone, t.is_verified, t.created_at", "5.0, 3.0, 3.0"),
+    "complaints": (
+        "complaints_fts",
+        "t.id, t.user_id, t.user_email, t.user_name, t.subject, t.status, t.created_at, t.updated_at",
+        "5.0, 1.0, 1.0, 3.0, 3.0"
+    ),
+}
+
+# Tables whose ids appear in emails as id[:8].upper() -> columns returned for a reference lookup
+SHORT_ID_TABLES = {
+    "deposits": "id, user_id, user_email, amount, status, created_at",
+    "withdrawals": "id, user_id, user_email, amount, status, created_at",
+    "investments": "id, user_id, package_id, capital AS amount, status, created_at",
+    "complaints": "id, user_id, user_email, subject, status, created_at",
+}
+
+# Tables admins approve or reject -> (columns loaded for the decision and email, wallet sign on approval)
+ADMIN_DECISION_TABLES = {
+    "deposits": ("id, user_id, user_email, user_name, amount, status", 1),
+    "withdrawals": ("id, user_id, user_email, user_name, amount, bank_name, account_number, status", -1),
+}
+ADMIN_DECISIONS = ("approved", "rejected")
+MAX_BULK_ITEMS = 500
+SQL_CHUNK_SIZE = 500  # bound parameters per IN (...) list; SQLite's default limit is 999
+
+# Payout batches
+MAX_PAYOUT_BATCH_SIZE = 5000
+PAYOUT_EXPORT_CHUNK = 500
+PAYOUT_EXPORT_COLUMNS = ["bank_name", "account_number", "account_name", "amount", "reference", "narration"]
+# Settlement CSV status values that mean the transfer went through; anything else releases the item
+PAYOUT_SETTLED_STATUSES = {"paid", "success", "successful", "completed"}
+# A batch stays 'open' until every item it was created with is paid or failed, then closes as
+# 'settled' (all paid), 'failed' (none paid) or 'partially_settled'
+PAYOUT_BATCH_OUTCOME = '''
+UPDATE payout_batches
+SET status = CASE
+    WHEN paid_count = item_count THEN 'settled'
+    WHEN paid_count = 0 THEN 'failed'
+    ELSE 'partially_settled'
+END
+WHERE status = 'open' AND item_count > 0 AND paid_count + failed_count >= item_count
+'''
+
+# Bank statement import: accepted header spellings -> canonical column
+STATEMENT_COLUMNS = {
+    "date": "value_date", "value_date": "value_date", "transaction_date": "value_date", "trans_date": "value_date",
+    "credit": "credit", "credit_amount": "credit", "amount": "credit", "deposit": "credit",
+    "debit": "debit", "debit_amount": "debit", "withdrawal": "debit",
+    "narration": "narration", "description": "narration", "details": "narration", "remarks": "narration",
+    "reference": "bank_reference", "ref": "bank_reference", "transaction_reference": "bank_reference",
+    "balance": "balance", "running_balance": "balance", "available_balance": "balance",
+    "account_number": "account_number",
+}
+STATEMENT_DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d-%b-%Y", "%d %b %Y", "%d-%b-%y", "%m/%d/%Y"]
+STATEMENT_IMPORT_CHUNK = 500
+MAX_STATEMENT_ERRORS = 100
+DEFAULT_MATCH_WINDOW_DAYS = 3
+
+# Admin work queue: item type -> status of items waiting for review
+QUEUE_WAITING_STATUS = {
+    "deposits": "pending",
+    "withdrawals": "pending",
+    "complaints": "open",
+}
+DEFAULT_LEASE_SECONDS = 600
+MAX_LEASE_SECONDS = 3600
+
+# /admin/events
+SSE_QUEUE_SIZE = 256  # events buffered per connection before it is told to resync
+SSE_HEARTBEAT_SECONDS = 15
+SSE_TOKEN_SECONDS = 60  # lifetime of the ?token= credential EventSource connects with
+
+# Prometheus /metrics; set METRICS_TOKEN to require it as a bearer token
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# SQL instrumentation
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+SLOW_QUERY_LOG_SIZE = 200
+QUERY_STATS_MAX_STATEMENTS = 1000  # distinct normalized statements tracked before the rest share one entry
+
+# Event-loop lag monitor
+LOOP_LAG_MONITOR = os.environ.get('LOOP_LAG_MONITOR', 'true').lower() == 'true'
+LOOP_LAG_INTERVAL_MS = float(os.environ.get('LOOP_LAG_INTERVAL_MS', 50))
+LOOP_LAG_THRESHOLD_MS = float(os.environ.get('LOOP_LAG_THRESHOLD_MS', 100))
+LOOP_LAG_MAX_OFFENDERS = 200
+LOOP_LAG_STACK_DEPTH = 25
+
+# On-demand request profiling: an admin sends this header (or query flag) with their bearer token
+PROFILE_HEADER = b"x-flexinvest-profile"
+PROFILE_QUERY_FLAG = b"__profile=1"
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 2))
+PROFILE_MAX_SECONDS = 120  # stop sampling long streams; the request itself carries on
+PROFILE_KEEP = 50
+
+# Readiness thresholds (/health/ready answers 503 when any check fails)
+READY_MAX_DB_WRITE_MS = float(os.environ.get('READY_MAX_DB_WRITE_MS', 250))
+READY_MAX_DB_CONNECTIONS = int(os.environ.get('READY_MAX_DB_CONNECTIONS', 64))
+READY_MAX_THREADPOOL_USAGE = float(os.environ.get('READY_MAX_THREADPOOL_USAGE', 0.9))
+READY_MAX_EMAIL_BACKLOG = int(os.environ.get('READY_MAX_EMAIL_BACKLOG', 500))
+
+# Only the worker holding this lease runs the cron jobs
+SCHEDULER_LEASE_NAME = "scheduler"
+SCHEDULER_LEASE_SECONDS = 60
+SCHEDULER_LEASE_RENEW_SECONDS = 20
+SCHEDULER_HOLDER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# /admin/dashboard fields -> stats_counters names
+ADMIN_DASHBOARD_COUNTERS = {
+    "total_users": "users.total",
+    "pending_deposits": "deposits.pending",
+    "pending_withdrawals": "withdrawals.pending",
+    "open_complaints": "complaints.open",
+    "active_investments": "investments.active",
+    "total_deposited": "deposits.approved.amount",
+    "total_withdrawn": "withdrawals.approved.amount",
+}
+
+# Sort keys accepted by /admin/users: name -> (sort column, tie-breaker column)
+ADMIN_USER_SORTS = {
+    "created_at": ("u.created_at", "u.id"),
+    "balance": ("w.balance", "w.user_id"),
+}
+
+# Tables stamped with change_seq for delta sync: table -> (owner column, synced columns)
+SYNC_TABLES = {
+    "users": ("id", "id, email, full_name, phone, is_verified, created_at, change_seq"),
+    "wallets": ("user_id", "*"),
+    "deposits": ("user_id", "id, user_id, user_email, user_name, amount, status, admin_note, created_at, updated_at, change_seq"),
+    "withdrawals": ("user_id", "*"),
+    "investments": ("user_id", "*"),
+    "complaints": ("user_id", "*"),
+}
+DEFAULT_SYNC_PAGE_SIZE = 200
+MAX_SYNC_PAGE_SIZE = 1000
+
+# Transaction feed sources: type -> (table, amount column, description column, fixed status)
+TRANSACTION_FEED_SOURCES = {
+    "deposit": ("deposits", "amount", "admin_note", None),
+    "withdrawal": ("withdrawals", "amount", "bank_name", None),
+    "investment": ("investments", "capital", "package_id", None),
+    "credit": ("wallet_credits", "amount", "reason", "completed"),
+}
+
+# Logging
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # json | text
+LOG_QUEUE_SIZE = 10000
+# logger name -> fraction of records kept, for lines emitted on every request
+def parse_log_sample_rates(spec: str) -> tuple:
+    """Parse "logger=rate,..." into rates clamped to [0, 1], plus the entries that were skipped.
+    A bad entry must not stop the app from starting, so it is reported rather than raised."""
+    rates, skipped = {}, []
+    for item in spec.split(','):
+        name, _, rate = item.partition('=')
+        if not item.strip():
+            continue
+        try:
+            value = float(rate)
+        except ValueError:
+            value = math.nan
+        if not name.strip() or math.isnan(value):
+            skipped.append(item.strip())
+            continue
+        rates[name.strip()] = min(max(value, 0.0), 1.0)
+    return rates, skipped
+
+LOG_SAMPLE_RATES, LOG_SAMPLE_RATES_SKIPPED = parse_log_sample_rates(
+    os.environ.get('LOG_SAMPLE_RATES', 'server.reads=0.1,server.origin=0.01')
 )
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('request_id', default=None)
+log_records_dropped = 0
+
+class RequestContextFilter(logging.Filter):
+    """Stamps the current request id on each record and applies per-logger sampling.
+    Runs on the QueueHandler, i.e. in the caller's context, before anything is queued."""
+    
+    def filter(self, record):
+        rate = LOG_SAMPLE_RATES.get(record.name)
+        if rate is not None and record.levelno < logging.WARNING and random.random() >= rate:
+            return False
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+    
+    The stock prepare() renders the message in the caller. Here records whose arguments are
+    immutable scalars go onto the queue untouched; anything else is rendered now so a later
+    mutation cannot change what gets logged. A full queue drops the record instead of blocking.
+    """
+    
+    def prepare(self, record):
+        args = record.args
+        if args and (not isinstance(args, tuple) or not all(isinstance(arg, (str, int, float, bool, type(None))) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+    
+    def enqueue(self, record):
+        global log_records_dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped += 1
+
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            entry["request_id"] = request_id
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging() -> logging.handlers.QueueListener:
+    stream = logging.StreamHandler()
+    if LOG_FORMAT == 'json':
+        stream.setFormatter(JsonLogFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'))
+    
+    handler = DeferredQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(RequestContextFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+    
+    listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+log_listener = configure_logging()
 logger = logging.getLogger(__name__)
+read_logger = logging.getLogger(f"{__name__}.reads")  # per-request read-path lines, sampled
+origin_logger = logging.getLogger(f"{__name__}.origin")  # CORS debugging, sampled
+if LOG_SAMPLE_RATES_SKIPPED:
+    logger.warning("Ignoring malformed LOG_SAMPLE_RATES entries: %s", ", ".join(LOG_SAMPLE_RATES_SKIPPED))
+
+# Tracing: spans are written as JSON lines to TRACE_SINK; unset means tracing is off
+TRACE_SINK = os.environ.get('TRACE_SINK')
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 1.0))
+
+# The trace id is the request id, so a trace and its log lines share one key
+trace_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('trace_id', default=None)
+span_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('span_id', default=None)
+
+class SpanFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.span, default=str)
+
+def configure_tracing() -> Optional[logging.handlers.QueueListener]:
+    """Spans ride the same queue/listener machinery as log records, on a logger of their own"""
+    if not TRACE_SINK:
+        return None
+    sink = logging.FileHandler(TRACE_SINK)
+    sink.setFormatter(SpanFormatter())
+    handler = DeferredQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    trace_logger.addHandler(handler)
+    trace_logger.setLevel(logging.INFO)
+    listener = logging.handlers.QueueListener(handler.queue, sink)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+trace_logger = logging.getLogger(f"{__name__}.trace")
+trace_logger.propagate = False
+trace_listener = configure_tracing()
+
+def start_trace(trace_id: Optional[str] = None) -> Optional[contextvars.Token]:
+    """Begin a trace in the current context if tracing is on and this one is sampled"""
+    if trace_listener is None or random.random() >= TRACE_SAMPLE_RATE:
+        return None
+    return trace_id_var.set(trace_id or uuid.uuid4().hex)
+
+def emit_span(name: str, started: float, duration: float, attributes: dict, span_id: Optional[str] = None, parent_id: Optional[str] = None):
+    trace_logger.info(name, extra={"span": {
+        "trace_id": trace_id_var.get(),
+        "span_id": span_id or secrets.token_hex(8),
+        "parent_id": parent_id if span_id else span_id_var.get(),
+        "name": name,
+        "start": datetime.fromtimestamp(started, timezone.utc).isoformat(),
+        "duration_ms": round(duration * 1000, 3),
+        **attributes
+    }})
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span. Yields the attribute dict so the block can
+    add to it; a no-op when no trace is active."""
+    if trace_id_var.get() is None:
+        yield attributes
+        return
+    span_id = secrets.token_hex(8)
+    parent_id = span_id_var.get()
+    token = span_id_var.set(span_id)
+    started = time.time()
+    clock = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes["error"] = type(e).__name__
+        raise
+    finally:
+        span_id_var.reset(token)
+        emit_span(name, started, time.perf_counter() - clock, attributes, span_id, parent_id)
+
+def traced(name: str, root: bool = False):
+    """Wrap a function (sync or async) in a span. With root=True a call outside any trace,
+    such as a scheduler job, starts its own."""
+    def decorate(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                token = start_trace() if root and trace_id_var.get() is None else None
+                try:
+                    with span(name):
+                        return await func(*args, **kwargs)
+                finally:
+                    if token is not None:
+                        trace_id_var.reset(token)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if trace_id_var.get() is None:
+                    return func(*args, **kwargs)
+                with span(name):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def _backfill_status_counters(cursor):
+    """Seed per-status row counts for the admin queues from the existing rows"""
+    for table in ADMIN_QUEUE_TABLES:
+        cursor.execute(f'''
+        INSERT INTO stats_counters (name, value)
+        SELECT '{table}.' || status, COUNT(*) FROM {table} WHERE true GROUP BY status
+        ON CONFLICT(name) DO UPDATE SET value = excluded.value
+        ''')
+
+def compute_stats_counters(cursor) -> dict:
+    """Recompute every maintained counter from the source tables"""
+    counters = {}
+    cursor.execute('SELECT COUNT(*) AS count FROM users')
+    counters["users.total"] = cursor.fetchone()["count"]
+    
+    for table in ("deposits", "withdrawals", "complaints", "investments"):
+        cursor.execute(f'SELECT status, COUNT(*) AS count FROM {table} GROUP BY status')
+        for row in cursor.fetchall():
+            counters[f"{table}.{row['status']}"] = row["count"]
+    
+    for table in ("deposits", "withdrawals"):
+        cursor.execute(f"SELECT COALESCE(SUM(amount), 0) AS total FROM {table} WHERE status = 'approved'")
+        counters[f"{table}.approved.amount"] = cursor.fetchone()["total"]
+    
+    return counters
+
+def rebuild_stats_counters(cursor) -> dict:
+    """Compare stored counters with the source tables, repair any drift and return it"""
+    actual = compute_stats_counters(cursor)
+    cursor.execute('SELECT name, value FROM stats_counters')
+    stored = {row["name"]: row["value"] for row in cursor.fetchall()}
+    
+    drift = {}
+    for name in set(actual) | set(stored):
+        expected = actual.get(name, 0)
+        if abs(stored.get(name, 0) - expected) > 1e-6:
+            drift[name] = {"stored": stored.get(name, 0), "actual": expected}
+            cursor.execute('''
+            INSERT INTO stats_counters (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = excluded.value
+            ''', (name, expected))
+    
+    return drift
+
+# Schema migrations, applied once in order and recorded in schema_migrations.
+# Each step is either a SQL statement or a callable that receives the cursor.
+def _search_index_statements() -> List[str]:
+    """FTS5 tables that store their own copy of the indexed text, plus the triggers that keep
+    them in step with their source. The source tables have TEXT ids and only an implicit rowid,
+    which VACUUM may renumber, so each index maps its own INTEGER PRIMARY KEY docids to source
+    ids in {fts}_ids rather than pointing at the source rowid."""
+    statements = []
+    for fts, (table, columns) in SEARCH_INDEXES.items():
+        cols = ", ".join(columns)
+        new = ", ".join(f"new.{c}" for c in columns)
+        assignments = ", ".join(f"{c} = new.{c}" for c in columns)
+        docid = f"(SELECT docid FROM {fts}_ids WHERE id = {{}}.id)"
+        statements += [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, prefix='2 3')",
+            f"CREATE TABLE IF NOT EXISTS {fts}_ids (docid INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE)",
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}_ids (id) VALUES (new.id);
+                INSERT INTO {fts}(rowid, {cols}) VALUES ({docid.format('new')}, {new});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                DELETE FROM {fts} WHERE rowid = {docid.format('old')};
+                DELETE FROM {fts}_ids WHERE id = old.id;
+            END""",
+            # Only indexed columns re-index, so status and balance updates cost nothing here
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+                UPDATE {fts} SET {assignments} WHERE rowid = {docid.format('new')};
+            END""",
+            # Rebuild from the source, for tables loaded while the triggers were absent
+            f"DELETE FROM {fts}",
+            f"DELETE FROM {fts}_ids",
+            f"INSERT INTO {fts}_ids (id) SELECT id FROM {table} ORDER BY created_at, id",
+            f"INSERT INTO {fts}(rowid, {cols}) SELECT k.docid, {', '.join(f't.{c}' for c in columns)} FROM {fts}_ids k JOIN {table} t ON t.id = k.id",
+        ]
+    return statements
+
+def statement_fingerprint(account_number: str, value_date: str, amount: float, narration: str,
+                          reference: str, balance: str = "", occurrence: int = 1) -> str:
+    """Identity of a statement credit, so overlapping statements don't import it twice.
+    A bank reference identifies a transaction by itself. Without one, identical credits on the same
+    day (common for repeat transfers from one payer) are told apart by the running balance when the
+    statement has one, and by their order among identical lines in the statement."""
+    if reference:
+        key = f"{account_number}|ref|{reference}"
+    else:
+        key = f"{account_number}|{value_date}|{amount:.2f}||{narration}"
+        if balance:
+            key += f"|bal|{balance}"
+        if occurrence > 1:
+            key += f"|#{occurrence}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def _rekey_referenced_statement_lines(cursor):
+    """Lines with a bank reference are now identified by it alone"""
+    cursor.execute('''
+    SELECT l.id, i.account_number, l.bank_reference FROM bank_statement_lines l
+    JOIN bank_statement_imports i ON i.id = l.import_id
+    WHERE l.bank_reference != ''
+    ''')
+    cursor.executemany(
+        'UPDATE OR IGNORE bank_statement_lines SET fingerprint = ? WHERE id = ?',
+        [(statement_fingerprint(row["account_number"], "", 0, "", row["bank_reference"]), row["id"]) for row in cursor.fetchall()]
+    )
+
+MIGRATIONS = [
+    ("0001_user_history_indexes", [
+        'CREATE INDEX IF NOT EXISTS idx_deposits_user_created ON deposits(user_id, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_withdrawals_user_created ON withdrawals(user_id, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_complaints_user_created ON complaints(user_id, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_investments_user_created ON investments(user_id, created_at, id)',
+    ]),
+    ("0002_change_versions", [
+        '''
+        CREATE TABLE IF NOT EXISTS change_versions (
+            scope TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+    ]),
+    ("0003_change_seq", [
+        # Existing rows all get sequence 1 so a sync from 0 returns them
+        *[f'ALTER TABLE {table} ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 1' for table in SYNC_TABLES],
+        *[f'CREATE INDEX IF NOT EXISTS idx_{table}_change_seq ON {table}(change_seq, id)' for table in SYNC_TABLES],
+        *[
+            f'CREATE INDEX IF NOT EXISTS idx_{table}_owner_change_seq ON {table}({owner}, change_seq, id)'
+            for table, (owner, _) in SYNC_TABLES.items() if owner != "id"
+        ],
+        "INSERT OR IGNORE INTO change_versions (scope, version) VALUES ('change_seq', 1)",
+    ]),
+    ("0004_admin_user_listing_indexes", [
+        'CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_users_verified_created ON users(is_verified, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_users_email_nocase ON users(email COLLATE NOCASE)',
+        'CREATE INDEX IF NOT EXISTS idx_users_full_name_nocase ON users(full_name COLLATE NOCASE)',
+        'CREATE INDEX IF NOT EXISTS idx_users_phone_nocase ON users(phone COLLATE NOCASE)',
+        'CREATE INDEX IF NOT EXISTS idx_wallets_balance ON wallets(balance, user_id)',
+    ]),
+    ("0005_admin_queues", [
+        *[f'DROP INDEX IF EXISTS idx_{table}_status' for table in ADMIN_QUEUE_TABLES],
+        *[f'CREATE INDEX IF NOT EXISTS idx_{table}_status_created ON {table}(status, created_at, id)' for table in ADMIN_QUEUE_TABLES],
+        *[f'CREATE INDEX IF NOT EXISTS idx_{table}_created ON {table}(created_at, id)' for table in ADMIN_QUEUE_TABLES],
+        '''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value REAL NOT NULL DEFAULT 0
+        )
+        ''',
+        _backfill_status_counters,
+    ]),
+    ("0006_dashboard_counters", [
+        rebuild_stats_counters,
+    ]),
+    ("0007_daily_rollups", [
+        '''
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            metric TEXT NOT NULL,
+            day TEXT NOT NULL,
+            dimension TEXT NOT NULL DEFAULT '',
+            count INTEGER NOT NULL DEFAULT 0,
+            amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, day, dimension)
+        ) WITHOUT ROWID
+        ''',
+    ]),
+    ("0008_search_indexes", _search_index_statements() + [
+        f"CREATE INDEX IF NOT EXISTS idx_{t}_short_id ON {t}(upper(substr(id, 1, 8)))" for t in SHORT_ID_TABLES
+    ]),
+    ("0009_payout_batches", [
+        '''
+        CREATE TABLE IF NOT EXISTS payout_batches (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'open',
+            item_count INTEGER NOT NULL DEFAULT 0,
+            total_amount REAL NOT NULL DEFAULT 0,
+            paid_count INTEGER NOT NULL DEFAULT 0,
+            failed_count INTEGER NOT NULL DEFAULT 0,
+            created_by TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_payout_batches_created ON payout_batches(created_at, id)',
+        'ALTER TABLE withdrawals ADD COLUMN payout_batch_id TEXT',
+        'ALTER TABLE withdrawals ADD COLUMN paid_at TEXT',
+        'ALTER TABLE withdrawals ADD COLUMN payout_reference TEXT',
+        # Approved withdrawals not yet in a batch, in approval order
+        '''
+        CREATE INDEX IF NOT EXISTS idx_withdrawals_awaiting_payout ON withdrawals(updated_at, id)
+        WHERE status = 'approved' AND payout_batch_id IS NULL
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_withdrawals_payout_batch ON withdrawals(payout_batch_id, bank_name, id)',
+    ]),
+    ("0010_bank_statements", [
+        '''
+        CREATE TABLE IF NOT EXISTS bank_statement_imports (
+            id TEXT PRIMARY KEY,
+            account_number TEXT NOT NULL,
+            filename TEXT,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            credit_count INTEGER NOT NULL DEFAULT 0,
+            duplicate_count INTEGER NOT NULL DEFAULT 0,
+            created_by TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        ''',
+        # status: unmatched -> proposed (deposit_id set) -> matched, or ignored
+        '''
+        CREATE TABLE IF NOT EXISTS bank_statement_lines (
+            id INTEGER PRIMARY KEY,
+            import_id TEXT NOT NULL,
+            value_date TEXT NOT NULL,
+            amount REAL NOT NULL,
+            narration TEXT,
+            bank_reference TEXT,
+            fingerprint TEXT NOT NULL UNIQUE,
+            status TEXT NOT NULL DEFAULT 'unmatched',
+            deposit_id TEXT,
+            matched_at TEXT,
+            FOREIGN KEY (import_id) REFERENCES bank_statement_imports (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_bank_statement_lines_status ON bank_statement_lines(status, value_date, id)',
+        'CREATE INDEX IF NOT EXISTS idx_bank_statement_lines_deposit ON bank_statement_lines(deposit_id)',
+        "CREATE INDEX IF NOT EXISTS idx_deposits_pending_amount ON deposits(amount, created_at) WHERE status = 'pending'",
+    ]),
+    ("0011_queue_leases", [
+        '''
+        CREATE TABLE IF NOT EXISTS queue_leases (
+            item_type TEXT NOT NULL,
+            item_id TEXT NOT NULL,
+            admin_id TEXT NOT NULL,
+            admin_email TEXT NOT NULL,
+            leased_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL,
+            PRIMARY KEY (item_type, item_id)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_queue_leases_admin ON queue_leases(admin_id, item_type, expires_at)',
+        'CREATE INDEX IF NOT EXISTS idx_queue_leases_expires ON queue_leases(item_type, expires_at)',
+    ]),
+    ("0012_request_profiles", [
+        '''
+        CREATE TABLE IF NOT EXISTS request_profiles (
+            id TEXT PRIMARY KEY,
+            method TEXT NOT NULL,
+            path TEXT NOT NULL,
+            route TEXT,
+            status INTEGER,
+            duration_ms REAL NOT NULL,
+            samples INTEGER NOT NULL,
+            admin_email TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            folded TEXT NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_request_profiles_created ON request_profiles(created_at)',
+    ]),
+    ("0013_scheduler_leases", [
+        '''
+        CREATE TABLE IF NOT EXISTS scheduler_leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            acquired_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY,
+            job TEXT NOT NULL,
+            holder TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            duration_seconds REAL NOT NULL,
+            outcome TEXT NOT NULL,
+            detail TEXT
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_job_runs_job_started ON job_runs(job, started_at)',
+        '''
+        CREATE TABLE IF NOT EXISTS health_probes (
+            name TEXT PRIMARY KEY,
+            checked_at TEXT NOT NULL
+        )
+        ''',
+    ]),
+    ("0014_wallet_credits", [
+        '''
+        CREATE TABLE IF NOT EXISTS wallet_credits (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            amount REAL NOT NULL,
+            reason TEXT,
+            admin_id TEXT,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_wallet_credits_user_created ON wallet_credits(user_id, created_at, id)',
+    ]),
+    # Batches used to recount item_count after failed items left them, closing all-failed ones as 'settled'
+    ("0016_payout_batch_outcomes", [
+        'UPDATE payout_batches SET item_count = item_count + failed_count',
+        "UPDATE payout_batches SET status = 'open'",
+        PAYOUT_BATCH_OUTCOME,
+    ]),
+    ("0017_statement_reference_fingerprints", [
+        _rekey_referenced_statement_lines,
+    ]),
+]
+
+# ============= METRICS =============
+
+class Metric:
+    """One Prometheus series family: a counter, gauge or histogram keyed by label values"""
+    
+    def __init__(self, name: str, help_text: str, kind: str = "counter", labels: tuple = (), buckets: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}
+        self.lock = threading.Lock()
+    
+    def inc(self, *label_values, amount: float = 1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+    
+    def set(self, *label_values, value: float):
+        self.values[label_values] = value
+    
+    def get(self, *label_values) -> float:
+        return self.values.get(label_values, 0)
+    
+    def observe(self, *label_values, value: float):
+        with self.lock:
+            state = self.values.get(label_values)
+            if state is None:
+                # Per-bucket counts, then sum and count
+                state = self.values[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+    
+    def _labels(self, label_values: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{str(value)}"' for name, value in zip(self.labels, label_values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = [(key, list(value) if self.kind == "histogram" else value) for key, value in self.values.items()]
+        for label_values, value in sorted(items):
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{self._labels(label_values)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets, value):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{self._labels(label_values, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{self._labels(label_values, le)} {value[-1]}")
+            lines.append(f"{self.name}_sum{self._labels(label_values)} {value[-2]}")
+            lines.append(f"{self.name}_count{self._labels(label_values)} {value[-1]}")
+        return lines
+
+http_requests = Metric("flexinvest_http_requests_total", "HTTP requests by route template and status", labels=("method", "route", "status"))
+http_latency = Metric("flexinvest_http_request_duration_seconds", "HTTP request latency", "histogram", ("method", "route"), METRICS_LATENCY_BUCKETS)
+http_response_size = Metric("flexinvest_http_response_size_bytes", "HTTP response body size", "histogram", ("method", "route"), METRICS_SIZE_BUCKETS)
+http_in_flight = Metric("flexinvest_http_requests_in_flight", "HTTP requests being served", "gauge", ("method",))
+profit_run_duration = Metric("flexinvest_profit_run_duration_seconds", "Duration of daily profit runs", "histogram", buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+profit_run_last = Metric("flexinvest_profit_run_last_success_timestamp_seconds", "Unix time the last profit run committed", "gauge")
+profit_runs = Metric("flexinvest_profit_runs_total", "Daily profit runs by outcome", labels=("outcome",))
+email_queue_depth = Metric("flexinvest_email_queue_depth", "Emails queued or being sent", "gauge")
+emails_sent = Metric("flexinvest_emails_total", "Email delivery attempts by outcome", labels=("outcome",))
+db_connections_open = Metric("flexinvest_db_connections_open", "Open SQLite connections", "gauge")
+db_connections_opened = Metric("flexinvest_db_connections_opened_total", "SQLite connections opened")
+db_write_lock_wait = Metric("flexinvest_db_write_lock_wait_seconds", "Time spent waiting in BEGIN IMMEDIATE for the write lock", "histogram", buckets=METRICS_LATENCY_BUCKETS)
+sse_subscribers = Metric("flexinvest_sse_subscribers", "Connected /admin/events streams", "gauge")
+log_dropped = Metric("flexinvest_log_records_dropped_total", "Log records dropped because the log queue was full")
+event_loop_lag = Metric("flexinvest_event_loop_lag_seconds", "Delay between when the loop heartbeat was due and when it ran", "histogram", buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+event_loop_stalls = Metric("flexinvest_event_loop_stalls_total", "Times the event loop stayed blocked past LOOP_LAG_THRESHOLD_MS")
+
+METRICS = [
+    http_requests, http_latency, http_response_size, http_in_flight,
+    profit_run_duration, profit_run_last, profit_runs,
+    email_queue_depth, emails_sent,
+    db_connections_open, db_connections_opened, db_write_lock_wait,
+    sse_subscribers, event_loop_lag, event_loop_stalls, log_dropped,
+]
+email_queue_depth.set(value=0)
+db_connections_open.set(value=0)
+
+SQL_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+SQL_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+SQL_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+SQL_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+class QueryStats:
+    """Per-statement latency and row counts keyed by normalized SQL, plus a slow-query log.
+    Each statement's EXPLAIN QUERY PLAN is captured the first time it runs, so full scans
+    show up in the report even when they are not yet slow."""
+    
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS):
+        self.slow_seconds = slow_ms / 1000
+        self.lock = threading.Lock()
+        self.normalized = {}
+        self.statements = {}
+        self.slow = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+    
+    def normalize(self, sql: str) -> str:
+        key = self.normalized.get(sql)
+        if key is None:
+            key = SQL_STRING_LITERAL.sub("?", sql)
+            key = SQL_NUMBER_LITERAL.sub("?", key)
+            key = " ".join(key.split())
+            # IN lists of any length are one statement
+            key = SQL_PLACEHOLDER_LIST.sub("(...)", key)
+            if len(self.normalized) < QUERY_STATS_MAX_STATEMENTS * 4:
+                self.normalized[sql] = key
+        return key
+    
+    def entry(self, key: str) -> dict:
+        stats = self.statements.get(key)
+        if stats is None:
+            if len(self.statements) >= QUERY_STATS_MAX_STATEMENTS:
+                key = "(other statements)"
+                stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = {
+                    "sql": key, "calls": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                    "rows": 0, "plan": None, "full_scan": False
+                }
+        return stats
+    
+    def record(self, key: str, elapsed: float, rows: int = 0) -> dict:
+        with self.lock:
+            stats = self.entry(key)
+            stats["calls"] += 1
+            stats["total_seconds"] += elapsed
+            stats["rows"] += rows
+            if elapsed > stats["max_seconds"]:
+                stats["max_seconds"] = elapsed
+        return stats
+    
+    def add_rows(self, key: str, rows: int, elapsed: float):
+        # Fetch time belongs to the statement too; SELECTs do most of their work here
+        with self.lock:
+            stats = self.entry(key)
+            stats["rows"] += rows
+            stats["total_seconds"] += elapsed
+    
+    def capture_plan(self, connection, sql: str, parameters, stats: dict):
+        if not sql.lstrip()[:6].upper().startswith(SQL_EXPLAINABLE):
+            stats["plan"] = []
+            return
+        try:
+            # A plain cursor, so the EXPLAIN itself is not recorded
+            plan_cursor = sqlite3.Cursor(connection)
+            plan_cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+            stats["plan"] = [row[-1] for row in plan_cursor.fetchall()]
+            plan_cursor.close()
+        except sqlite3.Error as e:
+            stats["plan"] = [f"unavailable: {e}"]
+        # "SCAN deposits" walks the whole table; "SCAN ... USING INDEX" at least avoids the rows
+        stats["full_scan"] = any(
+            step.startswith("SCAN ") and " USING " not in step and "CONSTANT ROW" not in step
+            for step in stats["plan"]
+        )
+    
+    def log_slow(self, key: str, elapsed: float, stats: dict):
+        self.slow.append({
+            "sql": key,
+            "ms": round(elapsed * 1000, 3),
+            "plan": stats["plan"],
+            "full_scan": stats["full_scan"],
+            "at": datetime.now(timezone.utc).isoformat()
+        })
+        logger.warning("Slow query (%.1f ms): %s | plan: %s", elapsed * 1000, key, stats['plan'])
+    
+    def report(self, sort: str = "total", limit: int = 50) -> dict:
+        with self.lock:
+            statements = [dict(stats) for stats in self.statements.values()]
+        for stats in statements:
+            stats["total_ms"] = round(stats.pop("total_seconds") * 1000, 3)
+            stats["max_ms"] = round(stats.pop("max_seconds") * 1000, 3)
+            stats["mean_ms"] = round(stats["total_ms"] / stats["calls"], 3) if stats["calls"] else 0
+        sort_key = {"total": "total_ms", "mean": "mean_ms", "max": "max_ms", "calls": "calls", "rows": "rows"}[sort]
+        statements.sort(key=lambda stats: stats[sort_key], reverse=True)
+        return {
+            "slow_query_ms": self.slow_seconds * 1000,
+            "statements": statements[:limit],
+            "full_scans": [stats for stats in statements if stats["full_scan"]],
+            "slow_queries": list(self.slow)[::-1]
+        }
+    
+    def reset(self):
+        with self.lock:
+            self.statements.clear()
+            self.slow.clear()
+
+query_stats = QueryStats()
+
+class TrackedCursor(sqlite3.Cursor):
+    """Times every statement and the fetches that follow it into query_stats"""
+    
+    stat_key = None
+    
+    def execute(self, sql, parameters=()):
+        key = query_stats.normalize(sql)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            if sql == 'BEGIN IMMEDIATE':
+                db_write_lock_wait.observe(value=elapsed)
+            self.stat_key = key
+            stats = query_stats.record(key, elapsed, max(self.rowcount, 0))
+            if stats["plan"] is None:
+                query_stats.capture_plan(self.connection, sql, parameters, stats)
+            if elapsed >= query_stats.slow_seconds:
+                query_stats.log_slow(key, elapsed, stats)
+            if trace_id_var.get() is not None:
+                emit_span("db.execute", time.time() - elapsed, elapsed, {"sql": key, "rows": max(self.rowcount, 0)})
+    
+    def executemany(self, sql, seq_of_parameters):
+        key = query_stats.normalize(sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stat_key = None
+            stats = query_stats.record(key, elapsed, max(self.rowcount, 0))
+            if elapsed >= query_stats.slow_seconds:
+                query_stats.log_slow(key, elapsed, stats)
+            if trace_id_var.get() is not None:
+                emit_span("db.executemany", time.time() - elapsed, elapsed, {"sql": key, "rows": max(self.rowcount, 0)})
+    
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        if self.stat_key:
+            query_stats.add_rows(self.stat_key, 1 if row is not None else 0, time.perf_counter() - started)
+        return row
+    
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if self.stat_key:
+            query_stats.add_rows(self.stat_key, len(rows), time.perf_counter() - started)
+        return rows
+    
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        if self.stat_key:
+            query_stats.add_rows(self.stat_key, len(rows), time.perf_counter() - started)
+        return rows
+
+class TrackedConnection(sqlite3.Connection):
+    """sqlite3 connection that keeps the open-connection gauge and runs every statement on a TrackedCursor"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.open = True
+        db_connections_opened.inc()
+        db_connections_open.inc()
+    
+    def cursor(self, factory=TrackedCursor):
+        return super().cursor(factory)
+    
+    # The C shortcuts build a plain cursor internally, so statements run as conn.execute(...)
+    # would skip query_stats; send them through a tracked cursor instead
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    def close(self):
+        if self.open:
+            self.open = False
+            db_connections_open.inc(amount=-1)
+        super().close()
+    
+    def __del__(self):
+        if getattr(self, "open", False):
+            self.open = False
+            db_connections_open.inc(amount=-1)
+
+class MetricsMiddleware:
+    """Pure ASGI middleware so streaming responses pass through and the cost stays a few dict updates"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        status = 500
+        size = 0
+        
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+        
+        http_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.inc(method, amount=-1)
+            # The router leaves the matched route in the scope; unmatched paths share one label
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            http_requests.inc(method, route, status)
+            http_latency.observe(method, route, value=elapsed)
+            http_response_size.observe(method, route, value=size)
+
+class LoopLagMonitor:
+    """Measures event-loop scheduling delay and names whatever is blocking it.
+    
+    A heartbeat task sleeps for LOOP_LAG_INTERVAL_MS and records how late it wakes up. A
+    watchdog thread checks the heartbeat; once the loop has been stuck past the threshold it
+    snapshots the loop thread's stack, so the report points at the handler and line that held
+    the loop (bcrypt, a large sqlite query, base64 of an upload) rather than at the victim
+    requests queued behind it.
+    """
+    
+    def __init__(self, interval_ms: float = LOOP_LAG_INTERVAL_MS, threshold_ms: float = LOOP_LAG_THRESHOLD_MS):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.lock = threading.Lock()
+        self.offenders = {}
+        self.samples = 0
+        self.max_lag = 0.0
+        self.beat = None
+        self.stall = None
+        self.loop_thread = None
+        self.task = None
+        self.thread = None
+        self.stopped = threading.Event()
+    
+    def start(self):
+        self.loop_thread = threading.get_ident()
+        self.beat = time.perf_counter()
+        self.stopped.clear()
+        self.task = asyncio.create_task(self.heartbeat())
+        self.thread = threading.Thread(target=self.watch, name="loop-lag-watchdog", daemon=True)
+        self.thread.start()
+        logger.info("Event-loop lag monitor started (interval %.0f ms, threshold %.0f ms)", self.interval * 1000, self.threshold * 1000)
+    
+    async def stop(self):
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+            self.thread = None
+    
+    async def heartbeat(self):
+        while True:
+            due = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(now - due, 0.0)
+            self.beat = now
+            event_loop_lag.observe(value=lag)
+            with self.lock:
+                self.samples += 1
+                self.max_lag = max(self.max_lag, lag)
+                stall, self.stall = self.stall, None
+            if stall is not None:
+                self.record(stall, lag)
+    
+    def watch(self):
+        check_every = max(self.threshold / 4, 0.005)
+        while not self.stopped.wait(check_every):
+            beat = self.beat
+            if time.perf_counter() - beat < self.interval + self.threshold:
+                continue
+            with self.lock:
+                # One snapshot per stall; the heartbeat clears it once the loop runs again
+                if self.stall is not None and self.stall["beat"] == beat:
+                    continue
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            stall = self.describe(frame)
+            stall["beat"] = beat
+            with self.lock:
+                self.stall = stall
+            del frame
+    
+    def describe(self, frame) -> dict:
+        """Attribute a stack to the innermost coroutine in this module (normally the route
+        handler) and the innermost line of this module that was executing"""
+        handler = None
+        location = None
+        current = frame
+        while current is not None:
+            code = current.f_code
+            if code.co_filename == __file__:
+                if location is None:
+                    location = f"{code.co_name}:{current.f_lineno}"
+                if handler is None and code.co_flags & inspect.CO_COROUTINE:
+                    handler = code.co_name
+            current = current.f_back
+        if location is None:
+            location = f"{Path(frame.f_code.co_filename).name}:{frame.f_code.co_name}:{frame.f_lineno}"
+        stack = [
+            f"{Path(entry.filename).name}:{entry.lineno} in {entry.name}"
+            for entry in traceback.extract_stack(frame, limit=LOOP_LAG_STACK_DEPTH)
+        ]
+        return {"handler": handler or "(outside a handler)", "location": location, "stack": stack}
+    
+    def record(self, stall: dict, lag: float):
+        event_loop_stalls.inc()
+        key = (stall["handler"], stall["location"])
+        with self.lock:
+            offender = self.offenders.get(key)
+            if offender is None:
+                if len(self.offenders) >= LOOP_LAG_MAX_OFFENDERS:
+                    key = ("(other)", "(other)")
+                    offender = self.offenders.get(key)
+                if offender is None:
+                    offender = self.offenders[key] = {
+                        "handler": key[0], "location": key[1], "stalls": 0,
+                        "total_seconds": 0.0, "max_seconds": 0.0, "stack": stall["stack"]
+                    }
+            offender["stalls"] += 1
+            offender["total_seconds"] += lag
+            if lag >= offender["max_seconds"]:
+                offender["max_seconds"] = lag
+                offender["stack"] = stall["stack"]
+            offender["last_at"] = datetime.now(timezone.utc).isoformat()
+        logger.warning("Event loop blocked for %.0f ms in %s at %s", lag * 1000, stall['handler'], stall['location'])
+    
+    def report(self, limit: int = 20) -> dict:
+        with self.lock:
+            offenders = [dict(offender) for offender in self.offenders.values()]
+            samples, max_lag = self.samples, self.max_lag
+        for offender in offenders:
+            offender["total_ms"] = round(offender.pop("total_seconds") * 1000, 3)
+            offender["max_ms"] = round(offender.pop("max_seconds") * 1000, 3)
+        offenders.sort(key=lambda offender: offender["total_ms"], reverse=True)
+        return {
+            "running": self.task is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "samples": samples,
+            "max_lag_ms": round(max_lag * 1000, 3),
+            "offenders": offenders[:limit]
+        }
+    
+    def reset(self):
+        with self.lock:
+            self.offenders.clear()
+            self.samples = 0
+            self.max_lag = 0.0
+
+loop_monitor = LoopLagMonitor()
+
+class RequestSampler:
+    """Samples the event-loop thread's stack while one request runs.
+    
+    Only the stack above that request's middleware frame is kept, so other requests sharing
+    the loop do not leak into the profile. Samples where the request is suspended (awaiting
+    I/O, the thread pool or SMTP) are counted as "(awaiting)" so the output covers wall time.
+    """
+    
+    def __init__(self, root_frame, label: str):
+        self.root = root_frame
+        self.label = label
+        self.thread_id = threading.get_ident()
+        self.interval = PROFILE_SAMPLE_INTERVAL_MS / 1000
+        self.counts = {}
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="request-profiler", daemon=True)
+    
+    def start(self):
+        self.thread.start()
+    
+    def stop(self):
+        self.stopped.set()
+        self.thread.join(timeout=1)
+    
+    def run(self):
+        deadline = time.perf_counter() + PROFILE_MAX_SECONDS
+        while not self.stopped.wait(self.interval) and time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.root:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if frame is None:
+                stack = ["(awaiting)"]
+            stack.append(self.label)
+            key = ";".join(reversed(stack))
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+            del frame
+    
+    def folded(self) -> str:
+        """Collapsed stacks, one "frame;frame;frame count" line each (flamegraph.pl / speedscope input)"""
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(self.counts.items()))
+
+def profile_requested(scope) -> bool:
+    if PROFILE_QUERY_FLAG in scope.get("query_string", b""):
+        return True
+    return any(name == PROFILE_HEADER for name, _ in scope["headers"])
+
+def profiling_admin(scope) -> Optional[str]:
+    """Email of the admin whose bearer token came with the profile flag, else None"""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return None
+            try:
+                payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+            except jwt.InvalidTokenError:
+                return None
+            if payload.get("role") not in ["admin", "superadmin"]:
+                return None
+            conn = db.get_connection()
+            admin = conn.execute('SELECT email FROM admins WHERE id = ?', (payload.get("user_id"),)).fetchone()
+            conn.close()
+            return admin["email"] if admin else None
+    return None
+
+def fold_to_tree(folded: str) -> dict:
+    root = {"name": "root", "samples": 0, "children": {}}
+    for line in folded.splitlines():
+        stack, _, count = line.rpartition(" ")
+        count = int(count)
+        root["samples"] += count
+        node = root
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"name": name, "samples": 0, "children": {}})
+            node["samples"] += count
+    
+    def finish(node):
+        children = sorted(node["children"].values(), key=lambda child: child["samples"], reverse=True)
+        node["children"] = [finish(child) for child in children]
+        return node
+    
+    return finish(root)
+
+class ProfilingMiddleware:
+    """Runs RequestSampler around a request when an admin asks for it.
+    
+    Requests without the flag pay for one scan of the header list. Flagged requests from
+    anyone but an admin run unprofiled. The profile id comes back in X-Profile-Id and the
+    output is downloadable from /api/admin/diagnostics/profiles/{id}.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+        admin_email = profiling_admin(scope)
+        if admin_email is None:
+            await self.app(scope, receive, send)
+            return
+        
+        profile_id = str(uuid.uuid4())
+        status = None
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+        
+        sampler = RequestSampler(sys._getframe(), f"{scope['method']} {scope['path']}")
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            duration_ms = (time.perf_counter() - started) * 1000
+            route = scope.get("route")
+            save_request_profile(
+                profile_id, scope, route.path if route is not None else None,
+                status, duration_ms, sampler, admin_email
+            )
+
+def save_request_profile(profile_id, scope, route, status, duration_ms, sampler, admin_email):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            INSERT INTO request_profiles (id, method, path, route, status, duration_ms, samples, admin_email, created_at, folded)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (profile_id, scope["method"], scope["path"], route, status, round(duration_ms, 3),
+              sampler.samples, admin_email, datetime.now(timezone.utc).isoformat(), sampler.folded()))
+        cursor.execute('''
+            DELETE FROM request_profiles WHERE id NOT IN (
+                SELECT id FROM request_profiles ORDER BY created_at DESC LIMIT ?
+            )
+        ''', (PROFILE_KEEP,))
+        conn.commit()
+        logger.info("Profiled %s %s for %s: %.1f ms, %s samples (%s)", scope['method'], scope['path'], admin_email, duration_ms, sampler.samples, profile_id)
+    except sqlite3.Error as e:
+        logger.error("Failed to store request profile %s: %s", profile_id, e)
+    finally:
+        conn.close()
+
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+class RequestContextMiddleware:
+    """Gives every request a correlation id: the caller's X-Request-ID when it is sane,
+    otherwise a fresh one. Log records carry it, the response echoes it back, and it doubles
+    as the trace id when tracing is on."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        
+        status = None
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+        
+        token = request_id_var.set(request_id)
+        trace_token = start_trace(request_id)
+        try:
+            # The root span also covers background tasks, which Starlette runs after the body is sent
+            with span("http.request", method=scope["method"], path=scope["path"]) as attributes:
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    route = scope.get("route")
+                    attributes["route"] = route.path if route is not None else None
+                    attributes["status"] = status
+        finally:
+            if trace_token is not None:
+                trace_id_var.reset(trace_token)
+            request_id_var.reset(token)
+
+def render_metrics() -> str:
+    sse_subscribers.set(value=len(event_hub.subscribers))
+    log_dropped.set(value=log_records_dropped)
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
 
 # Database connection pool
 class Database:
@@ -83,7 +1477,7 @@ class Database:
         self._init_db()
     
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=TrackedConnection)
         conn.row_factory = sqlite3.Row
         return conn
     
@@ -240,9 +1634,6 @@ class Database:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_admins_email ON admins(email)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_investments_user_status ON investments(user_id, status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_deposits_status ON deposits(status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_withdrawals_status ON withdrawals(status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_complaints_status ON complaints(status)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_password_resets_email ON password_resets(email)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_password_resets_token ON password_resets(reset_token)')
         
@@ -273,8 +1664,46 @@ class Database:
             cursor.execute('UPDATE admins SET role = "admin" WHERE role IS NULL')
         
         conn.commit()
+        # Finish any pending statement; DROP/ALTER in migrations fail while one is active
+        cursor.close()
+        self._apply_migrations(conn)
         conn.close()
         logger.info("Database initialization complete")
+    
+    def _apply_migrations(self, conn):
+        """Apply pending schema migrations in order"""
+        cursor = conn.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name TEXT PRIMARY KEY,
+            applied_at TEXT NOT NULL
+        )
+        ''')
+        
+        # Take the write lock first so concurrent workers don't apply the same migration twice
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('SELECT name FROM schema_migrations')
+            applied = {row["name"] for row in cursor.fetchall()}
+            
+            for name, steps in MIGRATIONS:
+                if name in applied:
+                    continue
+                logger.info("Applying migration %s...", name)
+                for step in steps:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                cursor.execute(
+                    'INSERT INTO schema_migrations (name, applied_at) VALUES (?, ?)',
+                    (name, datetime.now(timezone.utc).isoformat())
+                )
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
 # Initialize database
 db = Database(DB_PATH)
@@ -282,6 +1711,7 @@ db = Database(DB_PATH)
 # Create API router
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # ============= PYDANTIC MODELS =============
 
@@ -336,6 +1766,32 @@ class AdminApproval(BaseModel):
     status: str  # approved or rejected
     reason: Optional[str] = None
 
+class AdminBulkApproval(BaseModel):
+    ids: List[str]
+    status: str  # approved or rejected
+    reason: Optional[str] = None
+
+class PayoutBatchCreate(BaseModel):
+    max_items: int = MAX_PAYOUT_BATCH_SIZE
+    bank_name: Optional[str] = None
+
+class StatementMatchRun(BaseModel):
+    window_days: int = DEFAULT_MATCH_WINDOW_DAYS
+    auto_approve: bool = False
+
+class StatementLineDecision(BaseModel):
+    line_ids: List[int]
+    action: str  # confirm or dismiss
+
+class QueueLeaseRequest(BaseModel):
+    type: str  # deposits, withdrawals or complaints
+    count: int = 10
+    lease_seconds: int = DEFAULT_LEASE_SECONDS
+
+class QueueRelease(BaseModel):
+    type: str
+    ids: List[str]
+
 class WalletCredit(BaseModel):
     user_id: str
     amount: float
@@ -349,16 +1805,26 @@ def generate_otp():
 def generate_reset_token():
     return secrets.token_urlsafe(32)
 
+@traced("hash.bcrypt_hash")
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
+@traced("hash.bcrypt_verify")
 def verify_password(password: str, hashed: str) -> bool:
     try:
         return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
     except Exception as e:
-        logger.error(f"Password verification error: {e}")
+        logger.error("Password verification error: %s", e)
         return False
 
+# bcrypt is deliberately slow (~0.25 s) and releases the GIL, so handlers run it in AnyIO's
+# thread pool; on the event loop one login would stall every other request on the worker
+async def hash_password_async(password: str) -> str:
+    return await anyio.to_thread.run_sync(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await anyio.to_thread.run_sync(verify_password, password, hashed)
+
 def create_token(user_id: str, role: str = "user", email: str = None) -> str:
     payload = {
         "user_id": user_id,
@@ -374,7 +1840,7 @@ def decode_token(token: str) -> dict:
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except jwt.InvalidTokenError as e:
-        logger.error(f"Invalid token: {e}")
+        logger.error("Invalid token: %s", e)
         raise HTTPException(status_code=401, detail="Invalid token")
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -398,7 +1864,7 @@ async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(
     payload = decode_token(credentials.credentials)
     
     if payload.get("role") not in ["admin", "superadmin"]:
-        logger.warning(f"Non-admin role trying to access admin endpoint: {payload.get('role')}")
+        logger.warning("Non-admin role trying to access admin endpoint: %s", payload.get('role'))
         raise HTTPException(status_code=403, detail="Admin access required")
     
     conn = db.get_connection()
@@ -407,7 +1873,7 @@ async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(
         cursor.execute('SELECT id, email, name, role FROM admins WHERE id = ?', (payload["user_id"],))
     except sqlite3.OperationalError as e:
         # If role column doesn't exist, fall back to basic admin query
-        logger.warning(f"Role column error, using fallback: {e}")
+        logger.warning("Role column error, using fallback: %s", e)
         cursor.execute('SELECT id, email, name FROM admins WHERE id = ?', (payload["user_id"],))
     
     admin = cursor.fetchone()
@@ -425,6 +1891,7 @@ async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(
 
 # ============= EMAIL TEMPLATE FUNCTIONS =============
 
+@traced("template.render")
 def create_email_template(header: str, content: str, action_text: str = None, action_url: str = None) -> str:
     """Create a beautiful HTML email template"""
     return f"""
@@ -592,16 +2059,21 @@ def create_email_template(header: str, content: str, action_text: str = None, ac
 </html>
 """
 
+def build_email_message(to_email: str, subject: str, html_content: str) -> MIMEMultipart:
+    message = MIMEMultipart("alternative")
+    message["From"] = formataddr((SMTP_DISPLAY_NAME, SMTP_EMAIL))
+    message["To"] = to_email
+    message["Subject"] = subject
+    
+    # Create HTML version
+    html_part = MIMEText(html_content, "html")
+    message.attach(html_part)
+    return message
+
+@traced("smtp.send")
 async def send_email(to_email: str, subject: str, html_content: str):
     try:
-        message = MIMEMultipart("alternative")
-        message["From"] = formataddr((SMTP_DISPLAY_NAME, SMTP_EMAIL))
-        message["To"] = to_email
-        message["Subject"] = subject
-        
-        # Create HTML version
-        html_part = MIMEText(html_content, "html")
-        message.attach(html_part)
+        message = build_email_message(to_email, subject, html_content)
         
         await aiosmtplib.send(
             message,
@@ -609,23 +2081,276 @@ async def send_email(to_email: str, subject: str, html_content: str):
             port=SMTP_PORT,
             username=SMTP_EMAIL,
             password=SMTP_PASSWORD,
-            start_tls=True
+            start_tls=SMTP_START_TLS
             # start_tls=SMTP_PORT != 465
         )
-        logger.info(f"Email sent to {to_email}")
+        logger.info("Email sent to %s", to_email)
+        emails_sent.inc("sent")
         return True
     except Exception as e:
-        logger.error(f"Failed to send email to {to_email}: {e}")
+        logger.error("Failed to send email to %s: %s", to_email, e)
+        emails_sent.inc("failed")
         return False
 
+@traced("smtp.send_batch")
+async def send_emails(messages: List[tuple]):
+    """Send (to_email, subject, html_content) messages over a single SMTP session"""
+    if not messages:
+        return 0
+    sent = 0
+    try:
+        smtp = aiosmtplib.SMTP(
+            hostname=SMTP_HOST,
+            port=SMTP_PORT,
+            username=SMTP_EMAIL,
+            password=SMTP_PASSWORD,
+            start_tls=SMTP_START_TLS
+        )
+        async with smtp:
+            for to_email, subject, html_content in messages:
+                try:
+                    await smtp.send_message(build_email_message(to_email, subject, html_content))
+                    sent += 1
+                    logger.info("Email sent to %s", to_email)
+                except aiosmtplib.SMTPRecipientsRefused as e:
+                    logger.error("Failed to send email to %s: %s", to_email, e)
+    except Exception as e:
+        logger.error("Email batch stopped after %s of %s messages: %s", sent, len(messages), e)
+    emails_sent.inc("sent", amount=sent)
+    emails_sent.inc("failed", amount=len(messages) - sent)
+    return sent
+
+def queue_emails(background_tasks: Optional[BackgroundTasks], messages: List[tuple]):
+    """Send (to_email, subject, html_content) messages after the response, or right away
+    in the background when there is no request; counted in the email queue depth until done"""
+    if not messages:
+        return
+    email_queue_depth.inc(amount=len(messages))
+    if background_tasks is not None:
+        background_tasks.add_task(deliver_queued_emails, messages)
+    else:
+        asyncio.create_task(deliver_queued_emails(messages))
+
+def queue_email(background_tasks: Optional[BackgroundTasks], to_email: str, subject: str, html_content: str):
+    queue_emails(background_tasks, [(to_email, subject, html_content)])
+
+@traced("background.deliver_emails")
+async def deliver_queued_emails(messages: List[tuple]):
+    try:
+        if len(messages) == 1:
+            await send_email(*messages[0])
+        else:
+            await send_emails(messages)
+    finally:
+        email_queue_depth.inc(amount=-len(messages))
+
 def format_currency(amount: float) -> str:
     return f"₦{amount:,.2f}"
 
+def bump_change_versions(cursor, *scopes: str):
+    """Increment the change counters behind ETags; call inside the writing transaction"""
+    cursor.executemany('''
+    INSERT INTO change_versions (scope, version) VALUES (?, 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1
+    ''', [(scope,) for scope in scopes])
+
+def bump_stats(cursor, deltas: dict):
+    """Apply deltas to maintained counters; call inside the writing transaction"""
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        cursor.execute('''
+        INSERT INTO stats_counters (name, value) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+        ''', (name, delta))
+
+def bump_rollup(cursor, metric: str, day: str, amount: float = 0, count: int = 1, dimension: str = ""):
+    """Add to a daily rollup bucket; call inside the writing transaction"""
+    cursor.execute('''
+    INSERT INTO daily_rollups (metric, day, dimension, count, amount) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(metric, day, dimension) DO UPDATE SET
+        count = count + excluded.count,
+        amount = amount + excluded.amount
+    ''', (metric, day[:10], dimension, count, amount))
+
+def rebuild_rollups(cursor) -> int:
+    """Recompute every rollup from the transactional tables; returns the number of rollup rows"""
+    cursor.execute('DELETE FROM daily_rollups')
+    for metric, query in ROLLUP_METRICS.items():
+        cursor.execute(f'''
+        INSERT INTO daily_rollups (metric, day, dimension, count, amount)
+        SELECT ?, * FROM ({query})
+        ''', (metric,))
+    cursor.execute('SELECT COUNT(*) AS count FROM daily_rollups')
+    return cursor.fetchone()["count"]
+
+def next_change_seq(cursor) -> int:
+    """Allocate the next global change sequence number inside the writing transaction"""
+    bump_change_versions(cursor, "change_seq")
+    cursor.execute("SELECT version FROM change_versions WHERE scope = 'change_seq'")
+    return cursor.fetchone()["version"]
+
+def record_change(cursor, table: str, user_id: Optional[str] = None, row_id: Optional[str] = None):
+    """Mark `table` (and the owning user, if any) as changed and stamp the row for delta sync"""
+    if user_id:
+        bump_change_versions(cursor, table, f"user:{user_id}")
+    else:
+        bump_change_versions(cursor, table)
+    
+    if table in SYNC_TABLES:
+        if row_id:
+            cursor.execute(f'UPDATE {table} SET change_seq = ? WHERE id = ?', (next_change_seq(cursor), row_id))
+        elif user_id:
+            # users and wallets hold one row per user
+            owner = SYNC_TABLES[table][0]
+            cursor.execute(f'UPDATE {table} SET change_seq = ? WHERE {owner} = ?', (next_change_seq(cursor), user_id))
+
+def conditional_get(request: Request, response: Response, cursor, scopes: List[str]) -> Optional[Response]:
+    """Tag the response with a weak ETag for `scopes`; return a 304 if the client already has it"""
+    placeholders = ', '.join('?' * len(scopes))
+    cursor.execute(f'SELECT scope, version FROM change_versions WHERE scope IN ({placeholders})', scopes)
+    versions = {row["scope"]: row["version"] for row in cursor.fetchall()}
+    
+    token = ';'.join(f"{scope}={versions.get(scope, 0)}" for scope in scopes)
+    etag = f'W/"{hashlib.sha1(token.encode("utf-8")).hexdigest()[:20]}"'
+    
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        if '*' in candidates or etag.removeprefix('W/') in candidates:
+            return Response(status_code=304, headers={"ETag": etag})
+    
+    response.headers["ETag"] = etag
+    return None
+
+def parse_date_bound(value: Optional[str], name: str, end: bool = False) -> Optional[str]:
+    """Normalize a date or datetime query parameter to a UTC ISO string for created_at comparisons"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    # A bare end date covers that whole day
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+def clamp_page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_cursor(*values) -> str:
+    """Encode keyset values into an opaque pagination cursor"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('utf-8').rstrip('=')
+
+def fetch_user_history(cursor, table: str, columns: str, user_id: str, limit: int, page_cursor: Optional[str] = None):
+    """Fetch one page of a user's rows, newest first, and the cursor for the next page"""
+    limit = clamp_page_size(limit)
+    params = [user_id]
+    keyset = ""
+    if page_cursor:
+        keyset = "AND (created_at, id) < (?, ?)"
+        params.extend(decode_cursor(page_cursor, 2))
+    params.append(limit + 1)
+    
+    cursor.execute(f'''
+    SELECT {columns} FROM {table}
+    WHERE user_id = ? {keyset}
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+    ''', params)
+    
+    rows = [dict(row) for row in cursor.fetchall()]
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        return rows[:limit], encode_cursor(last["created_at"], last["id"])
+    return rows, None
+
+def build_fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, each as a prefix"""
+    return " ".join(f'"{term}"*' for term in re.findall(r"\w+", text))
+
+def iter_csv_upload(upload: UploadFile):
+    """Yield rows of an uploaded CSV one at a time as dicts keyed by lower-cased header"""
+    upload.file.seek(0)
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if not header:
+            return
+        keys = [column.strip().lower().replace(" ", "_") for column in header]
+        for values in reader:
+            if any(value.strip() for value in values):
+                yield dict(zip(keys, (value.strip() for value in values)))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8 encoded")
+    finally:
+        text.detach()
+
+CURSOR_SCALAR = (str, int, float, type(None))
+
+def decode_cursor(cursor: str, size: int, types: Optional[tuple] = None) -> list:
+    """Decode a cursor produced by encode_cursor, expecting `size` keyset values.
+    `types` gives the expected type of each value; otherwise any JSON scalar is accepted."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('utf-8')))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # A well-formed cursor with the wrong value types would otherwise fail deep in a query or comparison
+    for value, expected in zip(values, types or (CURSOR_SCALAR,) * size):
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+# ============= EVENT HUB =============
+
+class EventHub:
+    """In-process fan-out of committed changes to /admin/events subscribers.
+    Each subscriber has a bounded queue; one that falls behind loses its backlog and gets a
+    single 'resync' event instead of slowing publishers or growing without bound."""
+    
+    def __init__(self, queue_size: int = SSE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.sequence = 0
+    
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+    
+    def publish(self, event_type: str, data: Optional[dict] = None, counters: Optional[dict] = None):
+        """Queue an event for every subscriber; call after the change is committed"""
+        if not self.subscribers:
+            return
+        self.sequence += 1
+        event = {"id": self.sequence, "type": event_type, "data": data or {}}
+        if counters:
+            event["counters"] = {name: delta for name, delta in counters.items() if delta}
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"id": self.sequence, "type": "resync", "data": {}})
+
+event_hub = EventHub()
+
 # ============= AUTH ROUTES =============
 
 @api_router.post("/auth/register")
 async def register(data: UserRegister, background_tasks: BackgroundTasks):
-    logger.info(f"Registration attempt for email: {data.email}")
+    logger.info("Registration attempt for email: %s", data.email)
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -633,13 +2358,14 @@ async def register(data: UserRegister, background_tasks: BackgroundTasks):
     cursor.execute('SELECT * FROM users WHERE email = ?', (data.email,))
     if cursor.fetchone():
         conn.close()
-        logger.warning(f"Registration failed: Email already registered - {data.email}")
+        logger.warning("Registration failed: Email already registered - %s", data.email)
         raise HTTPException(status_code=400, detail="Email already registered")
     
     user_id = str(uuid.uuid4())
     otp = generate_otp()
     otp_expires = datetime.now(timezone.utc) + timedelta(minutes=30)
     now = datetime.now(timezone.utc).isoformat()
+    password_hash = await hash_password_async(data.password)
     
     try:
         # Insert user
@@ -649,7 +2375,7 @@ async def register(data: UserRegister, background_tasks: BackgroundTasks):
         ''', (
             user_id,
             data.email,
-            hash_password(data.password),
+            password_hash,
             data.full_name,
             data.phone,
             False,
@@ -680,8 +2406,13 @@ async def register(data: UserRegister, background_tasks: BackgroundTasks):
             now
         ))
         
+        record_change(cursor, "users", user_id)
+        record_change(cursor, "wallets", user_id)
+        bump_stats(cursor, {"users.total": 1})
+        bump_rollup(cursor, "signups", now)
         conn.commit()
-        logger.info(f"User registered successfully: {data.email}")
+        event_hub.publish("user.registered", {"id": user_id, "created_at": now}, {"users.total": 1})
+        logger.info("User registered successfully: %s", data.email)
         
         # Send welcome email with OTP
         html = create_email_template(
@@ -698,7 +2429,7 @@ async def register(data: UserRegister, background_tasks: BackgroundTasks):
             </div>
             """
         )
-        background_tasks.add_task(send_email, data.email, "Welcome to FlexInvest - Verify Your Email", html)
+        queue_email(background_tasks, data.email, "Welcome to FlexInvest - Verify Your Email", html)
         
         return {
             "message": "Registration successful. Please verify your email.",
@@ -707,14 +2438,14 @@ async def register(data: UserRegister, background_tasks: BackgroundTasks):
         }
     except Exception as e:
         conn.rollback()
-        logger.error(f"Registration error for {data.email}: {e}")
+        logger.error("Registration error for %s: %s", data.email, e)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         conn.close()
 
 @api_router.post("/auth/verify-otp")
 async def verify_otp(data: OTPVerify, background_tasks: BackgroundTasks):
-    logger.info(f"OTP verification attempt for: {data.email}")
+    logger.info("OTP verification attempt for: %s", data.email)
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -731,24 +2462,25 @@ async def verify_otp(data: OTPVerify, background_tasks: BackgroundTasks):
     
     if not otp_record:
         conn.close()
-        logger.warning(f"No OTP found for: {data.email}")
+        logger.warning("No OTP found for: %s", data.email)
         raise HTTPException(status_code=400, detail="No OTP found. Please request a new one.")
     
     # Check if OTP is expired
     expires_at = datetime.fromisoformat(otp_record["expires_at"].replace('Z', '+00:00'))
     if expires_at < datetime.now(timezone.utc):
         conn.close()
-        logger.warning(f"OTP expired for: {data.email}")
+        logger.warning("OTP expired for: %s", data.email)
         raise HTTPException(status_code=400, detail="OTP has expired. Please request a new one.")
     
     # Verify OTP
     if otp_record["otp"] != data.otp:
         conn.close()
-        logger.warning(f"Invalid OTP for: {data.email}")
+        logger.warning("Invalid OTP for: %s", data.email)
         raise HTTPException(status_code=400, detail="Invalid OTP.")
     
     # Mark user as verified
     cursor.execute('UPDATE users SET is_verified = 1 WHERE id = ?', (otp_record["user_id"],))
+    record_change(cursor, "users", otp_record["user_id"])
     
     # Get user details
     cursor.execute('SELECT id, email, full_name, is_verified FROM users WHERE id = ?', (otp_record["user_id"],))
@@ -756,7 +2488,7 @@ async def verify_otp(data: OTPVerify, background_tasks: BackgroundTasks):
     
     conn.commit()
     conn.close()
-    logger.info(f"Email verified successfully: {data.email}")
+    logger.info("Email verified successfully: %s", data.email)
     
     # Create token for immediate login
     token = create_token(user["id"], "user", user["email"])
@@ -781,7 +2513,7 @@ async def verify_otp(data: OTPVerify, background_tasks: BackgroundTasks):
     )
     
     # Use background_tasks instead of asyncio.create_task
-    background_tasks.add_task(send_email, user["email"], "FlexInvest - Email Verified Successfully", html)
+    queue_email(background_tasks, user["email"], "FlexInvest - Email Verified Successfully", html)
     
     return {
         "message": "Email verified successfully",
@@ -796,7 +2528,7 @@ async def verify_otp(data: OTPVerify, background_tasks: BackgroundTasks):
 
 @api_router.post("/auth/resend-otp")
 async def resend_otp(data: ResendOTP, background_tasks: BackgroundTasks):
-    logger.info(f"Resend OTP request for: {data.email}")
+    logger.info("Resend OTP request for: %s", data.email)
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -807,12 +2539,12 @@ async def resend_otp(data: ResendOTP, background_tasks: BackgroundTasks):
     
     if not user:
         conn.close()
-        logger.warning(f"User not found for OTP resend: {data.email}")
+        logger.warning("User not found for OTP resend: %s", data.email)
         raise HTTPException(status_code=404, detail="User not found")
     
     if user["is_verified"]:
         conn.close()
-        logger.warning(f"User already verified: {data.email}")
+        logger.warning("User already verified: %s", data.email)
         raise HTTPException(status_code=400, detail="Email is already verified")
     
     # Generate new OTP
@@ -835,7 +2567,7 @@ async def resend_otp(data: ResendOTP, background_tasks: BackgroundTasks):
     
     conn.commit()
     conn.close()
-    logger.info(f"New OTP generated for: {data.email}")
+    logger.info("New OTP generated for: %s", data.email)
     
     # Send OTP email
     html = create_email_template(
@@ -852,14 +2584,14 @@ async def resend_otp(data: ResendOTP, background_tasks: BackgroundTasks):
         </div>
         """
     )
-    background_tasks.add_task(send_email, data.email, "FlexInvest - New Verification Code", html)
+    queue_email(background_tasks, data.email, "FlexInvest - New Verification Code", html)
     
     return {"message": "New OTP sent to your email"}
 
 @api_router.post("/auth/forgot-password")
 async def forgot_password(data: ForgotPasswordRequest, background_tasks: BackgroundTasks):
     """Request password reset"""
-    logger.info(f"Forgot password request for: {data.email}")
+    logger.info("Forgot password request for: %s", data.email)
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -870,7 +2602,7 @@ async def forgot_password(data: ForgotPasswordRequest, background_tasks: Backgro
     if not user:
         conn.close()
         # Don't reveal if user exists for security
-        logger.info(f"Password reset requested for non-existent email: {data.email}")
+        logger.info("Password reset requested for non-existent email: %s", data.email)
         return {"message": "If an account exists with this email, you will receive reset instructions"}
     
     # Generate OTP and reset token
@@ -929,14 +2661,14 @@ async def forgot_password(data: ForgotPasswordRequest, background_tasks: Backgro
         """
     )
     
-    background_tasks.add_task(send_email, data.email, "FlexInvest - Password Reset Verification", html)
+    queue_email(background_tasks, data.email, "FlexInvest - Password Reset Verification", html)
     
     return {"message": "Reset instructions sent to your email"}
 
 @api_router.post("/auth/verify-reset-otp")
 async def verify_reset_otp(data: OTPVerify):
     """Verify OTP for password reset"""
-    logger.info(f"Reset OTP verification for: {data.email}")
+    logger.info("Reset OTP verification for: %s", data.email)
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -953,18 +2685,18 @@ async def verify_reset_otp(data: OTPVerify):
     
     if not reset_request:
         conn.close()
-        logger.warning(f"No valid reset request found for: {data.email}")
+        logger.warning("No valid reset request found for: %s", data.email)
         raise HTTPException(status_code=400, detail="Invalid or expired reset request")
     
     # Verify OTP
     if reset_request["otp"] != data.otp:
         conn.close()
-        logger.warning(f"Invalid reset OTP for: {data.email}")
+        logger.warning("Invalid reset OTP for: %s", data.email)
         raise HTTPException(status_code=400, detail="Invalid OTP")
     
     # Mark OTP as verified (but not used for reset yet)
     conn.close()
-    logger.info(f"Reset OTP verified for: {data.email}")
+    logger.info("Reset OTP verified for: %s", data.email)
     
     return {
         "message": "OTP verified successfully",
@@ -974,7 +2706,7 @@ async def verify_reset_otp(data: OTPVerify):
 @api_router.post("/auth/reset-password")
 async def reset_password(data: ResetPasswordRequest, background_tasks: BackgroundTasks):
     """Reset password with OTP verification"""
-    logger.info(f"Password reset attempt for: {data.email}")
+    logger.info("Password reset attempt for: %s", data.email)
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -991,11 +2723,11 @@ async def reset_password(data: ResetPasswordRequest, background_tasks: Backgroun
     
     if not reset_request:
         conn.close()
-        logger.warning(f"Invalid reset request for: {data.email}")
+        logger.warning("Invalid reset request for: %s", data.email)
         raise HTTPException(status_code=400, detail="Invalid or expired reset request")
     
     # Update user password
-    hashed_password = hash_password(data.new_password)
+    hashed_password = await hash_password_async(data.new_password)
     cursor.execute('''
     UPDATE users 
     SET password = ?
@@ -1016,7 +2748,7 @@ async def reset_password(data: ResetPasswordRequest, background_tasks: Backgroun
     conn.commit()
     conn.close()
     
-    logger.info(f"Password reset successful for: {data.email}")
+    logger.info("Password reset successful for: %s", data.email)
     
     # Send password changed notification
     html = create_email_template(
@@ -1045,13 +2777,13 @@ async def reset_password(data: ResetPasswordRequest, background_tasks: Backgroun
     )
     
     # Use background_tasks instead of asyncio.create_task
-    background_tasks.add_task(send_email, user["email"], "FlexInvest - Password Changed", html)
+    queue_email(background_tasks, user["email"], "FlexInvest - Password Changed", html)
     
     return {"message": "Password reset successfully"}
 
 @api_router.post("/auth/login")
 async def user_login(data: UserLogin, background_tasks: BackgroundTasks):
-    logger.info(f"User login attempt: {data.email}")
+    logger.info("User login attempt: %s", data.email)
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -1061,7 +2793,7 @@ async def user_login(data: UserLogin, background_tasks: BackgroundTasks):
     admin_check = cursor.fetchone()
     if admin_check:
         conn.close()
-        logger.warning(f"Admin {data.email} attempted to login as user. Redirecting to admin login.")
+        logger.warning("Admin %s attempted to login as user. Redirecting to admin login.", data.email)
         raise HTTPException(
             status_code=400, 
             detail="This is an admin account. Please use the admin login page."
@@ -1072,19 +2804,19 @@ async def user_login(data: UserLogin, background_tasks: BackgroundTasks):
     conn.close()
     
     if not user:
-        logger.warning(f"User login failed: Email not found - {data.email}")
+        logger.warning("User login failed: Email not found - %s", data.email)
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    if not verify_password(data.password, user["password"]):
-        logger.warning(f"User login failed: Invalid password for - {data.email}")
+    if not await verify_password_async(data.password, user["password"]):
+        logger.warning("User login failed: Invalid password for - %s", data.email)
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     if not user["is_verified"]:
-        logger.warning(f"User login failed: Email not verified - {data.email}")
+        logger.warning("User login failed: Email not verified - %s", data.email)
         raise HTTPException(status_code=403, detail="Please verify your email first")
     
     token = create_token(user["id"], "user", user["email"])
-    logger.info(f"User login successful: {data.email}")
+    logger.info("User login successful: %s", data.email)
     
     # Send login notification email
     html = create_email_template(
@@ -1111,7 +2843,7 @@ async def user_login(data: UserLogin, background_tasks: BackgroundTasks):
         </div>
         """
     )
-    background_tasks.add_task(send_email, data.email, "FlexInvest - New Login Detected", html)
+    queue_email(background_tasks, data.email, "FlexInvest - New Login Detected", html)
     
     return {
         "token": token,
@@ -1125,7 +2857,7 @@ async def user_login(data: UserLogin, background_tasks: BackgroundTasks):
 
 @api_router.post("/admin/login")
 async def admin_login(data: AdminLogin):
-    logger.info(f"Admin login attempt: {data.email}")
+    logger.info("Admin login attempt: %s", data.email)
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -1140,16 +2872,16 @@ async def admin_login(data: AdminLogin):
     conn.close()
     
     if not admin:
-        logger.warning(f"Admin login failed: Email not found - {data.email}")
+        logger.warning("Admin login failed: Email not found - %s", data.email)
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not verify_password(data.password, admin["password"]):
-        logger.warning(f"Admin login failed: Invalid password for - {data.email}")
+    if not await verify_password_async(data.password, admin["password"]):
+        logger.warning("Admin login failed: Invalid password for - %s", data.email)
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     admin_role = admin.get('role', 'admin') if 'role' in admin else 'admin'
     token = create_token(admin["id"], admin_role, admin["email"])
-    logger.info(f"Admin login successful: {data.email} (Role: {admin_role})")
+    logger.info("Admin login successful: %s (Role: %s)", data.email, admin_role)
     
     return {
         "token": token,
@@ -1164,12 +2896,17 @@ async def admin_login(data: AdminLogin):
 # ============= USER ROUTES =============
 
 @api_router.get("/user/profile")
-async def get_profile(user: dict = Depends(get_current_user)):
-    logger.info(f"Profile request: {user['email']}")
+async def get_profile(request: Request, response: Response, user: dict = Depends(get_current_user)):
+    read_logger.info("Profile request: %s", user['email'])
     
     conn = db.get_connection()
     cursor = conn.cursor()
     
+    not_modified = conditional_get(request, response, cursor, [f"user:{user['id']}"])
+    if not_modified:
+        conn.close()
+        return not_modified
+    
     cursor.execute('SELECT balance FROM wallets WHERE user_id = ?', (user["id"],))
     wallet = cursor.fetchone()
     
@@ -1189,25 +2926,30 @@ async def get_profile(user: dict = Depends(get_current_user)):
     }
 
 @api_router.get("/user/wallet")
-async def get_wallet(user: dict = Depends(get_current_user)):
-    logger.info(f"Wallet request: {user['email']}")
+async def get_wallet(request: Request, response: Response, user: dict = Depends(get_current_user)):
+    read_logger.info("Wallet request: %s", user['email'])
     
     conn = db.get_connection()
     cursor = conn.cursor()
     
+    not_modified = conditional_get(request, response, cursor, [f"user:{user['id']}"])
+    if not_modified:
+        conn.close()
+        return not_modified
+    
     cursor.execute('SELECT * FROM wallets WHERE user_id = ?', (user["id"],))
     wallet = cursor.fetchone()
     conn.close()
     
     if not wallet:
-        logger.warning(f"Wallet not found for user: {user['email']}")
+        logger.warning("Wallet not found for user: %s", user['email'])
         raise HTTPException(status_code=404, detail="Wallet not found")
     
     return dict(wallet)
 
 @api_router.post("/user/bank-account")
 async def create_bank_account(data: BankAccountCreate, user: dict = Depends(get_current_user)):
-    logger.info(f"Bank account update: {user['email']}")
+    logger.info("Bank account update: %s", user['email'])
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -1229,9 +2971,10 @@ async def create_bank_account(data: BankAccountCreate, user: dict = Depends(get_
             now,
             user["id"]
         ))
+        record_change(cursor, "bank_accounts", user["id"])
         conn.commit()
         conn.close()
-        logger.info(f"Bank account updated: {user['email']}")
+        logger.info("Bank account updated: %s", user['email'])
         return {"message": "Bank account updated successfully"}
     else:
         cursor.execute('''
@@ -1246,38 +2989,135 @@ async def create_bank_account(data: BankAccountCreate, user: dict = Depends(get_
             now,
             now
         ))
+        record_change(cursor, "bank_accounts", user["id"])
         conn.commit()
         conn.close()
-        logger.info(f"Bank account created: {user['email']}")
+        logger.info("Bank account created: %s", user['email'])
         return {"message": "Bank account added successfully"}
 
 @api_router.get("/user/bank-account")
-async def get_bank_account(user: dict = Depends(get_current_user)):
-    logger.info(f"Bank account request: {user['email']}")
+async def get_bank_account(request: Request, response: Response, user: dict = Depends(get_current_user)):
+    read_logger.info("Bank account request: %s", user['email'])
     
     conn = db.get_connection()
     cursor = conn.cursor()
     
+    not_modified = conditional_get(request, response, cursor, [f"user:{user['id']}"])
+    if not_modified:
+        conn.close()
+        return not_modified
+    
     cursor.execute('SELECT * FROM bank_accounts WHERE user_id = ?', (user["id"],))
     bank_account = cursor.fetchone()
     conn.close()
     
     return dict(bank_account) if bank_account else None
 
+@api_router.get("/user/dashboard")
+async def get_dashboard(request: Request, response: Response, fields: Optional[str] = None, user: dict = Depends(get_current_user)):
+    """Everything the user pages render on load, read in a single transaction"""
+    read_logger.info("Dashboard request: %s", user['email'])
+    
+    if fields:
+        selected = {f.strip() for f in fields.split(',') if f.strip()}
+        unknown = selected - set(DASHBOARD_FIELDS)
+        if unknown or not selected:
+            raise HTTPException(status_code=400, detail=f"Invalid dashboard fields: {', '.join(sorted(unknown)) or fields}")
+    else:
+        selected = set(DASHBOARD_FIELDS)
+    
+    result = {}
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        not_modified = conditional_get(request, response, cursor, [f"user:{user['id']}", "profit_run"])
+        if not_modified:
+            return not_modified
+        
+        # One read transaction so every section reflects the same snapshot
+        cursor.execute('BEGIN')
+        
+        if "profile" in selected:
+            result["profile"] = {
+                "id": user["id"],
+                "email": user["email"],
+                "full_name": user["full_name"],
+                "phone": user.get("phone", ""),
+                "is_verified": user["is_verified"]
+            }
+        
+        if "wallet" in selected:
+            cursor.execute('''
+            SELECT w.balance,
+                   (SELECT COALESCE(SUM(amount), 0) FROM withdrawals
+                    WHERE user_id = w.user_id AND status = 'pending') AS held
+            FROM wallets w
+            WHERE w.user_id = ?
+            ''', (user["id"],))
+            wallet = cursor.fetchone()
+            balance = wallet["balance"] if wallet else 0
+            held = wallet["held"] if wallet else 0
+            result["wallet"] = {"balance": balance, "held": held, "available": balance - held}
+        
+        if "bank_account" in selected:
+            cursor.execute('SELECT * FROM bank_accounts WHERE user_id = ?', (user["id"],))
+            bank_account = cursor.fetchone()
+            result["bank_account"] = dict(bank_account) if bank_account else None
+        
+        if "packages" in selected:
+            result["packages"] = INVESTMENT_PACKAGES
+        
+        if "investments" in selected:
+            cursor.execute('''
+            SELECT * FROM investments 
+            WHERE user_id = ? AND status = 'active'
+            ORDER BY created_at DESC
+            ''', (user["id"],))
+            investments = []
+            for row in cursor.fetchall():
+                investment = dict(row)
+                investment["days_remaining"] = max(investment["duration"] - investment["days_completed"], 0)
+                investment["progress"] = round(investment["days_completed"] / investment["duration"] * 100, 2) if investment["duration"] else 0
+                investments.append(investment)
+            result["investments"] = investments
+        
+        if "recent_transactions" in selected:
+            result["recent_transactions"] = fetch_transaction_feed(
+                cursor, user["id"], list(TRANSACTION_FEED_SOURCES), DASHBOARD_RECENT_TRANSACTIONS
+            )
+        
+        if "summary" in selected:
+            cursor.execute('''
+            SELECT
+                (SELECT COALESCE(SUM(amount), 0) FROM deposits WHERE user_id = :user_id AND status = 'approved') AS total_deposited,
+                (SELECT COALESCE(SUM(amount), 0) FROM withdrawals WHERE user_id = :user_id AND status = 'approved') AS total_withdrawn,
+                (SELECT COALESCE(SUM(capital), 0) FROM investments WHERE user_id = :user_id) AS total_invested,
+                (SELECT COALESCE(SUM(profit_earned), 0) FROM investments WHERE user_id = :user_id) AS total_profit_earned,
+                (SELECT COUNT(*) FROM investments WHERE user_id = :user_id AND status = 'active') AS active_investments
+            ''', {"user_id": user["id"]})
+            result["summary"] = dict(cursor.fetchone())
+        
+        conn.commit()
+    finally:
+        conn.close()
+    
+    return result
+
 # ============= INVESTMENT ROUTES =============
 
 @api_router.get("/investments/packages")
 async def get_packages():
-    logger.info("Investment packages requested")
+    read_logger.info("Investment packages requested")
     return {"packages": INVESTMENT_PACKAGES}
 
 @api_router.post("/investments/subscribe")
 async def subscribe_to_package(data: InvestmentCreate, user: dict = Depends(get_current_user), background_tasks: BackgroundTasks = None):
-    logger.info(f"Investment subscription attempt: {user['email']} - Package: {data.package_id}")
+    logger.info("Investment subscription attempt: %s - Package: %s", user['email'], data.package_id)
     
     package = next((p for p in INVESTMENT_PACKAGES if p["id"] == data.package_id), None)
     if not package:
-        logger.warning(f"Package not found: {data.package_id}")
+        logger.warning("Package not found: %s", data.package_id)
         raise HTTPException(status_code=404, detail="Package not found")
     
     conn = db.get_connection()
@@ -1288,7 +3128,7 @@ async def subscribe_to_package(data: InvestmentCreate, user: dict = Depends(get_
     
     if not wallet or wallet["balance"] < package["capital"]:
         conn.close()
-        logger.warning(f"Insufficient balance: {user['email']} - Balance: {wallet['balance'] if wallet else 0}, Required: {package['capital']}")
+        logger.warning("Insufficient balance: %s - Balance: %s, Required: %s", user['email'], wallet['balance'] if wallet else 0, package['capital'])
         raise HTTPException(status_code=400, detail="Insufficient wallet balance")
     
     # Deduct from wallet
@@ -1320,9 +3160,15 @@ async def subscribe_to_package(data: InvestmentCreate, user: dict = Depends(get_
         now
     ))
     
+    record_change(cursor, "wallets", user["id"])
+    record_change(cursor, "investments", user["id"], investment_id)
+    bump_stats(cursor, {"investments.active": 1})
+    bump_rollup(cursor, "new_investments", now, package["capital"], dimension=package["id"])
+    bump_rollup(cursor, "maturities", end_date, package["total_return"], dimension=package["id"])
     conn.commit()
     conn.close()
-    logger.info(f"Investment started: {user['email']} - Package: {package['capital']}")
+    event_hub.publish("investment.created", {"id": investment_id, "user_id": user["id"], "package_id": package["id"]}, {"investments.active": 1})
+    logger.info("Investment started: %s - Package: %s", user['email'], package['capital'])
     
     # Send investment confirmation email
     html = create_email_template(
@@ -1376,7 +3222,7 @@ async def subscribe_to_package(data: InvestmentCreate, user: dict = Depends(get_
     )
     
     if background_tasks:
-        background_tasks.add_task(send_email, user["email"], "FlexInvest - Investment Started", html)
+        queue_email(background_tasks, user["email"], "FlexInvest - Investment Started", html)
     
     return {
         "message": "Investment started successfully",
@@ -1385,12 +3231,17 @@ async def subscribe_to_package(data: InvestmentCreate, user: dict = Depends(get_
     }
 
 @api_router.get("/investments/active")
-async def get_active_investments(user: dict = Depends(get_current_user)):
-    logger.info(f"Active investments request: {user['email']}")
+async def get_active_investments(request: Request, response: Response, user: dict = Depends(get_current_user)):
+    read_logger.info("Active investments request: %s", user['email'])
     
     conn = db.get_connection()
     cursor = conn.cursor()
     
+    not_modified = conditional_get(request, response, cursor, [f"user:{user['id']}", "profit_run"])
+    if not_modified:
+        conn.close()
+        return not_modified
+    
     cursor.execute('''
     SELECT * FROM investments 
     WHERE user_id = ? AND status = 'active'
@@ -1403,28 +3254,25 @@ async def get_active_investments(user: dict = Depends(get_current_user)):
     return {"investments": [dict(inv) for inv in investments]}
 
 @api_router.get("/investments/history")
-async def get_investment_history(user: dict = Depends(get_current_user)):
-    logger.info(f"Investment history request: {user['email']}")
+async def get_investment_history(request: Request, response: Response, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, user: dict = Depends(get_current_user)):
+    read_logger.info("Investment history request: %s", user['email'])
     
     conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT * FROM investments 
-    WHERE user_id = ?
-    ORDER BY created_at DESC
-    ''', (user["id"],))
+    not_modified = conditional_get(request, response, conn.cursor(), [f"user:{user['id']}", "profit_run"])
+    if not_modified:
+        conn.close()
+        return not_modified
     
-    investments = cursor.fetchall()
+    investments, next_cursor = fetch_user_history(conn.cursor(), "investments", "*", user["id"], limit, cursor)
     conn.close()
     
-    return {"investments": [dict(inv) for inv in investments]}
+    return {"investments": investments, "next_cursor": next_cursor}
 
 # ============= DEPOSIT ROUTES =============
 
 @api_router.get("/deposits/company-bank")
 async def get_company_bank():
-    logger.info("Company bank details requested")
+    read_logger.info("Company bank details requested")
     return {"bank": COMPANY_BANK}
 
 @api_router.post("/deposits/create")
@@ -1434,10 +3282,10 @@ async def create_deposit(
     user: dict = Depends(get_current_user),
     background_tasks: BackgroundTasks = None
 ):
-    logger.info(f"Deposit creation: {user['email']} - Amount: {amount}")
+    logger.info("Deposit creation: %s - Amount: %s", user['email'], amount)
     
     if amount <= 0:
-        logger.warning(f"Invalid deposit amount: {amount}")
+        logger.warning("Invalid deposit amount: %s", amount)
         raise HTTPException(status_code=400, detail="Amount must be positive")
     
     # Read and encode proof image
@@ -1469,9 +3317,14 @@ async def create_deposit(
         now
     ))
     
+    record_change(cursor, "deposits", user["id"], deposit_id)
+    bump_stats(cursor, {"deposits.pending": 1})
     conn.commit()
     conn.close()
-    logger.info(f"Deposit created: {user['email']} - ID: {deposit_id}")
+    event_hub.publish("deposit.created", {
+        "id": deposit_id, "user_id": user["id"], "user_name": user["full_name"], "amount": amount, "created_at": now
+    }, {"deposits.pending": 1})
+    logger.info("Deposit created: %s - ID: %s", user['email'], deposit_id)
     
     # Send deposit confirmation email
     html = create_email_template(
@@ -1513,7 +3366,7 @@ async def create_deposit(
     )
     
     if background_tasks:
-        background_tasks.add_task(send_email, user["email"], "FlexInvest - Deposit Request Submitted", html)
+        queue_email(background_tasks, user["email"], "FlexInvest - Deposit Request Submitted", html)
     
     return {
         "message": "Deposit request submitted successfully",
@@ -1522,32 +3375,35 @@ async def create_deposit(
     }
 
 @api_router.get("/deposits/history")
-async def get_deposit_history(user: dict = Depends(get_current_user)):
-    logger.info(f"Deposit history request: {user['email']}")
+async def get_deposit_history(request: Request, response: Response, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, user: dict = Depends(get_current_user)):
+    read_logger.info("Deposit history request: %s", user['email'])
     
     conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT id, user_id, user_email, user_name, amount, status, admin_note, created_at, updated_at
-    FROM deposits 
-    WHERE user_id = ?
-    ORDER BY created_at DESC
-    ''', (user["id"],))
+    not_modified = conditional_get(request, response, conn.cursor(), [f"user:{user['id']}"])
+    if not_modified:
+        conn.close()
+        return not_modified
     
-    deposits = cursor.fetchall()
+    deposits, next_cursor = fetch_user_history(
+        conn.cursor(),
+        "deposits",
+        "id, user_id, user_email, user_name, amount, status, admin_note, created_at, updated_at",
+        user["id"],
+        limit,
+        cursor
+    )
     conn.close()
     
-    return {"deposits": [dict(dep) for dep in deposits]}
+    return {"deposits": deposits, "next_cursor": next_cursor}
 
 # ============= WITHDRAWAL ROUTES =============
 
 @api_router.post("/withdrawals/create")
 async def create_withdrawal(data: WithdrawalCreate, user: dict = Depends(get_current_user), background_tasks: BackgroundTasks = None):
-    logger.info(f"Withdrawal request: {user['email']} - Amount: {data.amount}")
+    logger.info("Withdrawal request: %s - Amount: %s", user['email'], data.amount)
     
     if data.amount <= 0:
-        logger.warning(f"Invalid withdrawal amount: {data.amount}")
+        logger.warning("Invalid withdrawal amount: %s", data.amount)
         raise HTTPException(status_code=400, detail="Amount must be positive")
     
     conn = db.get_connection()
@@ -1558,7 +3414,7 @@ async def create_withdrawal(data: WithdrawalCreate, user: dict = Depends(get_cur
     
     if not bank_account:
         conn.close()
-        logger.warning(f"No bank account found for: {user['email']}")
+        logger.warning("No bank account found for: %s", user['email'])
         raise HTTPException(status_code=400, detail="Please add a bank account first")
     
     cursor.execute('SELECT balance FROM wallets WHERE user_id = ?', (user["id"],))
@@ -1566,7 +3422,7 @@ async def create_withdrawal(data: WithdrawalCreate, user: dict = Depends(get_cur
     
     if not wallet or wallet["balance"] < data.amount:
         conn.close()
-        logger.warning(f"Insufficient balance for withdrawal: {user['email']} - Balance: {wallet['balance'] if wallet else 0}, Requested: {data.amount}")
+        logger.warning("Insufficient balance for withdrawal: %s - Balance: %s, Requested: %s", user['email'], wallet['balance'] if wallet else 0, data.amount)
         raise HTTPException(status_code=400, detail="Insufficient wallet balance")
     
     withdrawal_id = str(uuid.uuid4())
@@ -1591,9 +3447,14 @@ async def create_withdrawal(data: WithdrawalCreate, user: dict = Depends(get_cur
         now
     ))
     
+    record_change(cursor, "withdrawals", user["id"], withdrawal_id)
+    bump_stats(cursor, {"withdrawals.pending": 1})
     conn.commit()
     conn.close()
-    logger.info(f"Withdrawal created: {user['email']} - ID: {withdrawal_id}")
+    event_hub.publish("withdrawal.created", {
+        "id": withdrawal_id, "user_id": user["id"], "user_name": user["full_name"], "amount": data.amount, "created_at": now
+    }, {"withdrawals.pending": 1})
+    logger.info("Withdrawal created: %s - ID: %s", user['email'], withdrawal_id)
     
     # Send withdrawal request email
     html = create_email_template(
@@ -1639,7 +3500,7 @@ async def create_withdrawal(data: WithdrawalCreate, user: dict = Depends(get_cur
     )
     
     if background_tasks:
-        background_tasks.add_task(send_email, user["email"], "FlexInvest - Withdrawal Request Submitted", html)
+        queue_email(background_tasks, user["email"], "FlexInvest - Withdrawal Request Submitted", html)
     
     return {
         "message": "Withdrawal request submitted successfully",
@@ -1647,28 +3508,98 @@ async def create_withdrawal(data: WithdrawalCreate, user: dict = Depends(get_cur
     }
 
 @api_router.get("/withdrawals/history")
-async def get_withdrawal_history(user: dict = Depends(get_current_user)):
-    logger.info(f"Withdrawal history request: {user['email']}")
+async def get_withdrawal_history(request: Request, response: Response, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, user: dict = Depends(get_current_user)):
+    read_logger.info("Withdrawal history request: %s", user['email'])
     
     conn = db.get_connection()
-    cursor = conn.cursor()
+    not_modified = conditional_get(request, response, conn.cursor(), [f"user:{user['id']}"])
+    if not_modified:
+        conn.close()
+        return not_modified
     
-    cursor.execute('''
-    SELECT * FROM withdrawals 
-    WHERE user_id = ?
-    ORDER BY created_at DESC
-    ''', (user["id"],))
+    withdrawals, next_cursor = fetch_user_history(conn.cursor(), "withdrawals", "*", user["id"], limit, cursor)
+    conn.close()
+    
+    return {"withdrawals": withdrawals, "next_cursor": next_cursor}
+
+# ============= TRANSACTION ROUTES =============
+
+def fetch_transaction_feed(cursor, user_id: str, types: List[str], limit: int, after: Optional[list] = None) -> List[dict]:
+    """Return up to `limit` feed items for a user, newest first, strictly after the (created_at, id) keyset"""
+    branches = []
+    params = []
+    for tx_type in types:
+        table, amount_col, description_col, fixed_status = TRANSACTION_FEED_SOURCES[tx_type]
+        status_col = "?" if fixed_status else "status"
+        keyset = "AND (created_at, id) < (?, ?)" if after else ""
+        # Each branch is limited on its own so it can walk its (user_id, created_at, id) index
+        branches.append(f'''
+        SELECT * FROM (
+            SELECT id, ? AS type, {amount_col} AS amount, {status_col} AS status,
+                   {description_col} AS description, created_at
+            FROM {table}
+            WHERE user_id = ? {keyset}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        )''')
+        params.append(tx_type)
+        if fixed_status:
+            params.append(fixed_status)
+        params.append(user_id)
+        if after:
+            params.extend(after)
+        params.append(limit)
+    
+    query = " UNION ALL ".join(branches) + " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit)
+    cursor.execute(query, params)
+    return [dict(row) for row in cursor.fetchall()]
+
+@api_router.get("/transactions/feed")
+async def get_transaction_feed(
+    request: Request,
+    response: Response,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    types: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    """Unified, time-ordered feed of deposits, withdrawals, investments and credits"""
+    read_logger.info("Transaction feed request: %s", user['email'])
+    
+    if types:
+        selected_types = [t.strip() for t in types.split(',') if t.strip()]
+        unknown = [t for t in selected_types if t not in TRANSACTION_FEED_SOURCES]
+        if unknown or not selected_types:
+            raise HTTPException(status_code=400, detail=f"Invalid transaction types: {', '.join(unknown) or types}")
+    else:
+        selected_types = list(TRANSACTION_FEED_SOURCES)
+    
+    limit = clamp_page_size(limit)
+    after = decode_cursor(cursor, 2) if cursor else None
     
-    withdrawals = cursor.fetchall()
+    conn = db.get_connection()
+    db_cursor = conn.cursor()
+    not_modified = conditional_get(request, response, db_cursor, [f"user:{user['id']}"])
+    if not_modified:
+        conn.close()
+        return not_modified
+    
+    # Fetch one extra row to know whether another page exists
+    items = fetch_transaction_feed(db_cursor, user["id"], selected_types, limit + 1, after)
     conn.close()
     
-    return {"withdrawals": [dict(w) for w in withdrawals]}
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["id"]) if has_more else None
+    
+    return {"transactions": items, "next_cursor": next_cursor}
 
 # ============= COMPLAINT ROUTES =============
 
 @api_router.post("/complaints/create")
 async def create_complaint(data: ComplaintCreate, user: dict = Depends(get_current_user), background_tasks: BackgroundTasks = None):
-    logger.info(f"Complaint creation: {user['email']} - Subject: {data.subject[:50]}...")
+    logger.info("Complaint creation: %s - Subject: %s...", user['email'], data.subject[:50])
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -1693,9 +3624,14 @@ async def create_complaint(data: ComplaintCreate, user: dict = Depends(get_curre
         now
     ))
     
+    record_change(cursor, "complaints", user["id"], complaint_id)
+    bump_stats(cursor, {"complaints.open": 1})
     conn.commit()
     conn.close()
-    logger.info(f"Complaint created: {user['email']} - ID: {complaint_id}")
+    event_hub.publish("complaint.created", {
+        "id": complaint_id, "user_id": user["id"], "user_name": user["full_name"], "subject": data.subject, "created_at": now
+    }, {"complaints.open": 1})
+    logger.info("Complaint created: %s - ID: %s", user['email'], complaint_id)
     
     # Send complaint confirmation email
     html = create_email_template(
@@ -1736,7 +3672,7 @@ async def create_complaint(data: ComplaintCreate, user: dict = Depends(get_curre
     )
     
     if background_tasks:
-        background_tasks.add_task(send_email, user["email"], "FlexInvest - Complaint Submitted", html)
+        queue_email(background_tasks, user["email"], "FlexInvest - Complaint Submitted", html)
     
     return {
         "message": "Complaint submitted successfully",
@@ -1744,126 +3680,446 @@ async def create_complaint(data: ComplaintCreate, user: dict = Depends(get_curre
     }
 
 @api_router.get("/complaints/history")
-async def get_complaint_history(user: dict = Depends(get_current_user)):
-    logger.info(f"Complaint history request: {user['email']}")
+async def get_complaint_history(request: Request, response: Response, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, user: dict = Depends(get_current_user)):
+    read_logger.info("Complaint history request: %s", user['email'])
     
     conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT * FROM complaints 
-    WHERE user_id = ?
-    ORDER BY created_at DESC
-    ''', (user["id"],))
+    not_modified = conditional_get(request, response, conn.cursor(), [f"user:{user['id']}"])
+    if not_modified:
+        conn.close()
+        return not_modified
     
-    complaints = cursor.fetchall()
+    complaints, next_cursor = fetch_user_history(conn.cursor(), "complaints", "*", user["id"], limit, cursor)
     conn.close()
     
-    return {"complaints": [dict(c) for c in complaints]}
+    return {"complaints": complaints, "next_cursor": next_cursor}
+
+# ============= SYNC ROUTES =============
+
+def parse_sync_since(since: str, table_count: int) -> list:
+    """Turn `since` (a plain sequence number or a cursor from a previous page) into a (seq, table, id) keyset"""
+    if since.isdigit():
+        # Past every table at this sequence number
+        return [int(since), table_count, ""]
+    after_seq, after_table, after_id = decode_cursor(since, 3, (int, int, str))
+    if after_seq < 0 or not 0 <= after_table <= table_count:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return [after_seq, after_table, after_id]
+
+def fetch_changes(cursor, tables: List[str], since: str, limit: int, user_id: Optional[str] = None) -> dict:
+    """Rows changed after `since`, ordered by (change_seq, table, id), plus the cursor to resume from"""
+    after_seq, after_table, after_id = parse_sync_since(since, len(tables))
+    
+    # One read transaction so the returned cursor matches the rows we saw
+    cursor.execute('BEGIN')
+    cursor.execute("SELECT version FROM change_versions WHERE scope = 'change_seq'")
+    row = cursor.fetchone()
+    current_seq = row["version"] if row else 0
+    
+    candidates = []
+    for index, table in enumerate(tables):
+        owner, columns = SYNC_TABLES[table]
+        if index < after_table:
+            keyset, params = "change_seq > ?", [after_seq]
+        elif index == after_table:
+            keyset, params = "(change_seq, id) > (?, ?)", [after_seq, after_id]
+        else:
+            keyset, params = "change_seq >= ?", [after_seq]
+        
+        owner_filter = ""
+        if user_id:
+            owner_filter = f"{owner} = ? AND "
+            params.insert(0, user_id)
+        
+        cursor.execute(f'''
+        SELECT {columns} FROM {table}
+        WHERE {owner_filter}{keyset}
+        ORDER BY change_seq, id
+        LIMIT ?
+        ''', params + [limit + 1])
+        candidates.extend((row["change_seq"], index, row["id"], dict(row)) for row in cursor.fetchall())
+    
+    cursor.execute('COMMIT')
+    
+    candidates.sort(key=lambda c: c[:3])
+    has_more = len(candidates) > limit
+    page = candidates[:limit]
+    
+    changes = {table: [] for table in tables}
+    for _, index, _, row in page:
+        changes[tables[index]].append(row)
+    
+    if has_more:
+        last_seq, last_table, last_id, _ = page[-1]
+        next_cursor = encode_cursor(last_seq, last_table, last_id)
+    else:
+        next_cursor = str(max(current_seq, after_seq))
+    
+    return {"changes": changes, "cursor": next_cursor, "has_more": has_more}
+
+def parse_sync_tables(tables: Optional[str]) -> List[str]:
+    if not tables:
+        return list(SYNC_TABLES)
+    selected = [t.strip() for t in tables.split(',') if t.strip()]
+    unknown = [t for t in selected if t not in SYNC_TABLES]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Invalid sync tables: {', '.join(unknown) or tables}")
+    # Keep the canonical order so cursors stay comparable between pages
+    return [t for t in SYNC_TABLES if t in selected]
+
+@api_router.get("/sync")
+async def sync_user_changes(since: str = "0", limit: int = DEFAULT_SYNC_PAGE_SIZE, tables: Optional[str] = None, user: dict = Depends(get_current_user)):
+    """The user's rows changed since a cursor"""
+    read_logger.info("Sync request: %s - Since: %s", user['email'], since)
+    
+    selected = parse_sync_tables(tables)
+    limit = max(1, min(limit, MAX_SYNC_PAGE_SIZE))
+    
+    conn = db.get_connection()
+    try:
+        return fetch_changes(conn.cursor(), selected, since, limit, user["id"])
+    finally:
+        conn.close()
+
+@api_router.get("/admin/sync")
+async def sync_admin_changes(since: str = "0", limit: int = DEFAULT_SYNC_PAGE_SIZE, tables: Optional[str] = None, admin: dict = Depends(get_current_admin)):
+    """All rows changed since a cursor"""
+    read_logger.info("Admin sync request: %s - Since: %s", admin['email'], since)
+    
+    selected = parse_sync_tables(tables)
+    limit = max(1, min(limit, MAX_SYNC_PAGE_SIZE))
+    
+    conn = db.get_connection()
+    try:
+        return fetch_changes(conn.cursor(), selected, since, limit)
+    finally:
+        conn.close()
 
 @api_router.get("/support/links")
 async def get_support_links():
-    logger.info("Support links requested")
+    read_logger.info("Support links requested")
     return {"links": SUPPORT_LINKS}
 
 # ============= ADMIN ENDPOINTS =============
 
+class AdminQueueFilters:
+    """Validated listing options shared by the admin deposit, withdrawal and complaint queues"""
+    
+    def __init__(self, status: Optional[str], limit: int, cursor: Optional[str], order: str,
+                 date_from: Optional[str], date_to: Optional[str],
+                 min_amount: Optional[float] = None, max_amount: Optional[float] = None):
+        if order not in ("asc", "desc"):
+            raise HTTPException(status_code=400, detail=f"Invalid order: {order}")
+        self.status = status
+        self.limit = clamp_page_size(limit)
+        self.after = decode_cursor(cursor, 2) if cursor else None
+        self.order = order
+        self.date_from = parse_date_bound(date_from, "date_from")
+        self.date_to = parse_date_bound(date_to, "date_to", end=True)
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+
+def read_status_counts(cursor, table: str) -> dict:
+    """Per-status row counts for a queue, from the maintained counters"""
+    cursor.execute('''
+    SELECT name, value FROM stats_counters WHERE name > ? AND name < ?
+    ''', (f"{table}.", f"{table}/"))
+    counts = {}
+    for row in cursor.fetchall():
+        suffix = row["name"][len(table) + 1:]
+        if '.' not in suffix:
+            counts[suffix] = int(row["value"])
+    return counts
+
+def fetch_admin_queue(cursor, table: str, filters: AdminQueueFilters):
+    """One keyset page of an admin queue, newest (or oldest) first, with status counts"""
+    conditions = []
+    params = []
+    
+    # Status first so pending queues walk the (status, created_at, id) index
+    if filters.status:
+        conditions.append("status = ?")
+        params.append(filters.status)
+    if filters.date_from:
+        conditions.append("created_at >= ?")
+        params.append(filters.date_from)
+    if filters.date_to:
+        conditions.append("created_at < ?")
+        params.append(filters.date_to)
+    if filters.min_amount is not None:
+        conditions.append("amount >= ?")
+        params.append(filters.min_amount)
+    if filters.max_amount is not None:
+        conditions.append("amount <= ?")
+        params.append(filters.max_amount)
+    if filters.after:
+        conditions.append(f"(created_at, id) {'<' if filters.order == 'desc' else '>'} (?, ?)")
+        params.extend(filters.after)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    direction = "DESC" if filters.order == "desc" else "ASC"
+    
+    cursor.execute(f'''
+    SELECT {ADMIN_QUEUE_TABLES[table]} FROM {table}
+    {where}
+    ORDER BY created_at {direction}, id {direction}
+    LIMIT ?
+    ''', params + [filters.limit + 1])
+    rows = [dict(row) for row in cursor.fetchall()]
+    
+    next_cursor = None
+    if len(rows) > filters.limit:
+        rows = rows[:filters.limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    
+    return rows, next_cursor, read_status_counts(cursor, table)
+
 @api_router.get("/admin/dashboard")
-async def admin_dashboard(admin: dict = Depends(get_current_admin)):
-    logger.info(f"Admin dashboard request: {admin['email']}")
+async def admin_dashboard(request: Request, response: Response, admin: dict = Depends(get_current_admin)):
+    logger.info("Admin dashboard request: %s", admin['email'])
     
     conn = db.get_connection()
     cursor = conn.cursor()
     
-    # Count queries
-    cursor.execute('SELECT COUNT(*) as count FROM users')
-    total_users = cursor.fetchone()["count"]
-    
-    cursor.execute('SELECT COUNT(*) as count FROM deposits WHERE status = ?', ("pending",))
-    pending_deposits = cursor.fetchone()["count"]
-    
-    cursor.execute('SELECT COUNT(*) as count FROM withdrawals WHERE status = ?', ("pending",))
-    pending_withdrawals = cursor.fetchone()["count"]
+    not_modified = conditional_get(request, response, cursor, ["users", "deposits", "withdrawals", "complaints", "investments"])
+    if not_modified:
+        conn.close()
+        return not_modified
     
-    cursor.execute('SELECT COUNT(*) as count FROM complaints WHERE status = ?', ("open",))
-    open_complaints = cursor.fetchone()["count"]
+    # Maintained counters, so this is one primary-key lookup instead of full-table aggregates
+    placeholders = ', '.join('?' * len(ADMIN_DASHBOARD_COUNTERS))
+    cursor.execute(
+        f'SELECT name, value FROM stats_counters WHERE name IN ({placeholders})',
+        list(ADMIN_DASHBOARD_COUNTERS.values())
+    )
+    values = {row["name"]: row["value"] for row in cursor.fetchall()}
+    conn.close()
     
-    cursor.execute('SELECT COUNT(*) as count FROM investments WHERE status = ?', ("active",))
-    active_investments = cursor.fetchone()["count"]
+    result = {}
+    for field, name in ADMIN_DASHBOARD_COUNTERS.items():
+        value = values.get(name, 0)
+        result[field] = value if name.endswith(".amount") else int(value)
+    return result
+
+@api_router.get("/admin/analytics")
+async def admin_analytics(
+    metric: str,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    bucket: str = "day",
+    admin: dict = Depends(get_current_admin)
+):
+    """Time series for a metric, read only from the daily rollups"""
+    logger.info("Admin analytics request: %s - Metric: %s", admin['email'], metric)
     
-    # Sum queries
-    cursor.execute('SELECT SUM(amount) as total FROM deposits WHERE status = ?', ("approved",))
-    total_deposited = cursor.fetchone()["total"] or 0
+    if metric not in ROLLUP_METRICS:
+        raise HTTPException(status_code=400, detail=f"Invalid metric: {metric}")
+    if bucket not in ANALYTICS_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Invalid bucket: {bucket}")
     
-    cursor.execute('SELECT SUM(amount) as total FROM withdrawals WHERE status = ?', ("approved",))
-    total_withdrawn = cursor.fetchone()["total"] or 0
+    today = datetime.now(timezone.utc).date()
+    try:
+        end = datetime.fromisoformat(date_to).date() if date_to else today
+        start = datetime.fromisoformat(date_from).date() if date_from else end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    if start > end:
+        raise HTTPException(status_code=400, detail="from must not be after to")
     
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+    SELECT {ANALYTICS_BUCKETS[bucket]} AS bucket, dimension, SUM(count) AS count, SUM(amount) AS amount
+    FROM daily_rollups
+    WHERE metric = ? AND day >= ? AND day <= ?
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    ''', (metric, start.isoformat(), end.isoformat()))
+    series = [dict(row) for row in cursor.fetchall()]
     conn.close()
     
     return {
-        "total_users": total_users,
-        "pending_deposits": pending_deposits,
-        "pending_withdrawals": pending_withdrawals,
-        "open_complaints": open_complaints,
-        "active_investments": active_investments,
-        "total_deposited": total_deposited,
-        "total_withdrawn": total_withdrawn
+        "metric": metric,
+        "bucket": bucket,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "series": series,
+        "total": {
+            "count": sum(point["count"] for point in series),
+            "amount": sum(point["amount"] for point in series)
+        }
     }
 
-@api_router.get("/admin/users")
-async def admin_get_users(admin: dict = Depends(get_current_admin)):
-    """Get all users for admin panel"""
-    logger.info(f"Admin users request: {admin['email']}")
+@api_router.get("/admin/search")
+async def admin_search(
+    q: str,
+    search_type: str = Query("users", alias="type"),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """Ranked full-text search over users or complaints, plus short reference lookups"""
+    logger.info("Admin search request: %s - Type: %s", admin['email'], search_type)
+    
+    if search_type not in SEARCH_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid type: {search_type}")
+    match = build_fts_query(q)
+    if not match:
+        raise HTTPException(status_code=400, detail="Search query must contain letters or digits")
+    
+    limit = clamp_page_size(limit)
+    offset = decode_cursor(cursor, 1, (int,))[0] if cursor else 0
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    fts, columns, weights = SEARCH_TYPES[search_type]
+    source = SEARCH_INDEXES[fts][0]
     
     conn = db.get_connection()
-    cursor = conn.cursor()
+    db_cursor = conn.cursor()
+    
+    db_cursor.execute(f'''
+    SELECT {columns}, bm25({fts}, {weights}) AS score
+    FROM {fts}
+    JOIN {fts}_ids k ON k.docid = {fts}.rowid
+    JOIN {source} t ON t.id = k.id
+    WHERE {fts} MATCH ?
+    ORDER BY score, {fts}.rowid
+    LIMIT ? OFFSET ?
+    ''', (match, limit + 1, offset))
+    results = [dict(row) for row in db_cursor.fetchall()]
+    
+    # Email references are the first 8 hex digits of an id, upper-cased
+    references = []
+    reference = q.strip().lstrip('#').upper()
+    if not cursor and re.fullmatch(r"[0-9A-F]{8}", reference):
+        for table, ref_columns in SHORT_ID_TABLES.items():
+            db_cursor.execute(f'''
+            SELECT {ref_columns} FROM {table} WHERE upper(substr(id, 1, 8)) = ?
+            ''', (reference,))
+            references.extend({"type": table, **dict(row)} for row in db_cursor.fetchall())
+    conn.close()
     
-    cursor.execute('''
-    SELECT id, email, full_name, phone, is_verified, created_at 
-    FROM users 
-    ORDER BY created_at DESC
-    ''')
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor(offset + limit)
     
-    users = cursor.fetchall()
+    return {"type": search_type, "results": results, "references": references, "next_cursor": next_cursor}
+
+@api_router.get("/admin/users")
+async def admin_get_users(
+    request: Request,
+    response: Response,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    order: str = "desc",
+    verified: Optional[bool] = None,
+    search: Optional[str] = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """Get a page of users with wallet balances for admin panel"""
+    logger.info("Admin users request: %s", admin['email'])
+    
+    if sort not in ADMIN_USER_SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort: {sort}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail=f"Invalid order: {order}")
+    
+    limit = clamp_page_size(limit)
+    sort_column, tie_column = ADMIN_USER_SORTS[sort]
+    direction = "DESC" if order == "desc" else "ASC"
+    
+    conditions = []
+    params = []
+    
+    if verified is not None:
+        conditions.append("u.is_verified = ?")
+        params.append(1 if verified else 0)
+    
+    if search and search.strip():
+        # Prefix ranges on NOCASE indexes, so each column is an index search rather than a scan
+        prefix = search.strip()
+        conditions.append('''(
+            (u.email >= ? COLLATE NOCASE AND u.email < ? COLLATE NOCASE)
+            OR (u.full_name >= ? COLLATE NOCASE AND u.full_name < ? COLLATE NOCASE)
+            OR (u.phone >= ? COLLATE NOCASE AND u.phone < ? COLLATE NOCASE)
+        )''')
+        params.extend([prefix, prefix + '\U0010ffff'] * 3)
+    
+    if cursor:
+        after_value, after_id = decode_cursor(cursor, 2)
+        operator = "<" if order == "desc" else ">"
+        conditions.append(f"({sort_column}, {tie_column}) {operator} (?, ?)")
+        params.extend([after_value, after_id])
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # Sorting by balance drives the query from the wallets balance index
+    join = "JOIN wallets w ON w.user_id = u.id" if sort == "balance" else "LEFT JOIN wallets w ON w.user_id = u.id"
     
-    # Add wallet balance to each user
-    result_users = []
-    for user in users:
-        cursor.execute('SELECT balance FROM wallets WHERE user_id = ?', (user["id"],))
-        wallet = cursor.fetchone()
-        
-        user_dict = dict(user)
-        user_dict["wallet_balance"] = wallet["balance"] if wallet else 0
-        result_users.append(user_dict)
+    conn = db.get_connection()
+    db_cursor = conn.cursor()
     
+    not_modified = conditional_get(request, response, db_cursor, ["users", "wallets"])
+    if not_modified:
+        conn.close()
+        return not_modified
+    
+    db_cursor.execute(f'''
+    SELECT u.id, u.email, u.full_name, u.phone, u.is_verified, u.created_at,
+           COALESCE(w.balance, 0) AS wallet_balance
+    FROM users u
+    {join}
+    {where}
+    ORDER BY {sort_column} {direction}, {tie_column} {direction}
+    LIMIT ?
+    ''', params + [limit + 1])
+    
+    users = [dict(row) for row in db_cursor.fetchall()]
     conn.close()
     
-    return {"users": result_users}
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        last = users[-1]
+        next_cursor = encode_cursor(last["created_at"] if sort == "created_at" else last["wallet_balance"], last["id"])
+    
+    return {"users": users, "next_cursor": next_cursor}
 
 @api_router.get("/admin/deposits")
-async def admin_get_deposits(admin: dict = Depends(get_current_admin)):
-    """Get all deposits for admin panel"""
-    logger.info(f"Admin deposits request: {admin['email']}")
-    
-    conn = db.get_connection()
-    cursor = conn.cursor()
+async def admin_get_deposits(
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    order: str = "desc",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """Get a page of deposits for admin panel"""
+    logger.info("Admin deposits request: %s", admin['email'])
     
-    cursor.execute('''
-    SELECT id, user_id, user_email, user_name, amount, status, 
-           admin_note, created_at, updated_at
-    FROM deposits 
-    ORDER BY created_at DESC
-    ''')
+    filters = AdminQueueFilters(status, limit, cursor, order, date_from, date_to, min_amount, max_amount)
     
-    deposits = cursor.fetchall()
-    conn.close()
+    conn = db.get_connection()
+    try:
+        not_modified = conditional_get(request, response, conn.cursor(), ["deposits"])
+        if not_modified:
+            return not_modified
+        deposits, next_cursor, counts = fetch_admin_queue(conn.cursor(), "deposits", filters)
+    finally:
+        conn.close()
     
-    return {"deposits": [dict(dep) for dep in deposits]}
+    return {"deposits": deposits, "next_cursor": next_cursor, "counts": counts}
 
 @api_router.get("/admin/deposits/{deposit_id}/proof")
 async def admin_get_deposit_proof(deposit_id: str, admin: dict = Depends(get_current_admin)):
     """Get deposit proof image"""
-    logger.info(f"Admin deposit proof request: {admin['email']} - Deposit: {deposit_id}")
+    logger.info("Admin deposit proof request: %s - Deposit: %s", admin['email'], deposit_id)
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -1873,245 +4129,377 @@ async def admin_get_deposit_proof(deposit_id: str, admin: dict = Depends(get_cur
     conn.close()
     
     if not deposit:
-        logger.warning(f"Deposit not found: {deposit_id}")
+        logger.warning("Deposit not found: %s", deposit_id)
         raise HTTPException(status_code=404, detail="Deposit not found")
     
     return {"proof_image": deposit["proof_image"], "filename": deposit["proof_filename"]}
 
-@api_router.put("/admin/deposits/{deposit_id}")
-async def admin_update_deposit(deposit_id: str, data: AdminApproval, admin: dict = Depends(get_current_admin), background_tasks: BackgroundTasks = None):
-    """Approve or reject a deposit"""
-    logger.info(f"Admin deposit update: {admin['email']} - Deposit: {deposit_id} - Status: {data.status}")
+def leased_to_others(cursor, item_type: str, ids: List[str], admin_id: str, now: str) -> dict:
+    """Items among `ids` under an unexpired lease held by another admin -> that admin's email"""
+    leased = {}
+    for start in range(0, len(ids), SQL_CHUNK_SIZE):
+        chunk = ids[start:start + SQL_CHUNK_SIZE]
+        cursor.execute(f'''
+        SELECT item_id, admin_email FROM queue_leases
+        WHERE item_type = ? AND item_id IN ({",".join("?" * len(chunk))}) AND expires_at > ? AND admin_id != ?
+        ''', [item_type, *chunk, now, admin_id])
+        leased.update((row["item_id"], row["admin_email"]) for row in cursor.fetchall())
+    return leased
+
+def release_leases(cursor, item_type: str, ids: List[str], admin_id: Optional[str] = None) -> int:
+    """Drop leases on `ids`; only the holder's own when admin_id is given"""
+    released = 0
+    for start in range(0, len(ids), SQL_CHUNK_SIZE):
+        chunk = ids[start:start + SQL_CHUNK_SIZE]
+        holder = "AND admin_id = ?" if admin_id else ""
+        cursor.execute(f'''
+        DELETE FROM queue_leases WHERE item_type = ? AND item_id IN ({",".join("?" * len(chunk))}) {holder}
+        ''', [item_type, *chunk] + ([admin_id] if admin_id else []))
+        released += cursor.rowcount
+    return released
+
+def apply_admin_decisions(cursor, table: str, ids: List[str], status: str, reason: Optional[str], now: str, admin_id: Optional[str] = None):
+    """Approve or reject pending deposits or withdrawals set-wise inside the caller's write transaction.
+    Items leased to another admin than `admin_id` are left alone.
+    Returns per-id outcomes in request order and the rows that were decided"""
+    columns, sign = ADMIN_DECISION_TABLES[table]
+    
+    found = {}
+    for start in range(0, len(ids), SQL_CHUNK_SIZE):
+        chunk = ids[start:start + SQL_CHUNK_SIZE]
+        cursor.execute(f'SELECT {columns} FROM {table} WHERE id IN ({",".join("?" * len(chunk))})', chunk)
+        found.update((row["id"], dict(row)) for row in cursor.fetchall())
+    leased = leased_to_others(cursor, table, ids, admin_id, now) if admin_id else {}
+    
+    outcomes = []
+    decided = []
+    for item_id in ids:
+        row = found.get(item_id)
+        if not row:
+            outcomes.append({"id": item_id, "outcome": "not_found"})
+        elif row["status"] != "pending":
+            outcomes.append({"id": item_id, "outcome": "already_processed", "status": row["status"]})
+        elif item_id in leased:
+            outcomes.append({"id": item_id, "outcome": "leased", "leased_by": leased[item_id]})
+        else:
+            outcomes.append({"id": item_id, "outcome": status})
+            decided.append(row)
+    
+    if not decided:
+        return outcomes, decided
+    
+    # One sequence number stamps every row this decision touches
+    seq = next_change_seq(cursor)
+    decided_ids = [row["id"] for row in decided]
+    for start in range(0, len(decided_ids), SQL_CHUNK_SIZE):
+        chunk = decided_ids[start:start + SQL_CHUNK_SIZE]
+        marks = ",".join("?" * len(chunk))
+        cursor.execute(f'''
+        UPDATE {table}
+        SET status = ?, admin_note = ?, updated_at = ?, change_seq = ?
+        WHERE id IN ({marks})
+        ''', [status, reason, now, seq, *chunk])
+        
+        if status == "approved":
+            # Each wallet moves once by the total of its user's items in this chunk
+            cursor.execute(f'''
+            UPDATE wallets
+            SET balance = balance + ? * (SELECT SUM(t.amount) FROM {table} t WHERE t.user_id = wallets.user_id AND t.id IN ({marks})),
+                change_seq = ?
+            WHERE user_id IN (SELECT user_id FROM {table} WHERE id IN ({marks}))
+            ''', [sign, *chunk, seq, *chunk])
+    
+    release_leases(cursor, table, decided_ids)
+    user_scopes = {f"user:{row['user_id']}" for row in decided}
+    bump_change_versions(cursor, table, *(["wallets"] if status == "approved" else []), *sorted(user_scopes))
+    
+    bump_stats(cursor, decision_deltas(table, status, decided))
+    if status == "approved":
+        bump_rollup(cursor, table, now, sum(row["amount"] for row in decided), len(decided))
+    
+    return outcomes, decided
+
+def decision_deltas(table: str, status: str, decided: List[dict]) -> dict:
+    return {
+        f"{table}.pending": -len(decided),
+        f"{table}.{status}": len(decided),
+        f"{table}.approved.amount": sum(row["amount"] for row in decided) if status == "approved" else 0
+    }
+
+def publish_decisions(table: str, status: str, decided: List[dict]):
+    if decided:
+        event_hub.publish(f"{table[:-1]}.updated", {
+            "ids": [row["id"] for row in decided], "status": status
+        }, decision_deltas(table, status, decided))
+
+def run_admin_decisions(table: str, ids: List[str], status: str, reason: Optional[str], admin_id: Optional[str] = None):
+    """Validate and apply an admin decision over `ids` in one write transaction"""
+    if status not in ADMIN_DECISIONS:
+        raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="No ids provided")
+    if len(ids) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items per request")
     
     conn = db.get_connection()
     cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM deposits WHERE id = ?', (deposit_id,))
-    deposit = cursor.fetchone()
-    
-    if not deposit:
-        conn.close()
-        logger.warning(f"Deposit not found for update: {deposit_id}")
-        raise HTTPException(status_code=404, detail="Deposit not found")
-    
-    if deposit["status"] != "pending":
-        conn.close()
-        logger.warning(f"Deposit already processed: {deposit_id} - Status: {deposit['status']}")
-        raise HTTPException(status_code=400, detail="Deposit already processed")
-    
-    now = datetime.now(timezone.utc).isoformat()
-    
     try:
-        cursor.execute('''
-        UPDATE deposits 
-        SET status = ?, admin_note = ?, updated_at = ?
-        WHERE id = ?
-        ''', (
-            data.status,
-            data.reason,
-            now,
-            deposit_id
-        ))
-        
-        if data.status == "approved":
-            # Credit user wallet
-            cursor.execute('''
-            UPDATE wallets 
-            SET balance = balance + ?
-            WHERE user_id = ?
-            ''', (deposit["amount"], deposit["user_id"]))
-        
-        conn.commit()
-        logger.info(f"Deposit {data.status}: {deposit_id} - User: {deposit['user_email']}")
-        
-        # Send notification email to user
-        status_class = "approved" if data.status == "approved" else "rejected"
-        
-        html = create_email_template(
-            header=f"Deposit {data.status.capitalize()}",
-            content=f"""
-            <p>Your deposit request has been <span class="status status-{status_class}">{data.status}</span></p>
-            <div class="details">
-                <div class="detail-row">
-                    <span class="label">Amount:</span>
-                    <span class="value amount">{format_currency(deposit['amount'])}</span>
-                </div>
-                <div class="detail-row">
-                    <span class="label">Status:</span>
-                    <span class="value">
-                        <span class="status status-{status_class}">{data.status.upper()}</span>
-                    </span>
-                </div>
-                <div class="detail-row">
-                    <span class="label">Date:</span>
-                    <span class="value">{datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')}</span>
-                </div>
-                {f'<div class="detail-row"><span class="label">Note:</span><span class="value">{data.reason or "No note provided"}</span></div>' if data.reason else ''}
-            </div>
-            {'''
-            <div class="support">
-                <p>Your wallet has been credited with the deposit amount. You can now start investing!</p>
-            </div>
-            ''' if data.status == "approved" else '''
-            <div class="warning">
-                <p>Your deposit was not approved. Please contact support if you have questions.</p>
-            </div>
-            '''}
-            """
+        cursor.execute('BEGIN IMMEDIATE')
+        outcomes, decided = apply_admin_decisions(
+            cursor, table, ids, status, reason, datetime.now(timezone.utc).isoformat(), admin_id
         )
-        
-        email_subject = f"FlexInvest - Deposit {data.status.capitalize()}"
-        if background_tasks:
-            background_tasks.add_task(send_email, deposit["user_email"], email_subject, html)
-        
-        return {"message": f"Deposit {data.status}"}
+        conn.commit()
     except Exception as e:
         conn.rollback()
-        logger.error(f"Error updating deposit {deposit_id}: {e}")
+        logger.error("Error updating %s %s: %s", table, ids[:5], e)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         conn.close()
+    
+    publish_decisions(table, status, decided)
+    return outcomes, decided
+
+def summarize_outcomes(outcomes: List[dict]) -> dict:
+    summary = {}
+    for outcome in outcomes:
+        summary[outcome["outcome"]] = summary.get(outcome["outcome"], 0) + 1
+    return summary
+
+def deposit_decision_email(deposit: dict, status: str, reason: Optional[str]) -> tuple:
+    """Subject and body of the email telling a user their deposit was approved or rejected"""
+    status_class = "approved" if status == "approved" else "rejected"
+    
+    html = create_email_template(
+        header=f"Deposit {status.capitalize()}",
+        content=f"""
+        <p>Your deposit request has been <span class="status status-{status_class}">{status}</span></p>
+        <div class="details">
+            <div class="detail-row">
+                <span class="label">Amount:</span>
+                <span class="value amount">{format_currency(deposit['amount'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="label">Status:</span>
+                <span class="value">
+                    <span class="status status-{status_class}">{status.upper()}</span>
+                </span>
+            </div>
+            <div class="detail-row">
+                <span class="label">Date:</span>
+                <span class="value">{datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')}</span>
+            </div>
+            {f'<div class="detail-row"><span class="label">Note:</span><span class="value">{reason or "No note provided"}</span></div>' if reason else ''}
+        </div>
+        {'''
+        <div class="support">
+            <p>Your wallet has been credited with the deposit amount. You can now start investing!</p>
+        </div>
+        ''' if status == "approved" else '''
+        <div class="warning">
+            <p>Your deposit was not approved. Please contact support if you have questions.</p>
+        </div>
+        '''}
+        """
+    )
+    return f"FlexInvest - Deposit {status.capitalize()}", html
+
+@api_router.put("/admin/deposits/{deposit_id}")
+async def admin_update_deposit(deposit_id: str, data: AdminApproval, admin: dict = Depends(get_current_admin), background_tasks: BackgroundTasks = None):
+    """Approve or reject a deposit"""
+    logger.info("Admin deposit update: %s - Deposit: %s - Status: %s", admin['email'], deposit_id, data.status)
+    
+    outcomes, decided = run_admin_decisions("deposits", [deposit_id], data.status, data.reason, admin["id"])
+    outcome = outcomes[0]
+    
+    if outcome["outcome"] == "not_found":
+        logger.warning("Deposit not found for update: %s", deposit_id)
+        raise HTTPException(status_code=404, detail="Deposit not found")
+    
+    if outcome["outcome"] == "already_processed":
+        logger.warning("Deposit already processed: %s - Status: %s", deposit_id, outcome['status'])
+        raise HTTPException(status_code=400, detail="Deposit already processed")
+    
+    if outcome["outcome"] == "leased":
+        raise HTTPException(status_code=409, detail=f"Deposit is being reviewed by {outcome['leased_by']}")
+    
+    deposit = decided[0]
+    logger.info("Deposit %s: %s - User: %s", data.status, deposit_id, deposit['user_email'])
+    
+    # Send notification email to user
+    email_subject, html = deposit_decision_email(deposit, data.status, data.reason)
+    if background_tasks:
+        queue_email(background_tasks, deposit["user_email"], email_subject, html)
+    
+    return {"message": f"Deposit {data.status}"}
+
+@api_router.post("/admin/deposits/bulk")
+async def admin_bulk_update_deposits(data: AdminBulkApproval, admin: dict = Depends(get_current_admin), background_tasks: BackgroundTasks = None):
+    """Approve or reject many deposits in one transaction"""
+    logger.info("Admin bulk deposit update: %s - Items: %s - Status: %s", admin['email'], len(data.ids), data.status)
+    
+    outcomes, decided = run_admin_decisions("deposits", data.ids, data.status, data.reason, admin["id"])
+    logger.info("Bulk deposit %s: %s of %s items", data.status, len(decided), len(outcomes))
+    
+    if decided and background_tasks:
+        queue_emails(background_tasks, [
+            (deposit["user_email"], *deposit_decision_email(deposit, data.status, data.reason))
+            for deposit in decided
+        ])
+    
+    return {"results": outcomes, "summary": summarize_outcomes(outcomes)}
 
 @api_router.get("/admin/withdrawals")
-async def admin_get_withdrawals(admin: dict = Depends(get_current_admin)):
-    """Get all withdrawals for admin panel"""
-    logger.info(f"Admin withdrawals request: {admin['email']}")
+async def admin_get_withdrawals(
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    order: str = "desc",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """Get a page of withdrawals for admin panel"""
+    logger.info("Admin withdrawals request: %s", admin['email'])
     
-    conn = db.get_connection()
-    cursor = conn.cursor()
+    filters = AdminQueueFilters(status, limit, cursor, order, date_from, date_to, min_amount, max_amount)
     
-    cursor.execute('''
-    SELECT * FROM withdrawals 
-    ORDER BY created_at DESC
-    ''')
+    conn = db.get_connection()
+    try:
+        not_modified = conditional_get(request, response, conn.cursor(), ["withdrawals"])
+        if not_modified:
+            return not_modified
+        withdrawals, next_cursor, counts = fetch_admin_queue(conn.cursor(), "withdrawals", filters)
+    finally:
+        conn.close()
     
-    withdrawals = cursor.fetchall()
-    conn.close()
+    return {"withdrawals": withdrawals, "next_cursor": next_cursor, "counts": counts}
+
+def withdrawal_decision_email(withdrawal: dict, status: str, reason: Optional[str]) -> tuple:
+    """Subject and body of the email telling a user their withdrawal was approved or rejected"""
+    status_class = "approved" if status == "approved" else "rejected"
     
-    return {"withdrawals": [dict(w) for w in withdrawals]}
+    html = create_email_template(
+        header=f"Withdrawal {status.capitalize()}",
+        content=f"""
+        <p>Your withdrawal request has been <span class="status status-{status_class}">{status}</span></p>
+        <div class="details">
+            <div class="detail-row">
+                <span class="label">Amount:</span>
+                <span class="value amount">{format_currency(withdrawal['amount'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="label">Bank Account:</span>
+                <span class="value">{withdrawal['bank_name']} - {withdrawal['account_number']}</span>
+            </div>
+            <div class="detail-row">
+                <span class="label">Status:</span>
+                <span class="value">
+                    <span class="status status-{status_class}">{status.upper()}</span>
+                </span>
+            </div>
+            <div class="detail-row">
+                <span class="label">Date:</span>
+                <span class="value">{datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')}</span>
+            </div>
+            {f'<div class="detail-row"><span class="label">Note:</span><span class="value">{reason or "No note provided"}</span></div>' if reason else ''}
+        </div>
+        {'''
+        <div class="support">
+            <p>The funds will be transferred to your bank account within 24 hours.</p>
+            <p>If you don't receive the funds within this period, please contact our support team.</p>
+        </div>
+        ''' if status == "approved" else '''
+        <div class="warning">
+            <p>Your withdrawal was not approved. Your wallet balance remains unchanged.</p>
+            <p>Please contact support if you have questions.</p>
+        </div>
+        '''}
+        """
+    )
+    return f"FlexInvest - Withdrawal {status.capitalize()}", html
 
 @api_router.put("/admin/withdrawals/{withdrawal_id}")
 async def admin_update_withdrawal(withdrawal_id: str, data: AdminApproval, admin: dict = Depends(get_current_admin), background_tasks: BackgroundTasks = None):
     """Approve or reject a withdrawal"""
-    logger.info(f"Admin withdrawal update: {admin['email']} - Withdrawal: {withdrawal_id} - Status: {data.status}")
-    
-    conn = db.get_connection()
-    cursor = conn.cursor()
+    logger.info("Admin withdrawal update: %s - Withdrawal: %s - Status: %s", admin['email'], withdrawal_id, data.status)
     
-    cursor.execute('SELECT * FROM withdrawals WHERE id = ?', (withdrawal_id,))
-    withdrawal = cursor.fetchone()
+    outcomes, decided = run_admin_decisions("withdrawals", [withdrawal_id], data.status, data.reason, admin["id"])
+    outcome = outcomes[0]
     
-    if not withdrawal:
-        conn.close()
-        logger.warning(f"Withdrawal not found for update: {withdrawal_id}")
+    if outcome["outcome"] == "not_found":
+        logger.warning("Withdrawal not found for update: %s", withdrawal_id)
         raise HTTPException(status_code=404, detail="Withdrawal not found")
     
-    if withdrawal["status"] != "pending":
-        conn.close()
-        logger.warning(f"Withdrawal already processed: {withdrawal_id} - Status: {withdrawal['status']}")
+    if outcome["outcome"] == "already_processed":
+        logger.warning("Withdrawal already processed: %s - Status: %s", withdrawal_id, outcome['status'])
         raise HTTPException(status_code=400, detail="Withdrawal already processed")
     
-    now = datetime.now(timezone.utc).isoformat()
+    if outcome["outcome"] == "leased":
+        raise HTTPException(status_code=409, detail=f"Withdrawal is being reviewed by {outcome['leased_by']}")
+    
+    withdrawal = decided[0]
+    logger.info("Withdrawal %s: %s - User: %s", data.status, withdrawal_id, withdrawal['user_email'])
+    
+    # Send notification email to user
+    email_subject, html = withdrawal_decision_email(withdrawal, data.status, data.reason)
+    if background_tasks:
+        queue_email(background_tasks, withdrawal["user_email"], email_subject, html)
     
+    return {"message": f"Withdrawal {data.status}"}
+
+@api_router.post("/admin/withdrawals/bulk")
+async def admin_bulk_update_withdrawals(data: AdminBulkApproval, admin: dict = Depends(get_current_admin), background_tasks: BackgroundTasks = None):
+    """Approve or reject many withdrawals in one transaction"""
+    logger.info("Admin bulk withdrawal update: %s - Items: %s - Status: %s", admin['email'], len(data.ids), data.status)
+    
+    outcomes, decided = run_admin_decisions("withdrawals", data.ids, data.status, data.reason, admin["id"])
+    logger.info("Bulk withdrawal %s: %s of %s items", data.status, len(decided), len(outcomes))
+    
+    if decided and background_tasks:
+        queue_emails(background_tasks, [
+            (withdrawal["user_email"], *withdrawal_decision_email(withdrawal, data.status, data.reason))
+            for withdrawal in decided
+        ])
+    
+    return {"results": outcomes, "summary": summarize_outcomes(outcomes)}
+
+@api_router.get("/admin/complaints")
+async def admin_get_complaints(
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    order: str = "desc",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """Get a page of complaints for admin panel"""
+    logger.info("Admin complaints request: %s", admin['email'])
+    
+    filters = AdminQueueFilters(status, limit, cursor, order, date_from, date_to)
+    
+    conn = db.get_connection()
     try:
-        cursor.execute('''
-        UPDATE withdrawals 
-        SET status = ?, admin_note = ?, updated_at = ?
-        WHERE id = ?
-        ''', (
-            data.status,
-            data.reason,
-            now,
-            withdrawal_id
-        ))
-        
-        if data.status == "approved":
-            # Deduct from wallet
-            cursor.execute('''
-            UPDATE wallets 
-            SET balance = balance - ?
-            WHERE user_id = ?
-            ''', (withdrawal["amount"], withdrawal["user_id"]))
-        
-        conn.commit()
-        logger.info(f"Withdrawal {data.status}: {withdrawal_id} - User: {withdrawal['user_email']}")
-        
-        # Send notification email to user
-        status_class = "approved" if data.status == "approved" else "rejected"
-        
-        html = create_email_template(
-            header=f"Withdrawal {data.status.capitalize()}",
-            content=f"""
-            <p>Your withdrawal request has been <span class="status status-{status_class}">{data.status}</span></p>
-            <div class="details">
-                <div class="detail-row">
-                    <span class="label">Amount:</span>
-                    <span class="value amount">{format_currency(withdrawal['amount'])}</span>
-                </div>
-                <div class="detail-row">
-                    <span class="label">Bank Account:</span>
-                    <span class="value">{withdrawal['bank_name']} - {withdrawal['account_number']}</span>
-                </div>
-                <div class="detail-row">
-                    <span class="label">Status:</span>
-                    <span class="value">
-                        <span class="status status-{status_class}">{data.status.upper()}</span>
-                    </span>
-                </div>
-                <div class="detail-row">
-                    <span class="label">Date:</span>
-                    <span class="value">{datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')}</span>
-                </div>
-                {f'<div class="detail-row"><span class="label">Note:</span><span class="value">{data.reason or "No note provided"}</span></div>' if data.reason else ''}
-            </div>
-            {'''
-            <div class="support">
-                <p>The funds will be transferred to your bank account within 24 hours.</p>
-                <p>If you don't receive the funds within this period, please contact our support team.</p>
-            </div>
-            ''' if data.status == "approved" else '''
-            <div class="warning">
-                <p>Your withdrawal was not approved. Your wallet balance remains unchanged.</p>
-                <p>Please contact support if you have questions.</p>
-            </div>
-            '''}
-            """
-        )
-        
-        email_subject = f"FlexInvest - Withdrawal {data.status.capitalize()}"
-        if background_tasks:
-            background_tasks.add_task(send_email, withdrawal["user_email"], email_subject, html)
-        
-        return {"message": f"Withdrawal {data.status}"}
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Error updating withdrawal {withdrawal_id}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        not_modified = conditional_get(request, response, conn.cursor(), ["complaints"])
+        if not_modified:
+            return not_modified
+        complaints, next_cursor, counts = fetch_admin_queue(conn.cursor(), "complaints", filters)
     finally:
         conn.close()
-
-@api_router.get("/admin/complaints")
-async def admin_get_complaints(admin: dict = Depends(get_current_admin)):
-    """Get all complaints for admin panel"""
-    logger.info(f"Admin complaints request: {admin['email']}")
     
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT * FROM complaints 
-    ORDER BY created_at DESC
-    ''')
-    
-    complaints = cursor.fetchall()
-    conn.close()
-    
-    return {"complaints": [dict(c) for c in complaints]}
+    return {"complaints": complaints, "next_cursor": next_cursor, "counts": counts}
 
 @api_router.put("/admin/complaints/{complaint_id}")
 async def admin_update_complaint(complaint_id: str, status: str, response: Optional[str] = None, admin: dict = Depends(get_current_admin), background_tasks: BackgroundTasks = None):
     """Update complaint status and response"""
-    logger.info(f"Admin complaint update: {admin['email']} - Complaint: {complaint_id} - Status: {status}")
+    logger.info("Admin complaint update: %s - Complaint: %s - Status: %s", admin['email'], complaint_id, status)
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -2121,19 +4509,30 @@ async def admin_update_complaint(complaint_id: str, status: str, response: Optio
     
     if not complaint:
         conn.close()
-        logger.warning(f"Complaint not found: {complaint_id}")
+        logger.warning("Complaint not found: %s", complaint_id)
         raise HTTPException(status_code=404, detail="Complaint not found")
     
     now = datetime.now(timezone.utc).isoformat()
     
+    leased = leased_to_others(cursor, "complaints", [complaint_id], admin["id"], now)
+    if leased:
+        conn.close()
+        raise HTTPException(status_code=409, detail=f"Complaint is being reviewed by {leased[complaint_id]}")
+    
     cursor.execute('''
     UPDATE complaints 
     SET status = ?, admin_response = ?, updated_at = ?
     WHERE id = ?
     ''', (status, response, now, complaint_id))
     
+    record_change(cursor, "complaints", complaint["user_id"], complaint_id)
+    if status != QUEUE_WAITING_STATUS["complaints"]:
+        release_leases(cursor, "complaints", [complaint_id])
+    deltas = {f"complaints.{complaint['status']}": -1, f"complaints.{status}": 1} if complaint["status"] != status else {}
+    bump_stats(cursor, deltas)
     conn.commit()
     conn.close()
+    event_hub.publish("complaint.updated", {"ids": [complaint_id], "status": status}, deltas)
     
     # Send notification email to user
     if background_tasks and response:
@@ -2163,14 +4562,14 @@ async def admin_update_complaint(complaint_id: str, status: str, response: Optio
             </div>
             """
         )
-        background_tasks.add_task(send_email, complaint["user_email"], "FlexInvest - Complaint Update", html)
+        queue_email(background_tasks, complaint["user_email"], "FlexInvest - Complaint Update", html)
     
     return {"message": "Complaint updated"}
 
 @api_router.post("/admin/credit-wallet")
 async def admin_credit_wallet(data: WalletCredit, admin: dict = Depends(get_current_admin), background_tasks: BackgroundTasks = None):
     """Admin credit user wallet"""
-    logger.info(f"Admin credit wallet: {admin['email']} - User: {data.user_id} - Amount: {data.amount}")
+    logger.info("Admin credit wallet: %s - User: %s - Amount: %s", admin['email'], data.user_id, data.amount)
     
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -2180,7 +4579,7 @@ async def admin_credit_wallet(data: WalletCredit, admin: dict = Depends(get_curr
     
     if not user:
         conn.close()
-        logger.warning(f"User not found for wallet credit: {data.user_id}")
+        logger.warning("User not found for wallet credit: %s", data.user_id)
         raise HTTPException(status_code=404, detail="User not found")
     
     cursor.execute('''
@@ -2189,9 +4588,24 @@ async def admin_credit_wallet(data: WalletCredit, admin: dict = Depends(get_curr
     WHERE user_id = ?
     ''', (data.amount, data.user_id))
     
+    # Record the credit so it shows up in the user's transaction feed
+    cursor.execute('''
+    INSERT INTO wallet_credits (id, user_id, amount, reason, admin_id, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (
+        str(uuid.uuid4()),
+        data.user_id,
+        data.amount,
+        data.reason,
+        admin["id"],
+        datetime.now(timezone.utc).isoformat()
+    ))
+    
+    record_change(cursor, "wallets", data.user_id)
+    record_change(cursor, "wallet_credits", data.user_id)
     conn.commit()
     conn.close()
-    logger.info(f"Wallet credited: User {user['email']} - Amount: {data.amount}")
+    logger.info("Wallet credited: User %s - Amount: %s", user['email'], data.amount)
     
     # Send notification email to user
     html = create_email_template(
@@ -2220,45 +4634,830 @@ async def admin_credit_wallet(data: WalletCredit, admin: dict = Depends(get_curr
     )
     
     if background_tasks:
-        background_tasks.add_task(send_email, user["email"], "FlexInvest - Wallet Credited", html)
+        queue_email(background_tasks, user["email"], "FlexInvest - Wallet Credited", html)
     
     return {"message": "Wallet credited successfully"}
 
-# ============= DEBUG ENDPOINTS =============
+# ============= ADMIN WORK QUEUE =============
+
+@api_router.post("/admin/queue/next")
+async def admin_queue_next(data: QueueLeaseRequest, admin: dict = Depends(get_current_admin)):
+    """Lease up to `count` waiting items to the calling admin.
+    Leases the admin already holds are renewed and returned first; other admins' live leases are skipped."""
+    if data.type not in QUEUE_WAITING_STATUS:
+        raise HTTPException(status_code=400, detail=f"Invalid type: {data.type}")
+    
+    count = clamp_page_size(data.count)
+    lease_seconds = max(30, min(data.lease_seconds, MAX_LEASE_SECONDS))
+    now_dt = datetime.now(timezone.utc)
+    now = now_dt.isoformat()
+    expires_at = (now_dt + timedelta(seconds=lease_seconds)).isoformat()
+    
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        # The write lock makes select-then-lease atomic across admins
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('DELETE FROM queue_leases WHERE item_type = ? AND expires_at <= ?', (data.type, now))
+        cursor.execute('''
+        UPDATE queue_leases SET expires_at = ?
+        WHERE admin_id = ? AND item_type = ?
+        ''', (expires_at, admin["id"], data.type))
+        
+        cursor.execute(f'''
+        INSERT INTO queue_leases (item_type, item_id, admin_id, admin_email, leased_at, expires_at)
+        SELECT ?, t.id, ?, ?, ?, ? FROM {data.type} t
+        WHERE t.status = ?
+          AND NOT EXISTS (SELECT 1 FROM queue_leases l WHERE l.item_type = ? AND l.item_id = t.id)
+        ORDER BY t.created_at, t.id
+        LIMIT max(0, ? - (SELECT COUNT(*) FROM queue_leases WHERE admin_id = ? AND item_type = ?))
+        ''', (
+            data.type, admin["id"], admin["email"], now, expires_at,
+            QUEUE_WAITING_STATUS[data.type], data.type,
+            count, admin["id"], data.type
+        ))
+        leased_count = cursor.rowcount
+        
+        cursor.execute(f'''
+        SELECT {", ".join(f"t.{column.strip()}" for column in ADMIN_QUEUE_TABLES[data.type].split(","))},
+               l.expires_at AS lease_expires_at
+        FROM queue_leases l
+        JOIN {data.type} t ON t.id = l.item_id
+        WHERE l.admin_id = ? AND l.item_type = ?
+        ORDER BY t.created_at, t.id
+        ''', (admin["id"], data.type))
+        items = [dict(row) for row in cursor.fetchall()]
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error("Error leasing %s queue items: %s", data.type, e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+    
+    logger.info("Admin queue lease: %s - %s: %s new, %s held", admin['email'], data.type, leased_count, len(items))
+    return {"type": data.type, "items": items, "lease_expires_at": expires_at}
 
-@api_router.get("/debug/admins")
-async def debug_admins():
-    """Debug endpoint to list all admins"""
+@api_router.post("/admin/queue/release")
+async def admin_queue_release(data: QueueRelease, admin: dict = Depends(get_current_admin)):
+    """Hand leased items back to the queue before their lease runs out"""
+    if data.type not in QUEUE_WAITING_STATUS:
+        raise HTTPException(status_code=400, detail=f"Invalid type: {data.type}")
+    
     conn = db.get_connection()
     cursor = conn.cursor()
+    released = release_leases(cursor, data.type, list(dict.fromkeys(data.ids)), admin["id"])
+    conn.commit()
+    conn.close()
     
+    logger.info("Admin queue release: %s - %s: %s", admin['email'], data.type, released)
+    return {"released": released}
+
+# ============= ADMIN EVENT STREAM =============
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+async def stream_admin_events():
+    # Subscribing and reading the snapshot with no await in between means every later
+    # event is a change the snapshot does not include yet
+    queue = event_hub.subscribe()
     try:
-        cursor.execute('SELECT id, email, name, role, created_at FROM admins')
-    except sqlite3.OperationalError:
-        # If role column doesn't exist
-        cursor.execute('SELECT id, email, name, created_at FROM admins')
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT name, value FROM stats_counters')
+        counters = {row["name"]: row["value"] for row in cursor.fetchall()}
+        conn.close()
+        
+        yield "retry: 5000\n\n"
+        yield format_sse({"id": event_hub.sequence, "type": "ready", "data": {"counters": counters}})
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment lines keep proxies from closing an idle stream
+                yield ": ping\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        event_hub.unsubscribe(queue)
+
+@api_router.post("/admin/events/token")
+async def admin_events_token(admin: dict = Depends(get_current_admin)):
+    """Short-lived token for opening /admin/events with EventSource, which cannot send headers.
+    Query strings end up in access logs and browser history, so this token only opens the stream
+    and expires after SSE_TOKEN_SECONDS; fetch a new one before reconnecting."""
+    payload = {
+        "user_id": admin["id"],
+        "purpose": "admin_events",
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=SSE_TOKEN_SECONDS)
+    }
+    return {"token": jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM), "expires_in": SSE_TOKEN_SECONDS}
+
+@api_router.get("/admin/events")
+async def admin_events(
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    """Server-sent events for the admin panel: new items, status changes and counter deltas.
+    Authenticate with the admin bearer header, or pass a token from POST /admin/events/token as ?token=.
+    The first event carries all counters; apply later `counters` deltas to it, and refetch on 'resync'."""
+    if credentials:
+        admin = await get_current_admin(credentials)
+    elif token:
+        payload = decode_token(token)
+        if payload.get("purpose") != "admin_events":
+            raise HTTPException(status_code=401, detail="Query token must come from /admin/events/token")
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, email, name, role FROM admins WHERE id = ?', (payload.get("user_id"),))
+        admin = cursor.fetchone()
+        conn.close()
+        if not admin:
+            raise HTTPException(status_code=401, detail="Admin not found")
+    else:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    logger.info("Admin event stream opened: %s", admin['email'])
+    
+    return StreamingResponse(
+        stream_admin_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ============= PAYOUT BATCH ROUTES =============
+
+def bump_batch_user_versions(cursor, batch_id: str):
+    """Bump the per-user ETag scope of everyone with a withdrawal in the batch, in one statement"""
+    cursor.execute('''
+    INSERT INTO change_versions (scope, version)
+    SELECT DISTINCT 'user:' || user_id, 1 FROM withdrawals WHERE payout_batch_id = ?
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1
+    ''', (batch_id,))
+
+def refresh_payout_batch(cursor, batch_id: str, now: str):
+    """Recount paid items and close the batch once all of them are resolved.
+    item_count and total_amount keep the values the batch was created with, since failed items leave it."""
+    cursor.execute('''
+    UPDATE payout_batches
+    SET paid_count = (SELECT COUNT(*) FROM withdrawals WHERE payout_batch_id = :id AND paid_at IS NOT NULL),
+        updated_at = :now
+    WHERE id = :id
+    ''', {"id": batch_id, "now": now})
+    cursor.execute(PAYOUT_BATCH_OUTCOME + ' AND id = ?', (batch_id,))
+    cursor.execute('SELECT * FROM payout_batches WHERE id = ?', (batch_id,))
+    return dict(cursor.fetchone())
+
+@api_router.post("/admin/payouts/batches")
+async def admin_create_payout_batch(data: PayoutBatchCreate, admin: dict = Depends(get_current_admin)):
+    """Put approved, unpaid withdrawals into a new payout batch"""
+    logger.info("Admin payout batch request: %s - Max items: %s", admin['email'], data.max_items)
+    
+    max_items = max(1, min(data.max_items, MAX_PAYOUT_BATCH_SIZE))
+    batch_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc).isoformat()
+    bank_filter = "AND bank_name = ?" if data.bank_name else ""
+    
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+        INSERT INTO payout_batches (id, created_by, created_at, updated_at) VALUES (?, ?, ?, ?)
+        ''', (batch_id, admin["email"], now, now))
+        
+        # Claimed set-wise, so batch size never affects memory
+        cursor.execute(f'''
+        UPDATE withdrawals
+        SET payout_batch_id = ?, change_seq = ?
+        WHERE id IN (
+            SELECT id FROM withdrawals
+            WHERE status = 'approved' AND payout_batch_id IS NULL {bank_filter}
+            ORDER BY updated_at, id
+            LIMIT ?
+        )
+        ''', [batch_id, next_change_seq(cursor)] + ([data.bank_name] if data.bank_name else []) + [max_items])
+        
+        if cursor.rowcount == 0:
+            conn.rollback()
+            raise HTTPException(status_code=404, detail="No approved withdrawals awaiting payout")
+        
+        cursor.execute('''
+        UPDATE payout_batches
+        SET item_count = (SELECT COUNT(*) FROM withdrawals WHERE payout_batch_id = :id),
+            total_amount = (SELECT COALESCE(SUM(amount), 0) FROM withdrawals WHERE payout_batch_id = :id)
+        WHERE id = :id
+        ''', {"id": batch_id})
+        bump_change_versions(cursor, "withdrawals")
+        bump_batch_user_versions(cursor, batch_id)
+        batch = refresh_payout_batch(cursor, batch_id, now)
+        conn.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        logger.error("Error creating payout batch: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
     
-    admins = cursor.fetchall()
+    logger.info("Payout batch %s created: %s items, %s", batch_id, batch['item_count'], batch['total_amount'])
+    return batch
+
+@api_router.get("/admin/payouts/batches")
+async def admin_get_payout_batches(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, admin: dict = Depends(get_current_admin)):
+    """Get a page of payout batches, newest first"""
+    limit = clamp_page_size(limit)
+    params = []
+    keyset = ""
+    if cursor:
+        keyset = "WHERE (created_at, id) < (?, ?)"
+        params.extend(decode_cursor(cursor, 2))
+    
+    conn = db.get_connection()
+    db_cursor = conn.cursor()
+    db_cursor.execute(f'''
+    SELECT * FROM payout_batches {keyset}
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+    ''', params + [limit + 1])
+    batches = [dict(row) for row in db_cursor.fetchall()]
     conn.close()
     
-    return {"admins": [dict(admin) for admin in admins]}
+    next_cursor = None
+    if len(batches) > limit:
+        batches = batches[:limit]
+        next_cursor = encode_cursor(batches[-1]["created_at"], batches[-1]["id"])
+    
+    return {"batches": batches, "next_cursor": next_cursor}
 
-@api_router.get("/debug/users")
-async def debug_users():
-    """Debug endpoint to list all users"""
+def stream_payout_csv(batch_id: str):
+    """Yield the bank transfer CSV for a batch a chunk of rows at a time"""
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT id, bank_name, account_number, account_name, amount FROM withdrawals
+        WHERE payout_batch_id = ? AND paid_at IS NULL
+        ORDER BY bank_name, id
+        ''', (batch_id,))
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(PAYOUT_EXPORT_COLUMNS)
+        while True:
+            rows = cursor.fetchmany(PAYOUT_EXPORT_CHUNK)
+            for row in rows:
+                writer.writerow([
+                    row["bank_name"],
+                    row["account_number"],
+                    row["account_name"],
+                    f"{row['amount']:.2f}",
+                    row["id"],
+                    f"FlexInvest withdrawal {row['id'][:8].upper()}"
+                ])
+            if buffer.tell():
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if not rows:
+                break
+    finally:
+        conn.close()
+
+@api_router.get("/admin/payouts/batches/{batch_id}/export")
+async def admin_export_payout_batch(batch_id: str, admin: dict = Depends(get_current_admin)):
+    """Stream a batch's unpaid items as a bank bulk-transfer CSV, grouped by bank"""
+    logger.info("Admin payout export: %s - Batch: %s", admin['email'], batch_id)
+    
     conn = db.get_connection()
     cursor = conn.cursor()
+    cursor.execute('SELECT id FROM payout_batches WHERE id = ?', (batch_id,))
+    batch = cursor.fetchone()
+    conn.close()
     
-    cursor.execute('SELECT id, email, full_name, is_verified, created_at FROM users')
-    users = cursor.fetchall()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Payout batch not found")
+    
+    return StreamingResponse(
+        stream_payout_csv(batch_id),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="payout-{batch_id[:8].upper()}.csv"'}
+    )
+
+@api_router.post("/admin/payouts/batches/{batch_id}/settlement")
+async def admin_settle_payout_batch(batch_id: str, file: UploadFile = File(...), admin: dict = Depends(get_current_admin)):
+    """Apply the bank's settlement CSV to a batch.
+    Columns: reference (withdrawal id), optional status and bank_reference.
+    Settled rows are marked paid; failed rows leave the batch so the next one picks them up."""
+    logger.info("Admin payout settlement: %s - Batch: %s", admin['email'], batch_id)
+    
+    now = datetime.now(timezone.utc).isoformat()
+    summary = {"rows": 0, "paid": 0, "failed": 0, "unmatched": 0}
+    
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT id FROM payout_batches WHERE id = ?', (batch_id,))
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Payout batch not found")
+        
+        seq = next_change_seq(cursor)
+        # Users are bumped before failed items leave the batch
+        bump_batch_user_versions(cursor, batch_id)
+        paid, failed = [], []
+        
+        def flush():
+            cursor.executemany('''
+            UPDATE withdrawals SET paid_at = ?, payout_reference = ?, change_seq = ?
+            WHERE id = ? AND payout_batch_id = ? AND paid_at IS NULL
+            ''', paid)
+            summary["paid"] += max(cursor.rowcount, 0)
+            cursor.executemany('''
+            UPDATE withdrawals SET payout_batch_id = NULL, change_seq = ?
+            WHERE id = ? AND payout_batch_id = ? AND paid_at IS NULL
+            ''', failed)
+            summary["failed"] += max(cursor.rowcount, 0)
+            paid.clear()
+            failed.clear()
+        
+        for row in iter_csv_upload(file):
+            summary["rows"] += 1
+            reference = row.get("reference") or row.get("withdrawal_id")
+            if not reference:
+                raise HTTPException(status_code=400, detail=f"Row {summary['rows']} has no reference column")
+            if (row.get("status") or "paid").lower() in PAYOUT_SETTLED_STATUSES:
+                paid.append((now, row.get("bank_reference"), seq, reference, batch_id))
+            else:
+                failed.append((seq, reference, batch_id))
+            if len(paid) + len(failed) >= PAYOUT_EXPORT_CHUNK:
+                flush()
+        flush()
+        
+        summary["unmatched"] = summary["rows"] - summary["paid"] - summary["failed"]
+        cursor.execute('''
+        UPDATE payout_batches SET failed_count = failed_count + ? WHERE id = ?
+        ''', (summary["failed"], batch_id))
+        bump_change_versions(cursor, "withdrawals")
+        batch = refresh_payout_batch(cursor, batch_id, now)
+        conn.commit()
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        logger.error("Error settling payout batch %s: %s", batch_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+    
+    logger.info("Payout batch %s settlement: %s", batch_id, summary)
+    return {"batch": batch, "summary": summary}
+
+# ============= BANK RECONCILIATION ROUTES =============
+
+def parse_statement_amount(value: Optional[str]) -> Optional[float]:
+    """Parse an amount cell such as '5,000.00' or 'NGN 5000'; None when the cell is blank.
+    Raises ValueError when the cell holds something that isn't an amount."""
+    text = (value or "").strip()
+    if text in ("", "-"):
+        return None
+    if not re.search(r"\d", text):
+        raise ValueError(f"not an amount: {text}")
+    return float(re.sub(r"[^0-9.\-]", "", text))
+
+def parse_statement_date(value: Optional[str]) -> Optional[str]:
+    # Drop any time of day; statements only need to be matched to the day
+    value = re.sub(r"[ T]\d{1,2}:\d{2}.*$", "", (value or "").strip())
+    for date_format in STATEMENT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+def normalize_statement_row(row: dict) -> dict:
+    return {STATEMENT_COLUMNS[key]: value for key, value in row.items() if key in STATEMENT_COLUMNS}
+
+def import_bank_statement(upload: UploadFile, account_number: str, admin_email: str) -> dict:
+    """Stage the credit lines of a statement CSV in one write transaction.
+    Blocking: parses the whole upload, so handlers run it in the thread pool."""
+    import_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc).isoformat()
+    summary = {"rows": 0, "credits": 0, "duplicates": 0, "skipped": 0, "errors": 0}
+    errors = []
+    
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+        INSERT INTO bank_statement_imports (id, account_number, filename, created_by, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (import_id, account_number, upload.filename, admin_email, now))
+        
+        lines = []
+        occurrences = {}
+        
+        def reject(detail: str):
+            summary["errors"] += 1
+            if len(errors) < MAX_STATEMENT_ERRORS:
+                errors.append({"row": summary["rows"], "detail": detail})
+        
+        def flush():
+            before = conn.total_changes
+            # Overlapping statements re-send lines we already hold; the fingerprint drops them
+            cursor.executemany('''
+            INSERT OR IGNORE INTO bank_statement_lines (import_id, value_date, amount, narration, bank_reference, fingerprint)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', lines)
+            inserted = conn.total_changes - before
+            summary["credits"] += inserted
+            summary["duplicates"] += len(lines) - inserted
+            lines.clear()
+        
+        for row in iter_csv_upload(upload):
+            summary["rows"] += 1
+            row = normalize_statement_row(row)
+            if row.get("account_number") and row["account_number"] != account_number:
+                raise HTTPException(status_code=400, detail=f"Row {summary['rows']} is for another account")
+            try:
+                amount = parse_statement_amount(row.get("credit"))
+            except ValueError:
+                reject(f"Unreadable credit amount: {row.get('credit')}")
+                continue
+            if amount is None or amount <= 0:
+                # Debits and balance lines are not deposits
+                summary["skipped"] += 1
+                continue
+            value_date = parse_statement_date(row.get("value_date"))
+            if not value_date:
+                reject(f"Unreadable date: {row.get('value_date') or '(blank)'}")
+                continue
+            narration = row.get("narration", "")
+            reference = row.get("bank_reference", "")
+            balance = re.sub(r"[^0-9.\-]", "", row.get("balance", ""))
+            key = (value_date, round(amount * 100), narration, balance)
+            occurrences[key] = occurrences.get(key, 0) + 1
+            fingerprint = statement_fingerprint(account_number, value_date, amount, narration, reference, balance, occurrences[key])
+            lines.append((import_id, value_date, amount, narration, reference, fingerprint))
+            if len(lines) >= STATEMENT_IMPORT_CHUNK:
+                flush()
+        flush()
+        
+        cursor.execute('''
+        UPDATE bank_statement_imports SET row_count = ?, credit_count = ?, duplicate_count = ? WHERE id = ?
+        ''', (summary["rows"], summary["credits"], summary["duplicates"], import_id))
+        conn.commit()
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        logger.error("Error importing bank statement: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+    
+    logger.info("Bank statement %s imported: %s", import_id, summary)
+    return {"import_id": import_id, "summary": summary, "errors": errors}
+
+@api_router.post("/admin/bank-statements")
+async def admin_import_bank_statement(
+    file: UploadFile = File(...),
+    account_number: str = Form(COMPANY_BANK["account_number"]),
+    admin: dict = Depends(get_current_admin)
+):
+    """Stream a company account statement CSV into the staging table; only credits are kept"""
+    logger.info("Admin bank statement import: %s - File: %s", admin['email'], file.filename)
+    
+    if account_number != COMPANY_BANK["account_number"]:
+        raise HTTPException(status_code=400, detail="Statement is not for the company account")
+    
+    return await anyio.to_thread.run_sync(import_bank_statement, file, account_number, admin["email"])
+
+def name_tokens(text: Optional[str]) -> set:
+    return {part for part in re.findall(r"\w+", (text or "").upper()) if len(part) > 2}
+
+def match_statement_lines(cursor, window_days: int) -> tuple:
+    """Pair unmatched credit lines with pending deposits of the same amount and a nearby date.
+    Returns (confident pairs, ambiguous pairs) as (line id, deposit id) lists"""
+    # Pending deposits by amount in kobo, each list in date order for bisecting the window;
+    # deposits already proposed to a line are taken
+    cursor.execute('''
+    SELECT id, user_name, amount, created_at FROM deposits
+    WHERE status = 'pending'
+      AND id NOT IN (SELECT deposit_id FROM bank_statement_lines WHERE status = 'proposed')
+    ORDER BY created_at, id
+    ''')
+    by_amount = {}
+    for deposit in cursor.fetchall():
+        days, deposits = by_amount.setdefault(round(deposit["amount"] * 100), ([], []))
+        days.append(datetime.fromisoformat(deposit["created_at"]).date().toordinal())
+        deposits.append((deposit["id"], name_tokens(deposit["user_name"])))
+    
+    cursor.execute('''
+    SELECT id, value_date, amount, narration FROM bank_statement_lines
+    WHERE status = 'unmatched'
+    ORDER BY value_date, id
+    ''')
+    lines = cursor.fetchall()
+    line_counts = {}
+    for line in lines:
+        cents = round(line["amount"] * 100)
+        line_counts[cents] = line_counts.get(cents, 0) + 1
+    deposit_counts = {cents: len(days) for cents, (days, _) in by_amount.items()}
+    
+    confident, ambiguous = [], []
+    for line in lines:
+        cents = round(line["amount"] * 100)
+        if cents not in by_amount:
+            continue
+        days, deposits = by_amount[cents]
+        day = datetime.fromisoformat(line["value_date"]).toordinal()
+        start = bisect.bisect_left(days, day - window_days)
+        end = bisect.bisect_right(days, day + window_days)
+        if start == end:
+            continue
+        narration = name_tokens(line["narration"])
+        named = [index for index in range(start, end) if deposits[index][1] & narration]
+        if len(named) == 1:
+            chosen, sure = named[0], True
+        else:
+            # Several (or no) name hits: propose the closest in time for a human to check
+            chosen = min(named or range(start, end), key=lambda index: abs(days[index] - day))
+            # Without a name, only a one-to-one amount is trusted
+            sure = line_counts[cents] == 1 and deposit_counts[cents] == 1
+        (confident if sure else ambiguous).append((line["id"], deposits[chosen][0]))
+        del days[chosen]
+        del deposits[chosen]
+    return confident, ambiguous
+
+def approve_statement_matches(cursor, pairs: List[tuple], now: str, admin_id: str) -> List[dict]:
+    """Approve the deposits behind (line id, deposit id) pairs and mark the lines matched"""
+    outcomes, decided = apply_admin_decisions(
+        cursor, "deposits", [deposit_id for _, deposit_id in pairs], "approved", "Matched to bank statement", now, admin_id
+    )
+    approved = {deposit["id"] for deposit in decided}
+    cursor.executemany('''
+    UPDATE bank_statement_lines SET status = 'matched', deposit_id = ?, matched_at = ? WHERE id = ?
+    ''', [(deposit_id, now, line_id) for line_id, deposit_id in pairs if deposit_id in approved])
+    # Deposits decided elsewhere or under review free their line for another match
+    cursor.executemany('''
+    UPDATE bank_statement_lines SET status = 'unmatched', deposit_id = NULL WHERE id = ?
+    ''', [(line_id,) for line_id, deposit_id in pairs if deposit_id not in approved])
+    return decided
+
+def announce_statement_approvals(background_tasks: Optional[BackgroundTasks], deposits: List[dict]):
+    """Publish and email deposits approved from the bank statement once committed"""
+    publish_decisions("deposits", "approved", deposits)
+    if deposits and background_tasks:
+        queue_emails(background_tasks, [
+            (deposit["user_email"], *deposit_decision_email(deposit, "approved", "Matched to bank statement"))
+            for deposit in deposits
+        ])
+
+def run_statement_match(window_days: int, auto_approve: bool, admin_id: str) -> tuple:
+    """Propose (and optionally approve) matches in one write transaction.
+    Returns (approved deposits, proposals). Blocking: buckets every unmatched line and pending
+    deposit, so handlers run it in the thread pool."""
+    now = datetime.now(timezone.utc).isoformat()
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        confident, ambiguous = match_statement_lines(cursor, window_days)
+        proposals = ambiguous if auto_approve else confident + ambiguous
+        cursor.executemany('''
+        UPDATE bank_statement_lines SET status = 'proposed', deposit_id = ? WHERE id = ?
+        ''', [(deposit_id, line_id) for line_id, deposit_id in proposals])
+        approved = approve_statement_matches(cursor, confident, now, admin_id) if auto_approve and confident else []
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error("Error matching bank statement: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+    return approved, proposals
+
+@api_router.post("/admin/bank-statements/match")
+async def admin_match_bank_statement(data: StatementMatchRun, admin: dict = Depends(get_current_admin), background_tasks: BackgroundTasks = None):
+    """Match unmatched statement credits to pending deposits; optionally approve the unambiguous ones"""
+    logger.info("Admin bank statement match: %s - Window: %sd - Auto approve: %s", admin['email'], data.window_days, data.auto_approve)
+    
+    if not 0 <= data.window_days <= 30:
+        raise HTTPException(status_code=400, detail="window_days must be between 0 and 30")
+    
+    approved, proposals = await anyio.to_thread.run_sync(run_statement_match, data.window_days, data.auto_approve, admin["id"])
+    
+    # Published from the loop once committed; the event hub's queues aren't thread-safe
+    announce_statement_approvals(background_tasks, approved)
+    summary = {"approved": len(approved), "proposed": len(proposals)}
+    logger.info("Bank statement match: %s", summary)
+    return {"summary": summary}
+
+@api_router.get("/admin/bank-statements/lines")
+async def admin_get_statement_lines(
+    status: str = "proposed",
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """Get a page of statement lines in one state, with the deposit each is matched or proposed to"""
+    limit = clamp_page_size(limit)
+    params = [status]
+    keyset = ""
+    if cursor:
+        keyset = "AND (l.value_date, l.id) > (?, ?)"
+        params.extend(decode_cursor(cursor, 2))
+    
+    conn = db.get_connection()
+    db_cursor = conn.cursor()
+    db_cursor.execute(f'''
+    SELECT l.id, l.value_date, l.amount, l.narration, l.bank_reference, l.status, l.deposit_id, l.matched_at,
+           d.user_id, d.user_email, d.user_name, d.amount AS deposit_amount, d.status AS deposit_status,
+           d.created_at AS deposit_created_at
+    FROM bank_statement_lines l
+    LEFT JOIN deposits d ON d.id = l.deposit_id
+    WHERE l.status = ? {keyset}
+    ORDER BY l.value_date, l.id
+    LIMIT ?
+    ''', params + [limit + 1])
+    lines = [dict(row) for row in db_cursor.fetchall()]
+    conn.close()
+    
+    next_cursor = None
+    if len(lines) > limit:
+        lines = lines[:limit]
+        next_cursor = encode_cursor(lines[-1]["value_date"], lines[-1]["id"])
+    
+    return {"lines": lines, "next_cursor": next_cursor}
+
+@api_router.post("/admin/bank-statements/lines/decide")
+async def admin_decide_statement_lines(data: StatementLineDecision, admin: dict = Depends(get_current_admin), background_tasks: BackgroundTasks = None):
+    """Confirm proposed matches (approving their deposits) or dismiss lines from matching"""
+    logger.info("Admin statement line decision: %s - Lines: %s - Action: %s", admin['email'], len(data.line_ids), data.action)
+    
+    if data.action not in ("confirm", "dismiss"):
+        raise HTTPException(status_code=400, detail=f"Invalid action: {data.action}")
+    line_ids = list(dict.fromkeys(data.line_ids))
+    if not line_ids or len(line_ids) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Provide between 1 and {MAX_BULK_ITEMS} line ids")
+    
+    now = datetime.now(timezone.utc).isoformat()
+    approved = []
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        marks = ",".join("?" * len(line_ids))
+        if data.action == "confirm":
+            cursor.execute(f'''
+            SELECT id, deposit_id FROM bank_statement_lines WHERE status = 'proposed' AND id IN ({marks})
+            ''', line_ids)
+            pairs = [(row["id"], row["deposit_id"]) for row in cursor.fetchall()]
+            approved = approve_statement_matches(cursor, pairs, now, admin["id"]) if pairs else []
+            updated = len(approved)
+        else:
+            cursor.execute(f'''
+            UPDATE bank_statement_lines SET status = 'ignored', deposit_id = NULL
+            WHERE status IN ('unmatched', 'proposed') AND id IN ({marks})
+            ''', line_ids)
+            updated = cursor.rowcount
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error("Error deciding statement lines: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+    
+    announce_statement_approvals(background_tasks, approved)
+    return {"action": data.action, "updated": updated, "skipped": len(line_ids) - updated}
+
+# ============= DIAGNOSTICS =============
+
+def database_file_sizes() -> dict:
+    sizes = {}
+    for label, path in (("db_bytes", DB_PATH), ("wal_bytes", Path(f"{DB_PATH}-wal")), ("shm_bytes", Path(f"{DB_PATH}-shm"))):
+        sizes[label] = path.stat().st_size if path.exists() else 0
+    return sizes
+
+def collect_database_diagnostics() -> dict:
+    """Row counts, storage pragmas, the last profit run and scheduler leadership.
+    COUNT(*) walks every table, so callers run this in a worker thread."""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+    # FTS tables and their shadow tables mirror rows counted elsewhere
+    tables = [row["name"] for row in cursor.fetchall() if not row["name"].startswith(tuple(SEARCH_INDEXES))]
+    row_counts = {}
+    for table in tables:
+        cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+        row_counts[table] = cursor.fetchone()[0]
+    
+    storage = database_file_sizes()
+    for pragma in ("journal_mode", "page_size", "page_count", "freelist_count"):
+        cursor.execute(f"PRAGMA {pragma}")
+        storage[pragma] = cursor.fetchone()[0]
+    
+    cursor.execute('''
+        SELECT job, holder, started_at, duration_seconds, outcome, detail FROM job_runs
+        WHERE job = ? ORDER BY started_at DESC LIMIT 1
+    ''', ("process_daily_profits",))
+    last_profit_run = cursor.fetchone()
+    conn.close()
+    
+    if last_profit_run:
+        last_profit_run = dict(last_profit_run)
+        last_profit_run["detail"] = json.loads(last_profit_run["detail"]) if last_profit_run["detail"] else None
+    
+    return {
+        "row_counts": row_counts,
+        "storage": storage,
+        "last_profit_run": last_profit_run,
+        "scheduler": check_scheduler()
+    }
+
+@api_router.get("/admin/diagnostics")
+async def admin_diagnostics(admin: dict = Depends(get_current_admin)):
+    """Row counts, database and WAL sizes, the last profit run, scheduler leadership and the readiness checks"""
+    return {
+        **await anyio.to_thread.run_sync(collect_database_diagnostics),
+        "readiness": await readiness_checks(),
+        "generated_at": datetime.now(timezone.utc).isoformat()
+    }
+
+@api_router.get("/admin/diagnostics/queries")
+async def admin_query_report(sort: str = "total", limit: int = 50, admin: dict = Depends(get_current_admin)):
+    """Per-statement SQL timings, statements whose plan scans a whole table, and recent slow queries"""
+    if sort not in ("total", "mean", "max", "calls", "rows"):
+        raise HTTPException(status_code=400, detail=f"Invalid sort: {sort}")
+    return query_stats.report(sort, max(1, min(limit, 500)))
+
+@api_router.delete("/admin/diagnostics/queries")
+async def admin_reset_query_report(admin: dict = Depends(get_current_admin)):
+    """Start the SQL statistics afresh, e.g. before reproducing a slow page"""
+    logger.info("Query statistics reset by %s", admin['email'])
+    query_stats.reset()
+    return {"message": "Query statistics reset"}
+
+@api_router.get("/admin/diagnostics/event-loop")
+async def admin_event_loop_report(limit: int = 20, admin: dict = Depends(get_current_admin)):
+    """Event-loop lag summary and the handlers/lines that blocked the loop the longest"""
+    return loop_monitor.report(max(1, min(limit, LOOP_LAG_MAX_OFFENDERS)))
+
+@api_router.delete("/admin/diagnostics/event-loop")
+async def admin_reset_event_loop_report(admin: dict = Depends(get_current_admin)):
+    logger.info("Event-loop statistics reset by %s", admin['email'])
+    loop_monitor.reset()
+    return {"message": "Event-loop statistics reset"}
+
+@api_router.get("/admin/diagnostics/profiles")
+async def admin_get_profiles(admin: dict = Depends(get_current_admin)):
+    """Stored request profiles, newest first"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, method, path, route, status, duration_ms, samples, admin_email, created_at
+        FROM request_profiles ORDER BY created_at DESC
+    ''')
+    profiles = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return {"profiles": profiles, "sample_interval_ms": PROFILE_SAMPLE_INTERVAL_MS}
+
+@api_router.get("/admin/diagnostics/profiles/{profile_id}")
+async def admin_download_profile(profile_id: str, format: str = "folded", admin: dict = Depends(get_current_admin)):
+    """Download a profile as collapsed stacks for flame-graph tools, or as a JSON call tree"""
+    if format not in ("folded", "tree"):
+        raise HTTPException(status_code=400, detail=f"Invalid format: {format}")
+    
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM request_profiles WHERE id = ?', (profile_id,))
+    profile = cursor.fetchone()
     conn.close()
     
-    return {"users": [dict(user) for user in users]}
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    if format == "tree":
+        profile = dict(profile)
+        profile["tree"] = fold_to_tree(profile.pop("folded"))
+        return profile
+    return Response(
+        content=profile["folded"] + "\n",
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id[:8]}.folded"'}
+    )
 
 # ============= HEALTH CHECK =============
 
 @api_router.get("/health")
-async def health_check():
+async def health_check(response: Response):
     # Check database connection
     try:
         conn = db.get_connection()
@@ -2268,21 +5467,112 @@ async def health_check():
         conn.close()
     except Exception as e:
         db_status = f"error: {str(e)}"
-        logger.error(f"Database health check failed: {e}")
+        logger.error("Database health check failed: %s", e)
+        response.status_code = 503
     
     return {
-        "status": "healthy",
+        "status": "healthy" if db_status == "connected" else "unhealthy",
         "database": db_status,
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "version": "1.0.0"
     }
 
+@api_router.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and the event loop answers. Touches nothing else."""
+    return {"status": "alive"}
+
+def check_db_write() -> dict:
+    """Time a one-row write transaction, the same lock every mutating request needs"""
+    started = time.perf_counter()
+    conn = db.get_connection()
+    try:
+        # Fail the probe rather than queue behind a long writer for the default 5 s
+        conn.execute(f"PRAGMA busy_timeout = {int(READY_MAX_DB_WRITE_MS * 4)}")
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+            INSERT INTO health_probes (name, checked_at) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET checked_at = excluded.checked_at
+        ''', (SCHEDULER_HOLDER, datetime.now(timezone.utc).isoformat()))
+        conn.commit()
+    except sqlite3.Error as e:
+        return {"ok": False, "error": str(e)}
+    finally:
+        conn.close()
+    write_ms = (time.perf_counter() - started) * 1000
+    return {"ok": write_ms <= READY_MAX_DB_WRITE_MS, "write_ms": round(write_ms, 3), "max_ms": READY_MAX_DB_WRITE_MS}
+
+def check_scheduler() -> dict:
+    """Who holds the scheduler lease. Diagnostics only: readiness must not depend on it, or every
+    worker would drop out together whenever the leader dies or the scheduler is disabled."""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT holder, expires_at FROM scheduler_leases WHERE name = ?', (SCHEDULER_LEASE_NAME,))
+    lease = cursor.fetchone()
+    conn.close()
+    
+    now = datetime.now(timezone.utc).isoformat()
+    leader = lease["holder"] if lease and lease["expires_at"] > now else None
+    return {
+        "running": scheduler.running,
+        "leader": leader,
+        "is_leader": leader == SCHEDULER_HOLDER,
+        "lease_expires_at": lease["expires_at"] if lease else None
+    }
+
+async def readiness_checks() -> dict:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    threadpool_usage = limiter.borrowed_tokens / limiter.total_tokens
+    connections = db_connections_open.get()
+    email_backlog = email_queue_depth.get()
+    return {
+        # The probe can wait on the write lock, so it must not hold up the event loop meanwhile
+        "database_write": await anyio.to_thread.run_sync(check_db_write),
+        "pool": {
+            # Sync dependencies and file reads share AnyIO's thread pool; SQLite connections are per request
+            "ok": threadpool_usage <= READY_MAX_THREADPOOL_USAGE and connections <= READY_MAX_DB_CONNECTIONS,
+            "threadpool_in_use": limiter.borrowed_tokens,
+            "threadpool_size": limiter.total_tokens,
+            "db_connections_open": connections,
+            "max_db_connections": READY_MAX_DB_CONNECTIONS
+        },
+        "email_backlog": {
+            "ok": email_backlog <= READY_MAX_EMAIL_BACKLOG,
+            "queued": email_backlog,
+            "max": READY_MAX_EMAIL_BACKLOG
+        }
+    }
+
+@api_router.get("/health/ready")
+async def health_ready(response: Response):
+    """Readiness: 503 with the failing checks when this worker should not take traffic"""
+    try:
+        checks = await readiness_checks()
+    except Exception as e:
+        logger.error("Readiness check failed: %s", e)
+        response.status_code = 503
+        return {"status": "not_ready", "error": str(e)}
+    ready = all(check["ok"] for check in checks.values())
+    if not ready:
+        response.status_code = 503
+        logger.warning("Not ready: %s", ", ".join(name for name, check in checks.items() if not check["ok"]))
+    return {
+        "status": "ready" if ready else "not_ready",
+        "checks": checks,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
 # ============= DAILY PROFIT PROCESSING =============
 
+@traced("job.process_daily_profits", root=True)
 async def process_daily_profits():
     """Process daily profits for all active investments"""
     logger.info("Processing daily profits...")
     
+    started_at = datetime.now(timezone.utc).isoformat()
+    started = time.perf_counter()
+    outcome, detail = "error", None
     conn = db.get_connection()
     cursor = conn.cursor()
     
@@ -2290,7 +5580,12 @@ async def process_daily_profits():
         cursor.execute('SELECT * FROM investments WHERE status = ?', ("active",))
         active_investments = cursor.fetchall()
         
-        logger.info(f"Found {len(active_investments)} active investments")
+        logger.info("Found %s active investments", len(active_investments))
+        
+        # All rows touched by this run share one sequence number for delta sync
+        run_seq = next_change_seq(cursor)
+        completed_count = 0
+        payouts = {}  # package_id -> (count, amount)
         
         for investment in active_investments:
             days_completed = investment["days_completed"] + 1
@@ -2298,26 +5593,31 @@ async def process_daily_profits():
             
             if days_completed >= investment["duration"]:
                 # Investment completed
+                completed_count += 1
                 cursor.execute('''
                 UPDATE investments 
-                SET days_completed = ?, profit_earned = ?, status = ?
+                SET days_completed = ?, profit_earned = ?, status = ?, change_seq = ?
                 WHERE id = ?
                 ''', (
                     days_completed,
                     profit_earned,
                     "completed",
+                    run_seq,
                     investment["id"]
                 ))
                 
                 # Credit total return to wallet
                 total_return = investment["capital"] + profit_earned
+                count, amount = payouts.get(investment["package_id"], (0, 0))
+                payouts[investment["package_id"]] = (count + 1, amount + total_return)
                 cursor.execute('''
                 UPDATE wallets 
                 SET balance = balance + ?
                 WHERE user_id = ?
                 ''', (total_return, investment["user_id"]))
+                record_change(cursor, "wallets", investment["user_id"])
                 
-                logger.info(f"Investment {investment['id']} completed. Credited {total_return} to user {investment['user_id']}")
+                logger.info("Investment %s completed. Credited %s to user %s", investment['id'], total_return, investment['user_id'])
                 
                 # Send completion email
                 cursor.execute('SELECT email, full_name FROM users WHERE id = ?', (investment["user_id"],))
@@ -2357,26 +5657,131 @@ async def process_daily_profits():
                     )
                     # FIXED: Use background_tasks pattern instead of asyncio.create_task
                     try:
-                        asyncio.create_task(send_email(user["email"], "FlexInvest - Investment Completed", html))
+                        queue_email(None, user["email"], "FlexInvest - Investment Completed", html)
                     except Exception as e:
-                        logger.error(f"Failed to create email task for investment completion: {e}")
+                        logger.error("Failed to create email task for investment completion: %s", e)
             else:
                 cursor.execute('''
                 UPDATE investments 
-                SET days_completed = ?, profit_earned = ?
+                SET days_completed = ?, profit_earned = ?, change_seq = ?
                 WHERE id = ?
                 ''', (
                     days_completed,
                     profit_earned,
+                    run_seq,
                     investment["id"]
                 ))
-                logger.info(f"Investment {investment['id']} day {days_completed} processed. Profit earned: {profit_earned}")
+                logger.info("Investment %s day %s processed. Profit earned: %s", investment['id'], days_completed, profit_earned)
         
+        # Every active investment moved forward, so one bump covers all users' investment views
+        bump_change_versions(cursor, "investments", "profit_run")
+        deltas = {"investments.active": -completed_count, "investments.completed": completed_count}
+        bump_stats(cursor, deltas)
+        today = datetime.now(timezone.utc).isoformat()
+        for package_id, (count, amount) in payouts.items():
+            bump_rollup(cursor, "payouts", today, amount, count, package_id)
         conn.commit()
+        event_hub.publish("profit_run.completed", {"investments": len(active_investments), "completed": completed_count}, deltas)
+        profit_runs.inc("success")
+        profit_run_last.set(value=time.time())
+        outcome, detail = "success", {"investments": len(active_investments), "completed": completed_count}
         logger.info("Daily profit processing completed")
     except Exception as e:
         conn.rollback()
-        logger.error(f"Error processing daily profits: {e}")
+        profit_runs.inc("error")
+        detail = {"error": str(e)}
+        logger.error("Error processing daily profits: %s", e)
+    finally:
+        conn.close()
+        duration = time.perf_counter() - started
+        profit_run_duration.observe(value=duration)
+        record_job_run("process_daily_profits", started_at, duration, outcome, detail)
+
+# ============= COUNTER VERIFICATION =============
+
+@traced("job.verify_stats_counters", root=True)
+async def verify_stats_counters():
+    """Nightly check of the maintained counters against the source tables"""
+    logger.info("Verifying stats counters...")
+    
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        # Hold the write lock so no transaction changes counters mid-rebuild
+        cursor.execute('BEGIN IMMEDIATE')
+        drift = rebuild_stats_counters(cursor)
+        if drift:
+            # Repaired values change what cached dashboards should show
+            bump_change_versions(cursor, *{name.split('.')[0] for name in drift})
+        conn.commit()
+        
+        if drift:
+            for name, values in drift.items():
+                logger.warning("Counter drift repaired: %s - Stored: %s, Actual: %s", name, values['stored'], values['actual'])
+        else:
+            logger.info("Stats counters verified, no drift")
+        return drift
+    except Exception as e:
+        conn.rollback()
+        logger.error("Error verifying stats counters: %s", e)
+    finally:
+        conn.close()
+
+# ============= SCHEDULER LEADERSHIP =============
+
+def renew_scheduler_lease() -> bool:
+    """Take or extend the scheduler lease; True when this worker holds it afterwards"""
+    now = datetime.now(timezone.utc)
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            INSERT INTO scheduler_leases (name, holder, acquired_at, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                holder = excluded.holder,
+                acquired_at = CASE WHEN scheduler_leases.holder = excluded.holder
+                                   THEN scheduler_leases.acquired_at ELSE excluded.acquired_at END,
+                expires_at = excluded.expires_at
+            WHERE scheduler_leases.holder = excluded.holder OR scheduler_leases.expires_at < ?
+        ''', (
+            SCHEDULER_LEASE_NAME, SCHEDULER_HOLDER, now.isoformat(),
+            (now + timedelta(seconds=SCHEDULER_LEASE_SECONDS)).isoformat(), now.isoformat()
+        ))
+        leader = cursor.rowcount == 1
+        conn.commit()
+        return leader
+    except sqlite3.Error as e:
+        logger.error("Failed to renew scheduler lease: %s", e)
+        return False
+    finally:
+        conn.close()
+
+def release_scheduler_lease():
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM scheduler_leases WHERE name = ? AND holder = ?', (SCHEDULER_LEASE_NAME, SCHEDULER_HOLDER))
+    conn.commit()
+    conn.close()
+
+async def run_if_leader(job):
+    """Cron wrapper: every worker schedules the jobs, only the lease holder runs them"""
+    if not renew_scheduler_lease():
+        logger.info("Skipping %s: scheduler lease held by another worker", job.__name__)
+        return
+    await job()
+
+def record_job_run(job: str, started_at: str, duration: float, outcome: str, detail: Optional[dict] = None):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            INSERT INTO job_runs (job, holder, started_at, duration_seconds, outcome, detail)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (job, SCHEDULER_HOLDER, started_at, round(duration, 3), outcome, json.dumps(detail) if detail else None))
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.error("Failed to record %s run: %s", job, e)
     finally:
         conn.close()
 
@@ -2389,15 +5794,24 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up FlexInvest API...")
     
-    # Start scheduler for daily profit processing
-    scheduler.add_job(process_daily_profits, 'cron', hour=0, minute=0)  # Run at midnight
+    # Start scheduler for daily profit processing; with several workers only the lease holder runs jobs
+    scheduler.add_job(run_if_leader, 'cron', hour=0, minute=0, args=[process_daily_profits])  # Run at midnight
+    scheduler.add_job(run_if_leader, 'cron', hour=1, minute=30, args=[verify_stats_counters])  # After the profit run
+    scheduler.add_job(renew_scheduler_lease, 'interval', seconds=SCHEDULER_LEASE_RENEW_SECONDS)
     scheduler.start()
+    if renew_scheduler_lease():
+        logger.info("Scheduler lease acquired by %s", SCHEDULER_HOLDER)
     logger.info("Scheduler started for daily profit processing")
     
+    if LOOP_LAG_MONITOR:
+        loop_monitor.start()
+    
     yield
     
     # Shutdown
+    await loop_monitor.stop()
     scheduler.shutdown()
+    release_scheduler_lease()
     logger.info("Shutting down FlexInvest API...")
 
 # ============= CREATE FASTAPI APP =============
@@ -2451,18 +5865,22 @@ origins += [
     'https://isquaredcapital.com.ng'
 ]
 
-logger.info(f"Configured CORS origins: {origins}")
+logger.info("Configured CORS origins: %s", origins)
+
+# Innermost: the origin logger below is a BaseHTTPMiddleware, which runs the rest of the app
+# in a task of its own, and the sampler can only see frames from the task it wraps
+app.add_middleware(ProfilingMiddleware)
 
 # Debug middleware to log incoming Origin header and response CORS header
 @app.middleware("http")
 async def _log_request_origin(request, call_next):
     origin = request.headers.get('origin')
     if origin:
-        logger.info(f"Incoming request Origin: {origin}")
+        origin_logger.info("Incoming request Origin: %s", origin)
     response = await call_next(request)
     acao = response.headers.get('access-control-allow-origin')
     if acao:
-        logger.info(f"Response Access-Control-Allow-Origin: {acao}")
+        origin_logger.info("Response Access-Control-Allow-Origin: %s", acao)
     return response
 
 app.add_middleware(
@@ -2484,9 +5902,20 @@ app.add_middleware(
     max_age=3600,
 )
 
+# Outermost, so CORS preflights and errors are measured and carry a request id
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestContextMiddleware)
+
 # Include router
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+    """Prometheus text exposition of request and application metrics"""
+    if METRICS_TOKEN and (not credentials or not secrets.compare_digest(credentials.credentials, METRICS_TOKEN)):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ============= MAIN ENTRY POINT =============
 
 if __name__ == "__main__":
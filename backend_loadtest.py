@@ -0,0 +1,349 @@
+"""In-process load test for the FlexInvest API.
+
+Serves the FastAPI app with uvicorn (lifespan on, so the scheduler and event-loop lag monitor run
+as in production) on its own thread and event loop against a throwaway SQLite database and a
+stub SMTP server, and drives it over HTTP from the harness loop. It replays user journeys (register -> verify -> bank account -> deposit ->
+subscribe -> withdraw, with reads in between) while admin approvers work the deposit and
+withdrawal queues, then reports per-endpoint p50/p95/p99 latency and requests per second, plus the server's
+event-loop lag so time spent blocked on the loop shows separately from endpoint cost.
+
+    python backend_loadtest.py --users 200 --concurrency 50 --approvers 2 --json loadtest.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+APPROVER_PASSWORD = "LoadTestAdmin123!"
+PROOF_IMAGE = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+
+class StubSMTPServer:
+    """Just enough SMTP for aiosmtplib: EHLO advertising AUTH PLAIN, MAIL/RCPT/DATA, QUIT.
+    Messages are counted and discarded."""
+
+    def __init__(self):
+        self.messages = 0
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        def reply(line):
+            writer.write(line.encode() + b"\r\n")
+
+        reply("220 stub ESMTP ready")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb == "EHLO":
+                    reply("250-stub")
+                    reply("250-AUTH PLAIN")
+                    reply("250 8BITMIME")
+                elif verb == "HELO":
+                    reply("250 stub")
+                elif verb == "AUTH":
+                    if len(command.split()) == 2:
+                        # AUTH PLAIN without an initial response: ask for it
+                        reply("334 ")
+                        await writer.drain()
+                        await reader.readline()
+                    reply("235 2.7.0 Authentication successful")
+                elif verb == "DATA":
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    await writer.drain()
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+                    self.messages += 1
+                    reply("250 2.0.0 Queued")
+                elif verb == "QUIT":
+                    reply("221 Bye")
+                    await writer.drain()
+                    break
+                else:
+                    # MAIL, RCPT, RSET, NOOP
+                    reply("250 OK")
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+class LoadTester:
+    def __init__(self, server, client, args):
+        self.server = server
+        self.client = client
+        self.args = args
+        self.samples = {}  # endpoint -> [seconds]
+        self.errors = {}  # endpoint -> count
+        self.journeys_completed = 0
+        self.journeys_failed = 0
+        self.users_done = asyncio.Event()
+
+    async def call(self, name, method, url, expected=200, **kwargs):
+        """Issue one request, recording its latency under `name` (a route template)"""
+        started = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.samples.setdefault(name, []).append(time.perf_counter() - started)
+        if response.status_code != expected:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            raise RuntimeError(f"{name}: expected {expected}, got {response.status_code} {response.text[:200]}")
+        return response.json() if response.headers.get("content-type", "").startswith("application/json") else response
+
+    def latest_otp(self, email):
+        # The code is only ever emailed; in-process we can read it straight from the database
+        conn = self.server.db.get_connection()
+        row = conn.execute("SELECT otp FROM otps WHERE email = ? ORDER BY created_at DESC LIMIT 1", (email,)).fetchone()
+        conn.close()
+        return row["otp"]
+
+    async def wait_for_balance(self, headers, minimum):
+        deadline = time.perf_counter() + self.args.approval_timeout
+        while time.perf_counter() < deadline:
+            wallet = await self.call("GET /user/wallet", "GET", "/user/wallet", headers=headers)
+            if wallet["balance"] >= minimum:
+                return wallet["balance"]
+            await asyncio.sleep(self.args.poll_interval)
+        raise RuntimeError(f"deposit not approved within {self.args.approval_timeout}s")
+
+    async def user_journey(self, number):
+        email = f"load_{number}_{random.randrange(10**9)}@example.com"
+        password = "LoadTest123!"
+        package = random.choice(self.server.INVESTMENT_PACKAGES[:3])
+
+        await self.call("POST /auth/register", "POST", "/auth/register", json={
+            "email": email, "password": password, "full_name": f"Load User {number}", "phone": "08012345678"
+        })
+        await self.call("GET /investments/packages", "GET", "/investments/packages")
+        verified = await self.call("POST /auth/verify-otp", "POST", "/auth/verify-otp", json={
+            "email": email, "otp": self.latest_otp(email)
+        })
+        headers = {"Authorization": f"Bearer {verified['token']}"}
+
+        await self.call("GET /user/dashboard", "GET", "/user/dashboard", headers=headers)
+        await self.call("POST /user/bank-account", "POST", "/user/bank-account", headers=headers, json={
+            "bank_name": "First Bank", "account_number": f"{number:010d}", "account_name": f"Load User {number}"
+        })
+        await self.call("GET /deposits/company-bank", "GET", "/deposits/company-bank")
+        deposit = package["capital"] + 5000
+        await self.call(
+            "POST /deposits/create", "POST", "/deposits/create", headers=headers,
+            data={"amount": str(deposit)}, files={"proof": ("proof.png", PROOF_IMAGE, "image/png")}
+        )
+        await self.wait_for_balance(headers, deposit)
+
+        await self.call("POST /investments/subscribe", "POST", "/investments/subscribe", headers=headers, json={
+            "package_id": package["id"]
+        })
+        await self.call("GET /investments/active", "GET", "/investments/active", headers=headers)
+        await self.call("POST /withdrawals/create", "POST", "/withdrawals/create", headers=headers, json={"amount": 2000})
+        await self.call("GET /withdrawals/history", "GET", "/withdrawals/history", headers=headers)
+        await self.call("GET /deposits/history", "GET", "/deposits/history", headers=headers)
+        await self.call("GET /user/dashboard", "GET", "/user/dashboard", headers=headers)
+
+    async def run_user(self, number, semaphore):
+        async with semaphore:
+            try:
+                await self.user_journey(number)
+                self.journeys_completed += 1
+            except Exception as e:
+                self.journeys_failed += 1
+                if self.journeys_failed <= 5:
+                    print(f"❌ Journey {number} failed: {e}")
+
+    def create_approver(self, number):
+        """Each approver is a separate admin so the claim queue hands them disjoint work"""
+        email = f"approver_{number}@example.com"
+        conn = self.server.db.get_connection()
+        conn.execute(
+            "INSERT OR IGNORE INTO admins (id, email, password, name, role, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (f"loadtest-approver-{number}", email, self.server.hash_password(APPROVER_PASSWORD), f"Approver {number}", "admin", "2024-01-01T00:00:00+00:00")
+        )
+        conn.commit()
+        conn.close()
+        return {"email": email, "password": APPROVER_PASSWORD}
+
+    async def approver(self, headers):
+        """Work both queues until every user journey has finished"""
+        while not self.users_done.is_set():
+            page = await self.call("GET /admin/deposits", "GET", "/admin/deposits", headers=headers, params={"status": "pending", "limit": 50})
+            ids = [deposit["id"] for deposit in page["deposits"]]
+            if ids:
+                await self.call("POST /admin/deposits/bulk", "POST", "/admin/deposits/bulk", headers=headers, json={
+                    "ids": ids, "status": "approved"
+                })
+            claimed = await self.call("POST /admin/queue/next", "POST", "/admin/queue/next", headers=headers, json={
+                "type": "withdrawals", "count": 20
+            })
+            for withdrawal in claimed["items"]:
+                await self.call("PUT /admin/withdrawals/{id}", "PUT", f"/admin/withdrawals/{withdrawal['id']}", headers=headers, json={
+                    "status": "approved"
+                })
+            await self.call("GET /admin/dashboard", "GET", "/admin/dashboard", headers=headers)
+            if not ids and not claimed["items"]:
+                await asyncio.sleep(self.args.poll_interval)
+
+    async def run(self):
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        started = time.perf_counter()
+        approvers = []
+        for number in range(self.args.approvers):
+            login = await self.call("POST /admin/login", "POST", "/admin/login", json=self.create_approver(number))
+            approvers.append(asyncio.create_task(self.approver({"Authorization": f"Bearer {login['token']}"})))
+        await asyncio.gather(*(self.run_user(number, semaphore) for number in range(self.args.users)))
+        self.users_done.set()
+        for result in await asyncio.gather(*approvers, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"❌ Approver failed: {result}")
+        return time.perf_counter() - started
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_report(tester, elapsed, smtp, loop_lag):
+    endpoints = {}
+    total = 0
+    for name, samples in sorted(tester.samples.items()):
+        ordered = sorted(samples)
+        total += len(ordered)
+        endpoints[name] = {
+            "requests": len(ordered),
+            "errors": tester.errors.get(name, 0),
+            "rps": round(len(ordered) / elapsed, 2),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+    return {
+        "users": tester.args.users,
+        "concurrency": tester.args.concurrency,
+        "approvers": tester.args.approvers,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests": total,
+        "rps": round(total / elapsed, 2),
+        "journeys_completed": tester.journeys_completed,
+        "journeys_failed": tester.journeys_failed,
+        "emails_delivered": smtp.messages,
+        "endpoints": endpoints,
+        "event_loop": {
+            "samples": loop_lag["samples"],
+            "max_lag_ms": loop_lag["max_lag_ms"],
+            "offenders": [
+                {key: offender[key] for key in ("handler", "location", "stalls", "total_ms", "max_ms")}
+                for offender in loop_lag["offenders"]
+            ],
+        },
+    }
+
+
+def print_report(report):
+    print("\n" + "=" * 96)
+    print(f"📊 {report['journeys_completed']} journeys ({report['journeys_failed']} failed), "
+          f"{report['requests']} requests in {report['elapsed_seconds']}s = {report['rps']} req/s, "
+          f"{report['emails_delivered']} emails")
+    print("=" * 96)
+    print(f"{'endpoint':<34}{'reqs':>7}{'errs':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, stats in report["endpoints"].items():
+        print(f"{name:<34}{stats['requests']:>7}{stats['errors']:>6}{stats['rps']:>9}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}")
+    loop = report["event_loop"]
+    print(f"\n🐢 Event loop: max lag {loop['max_lag_ms']} ms across {loop['samples']} samples")
+    for offender in loop["offenders"]:
+        print(f"   {offender['handler'] or '-':<30}{offender['location']:<50}"
+              f"{offender['stalls']:>6}x  total {offender['total_ms']} ms, max {offender['max_ms']} ms")
+
+
+async def main(args):
+    smtp = StubSMTPServer()
+    await smtp.start()
+
+    workdir = Path(tempfile.mkdtemp(prefix="flexinvest-loadtest-"))
+    # The server reads its configuration at import time
+    os.environ["FLEXINVEST_DB_PATH"] = str(args.db or workdir / "loadtest.db")
+    os.environ["SMTP_HOST"] = "127.0.0.1"
+    os.environ["SMTP_PORT"] = str(smtp.port)
+    os.environ["SMTP_START_TLS"] = "false"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, str(BACKEND_DIR))
+    import httpx
+    import uvicorn
+    import server
+
+    # The app gets its own thread and loop so harness work never shows up as server latency
+    port = free_port()
+    web = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, lifespan="on", log_level="warning"))
+    serving = threading.Thread(target=web.run, name="loadtest-uvicorn", daemon=True)
+    serving.start()
+    while not web.started:
+        if not serving.is_alive():
+            print("❌ Server failed to start")
+            return 1
+        await asyncio.sleep(0.05)
+
+    print(f"🚀 Load testing FlexInvest on 127.0.0.1:{port}: {args.users} users, concurrency {args.concurrency}, "
+          f"{args.approvers} approvers, database {server.DB_PATH}")
+
+    limits = httpx.Limits(max_connections=args.concurrency + args.approvers + 10)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}/api", timeout=120, limits=limits) as client:
+            tester = LoadTester(server, client, args)
+            elapsed = await tester.run()
+            # Let the last background emails drain before counting them
+            await asyncio.sleep(0.5)
+        loop_lag = server.loop_monitor.report()
+    finally:
+        web.should_exit = True
+        await asyncio.to_thread(serving.join)
+
+    await smtp.stop()
+    report = build_report(tester, elapsed, smtp, loop_lag)
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Results written to {args.json}")
+    return 0 if tester.journeys_failed == 0 else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-process load test for the FlexInvest API")
+    parser.add_argument("--users", type=int, default=50, help="user journeys to run")
+    parser.add_argument("--concurrency", type=int, default=20, help="journeys in flight at once")
+    parser.add_argument("--approvers", type=int, default=2, help="admins working the approval queues")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="seconds between queue/wallet polls")
+    parser.add_argument("--approval-timeout", type=float, default=60, help="seconds a user waits for deposit approval")
+    parser.add_argument("--db", help="database path (default: a fresh temporary file)")
+    parser.add_argument("--json", help="write the report as JSON to this path")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,62 @@
+import { useCallback, useEffect, useRef, useState } from "react"
+import axios from "axios"
+
+// List endpoints return one keyset page as { [key]: [...], next_cursor, ...extras }. This holds the
+// pages loaded so far and fetches the next one only when loadMore is called; a new url, token or
+// params starts over from the first page. `extras` is the rest of the first page, e.g. queue counts.
+export function useCursorPages(url, key, { token, params = {} } = {}) {
+  const [items, setItems] = useState([])
+  const [extras, setExtras] = useState({})
+  const [cursor, setCursor] = useState(null)
+  const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
+  // Bumped on every reload so a slow response for old filters can't overwrite newer results
+  const generation = useRef(0)
+  const query = JSON.stringify(params)
+
+  const fetchPage = useCallback(async (after) => {
+    const response = await axios.get(url, {
+      headers: { Authorization: `Bearer ${token}` },
+      params: { ...JSON.parse(query), ...(after ? { cursor: after } : {}) },
+    })
+    return response.data
+  }, [url, token, query])
+
+  const reload = useCallback(async () => {
+    const current = ++generation.current
+    setLoading(true)
+    try {
+      const { [key]: page, next_cursor, ...rest } = await fetchPage(null)
+      if (current !== generation.current) return
+      setItems(page || [])
+      setExtras(rest)
+      setCursor(next_cursor || null)
+    } catch (error) {
+      console.error(`Failed to fetch ${key}:`, error)
+    } finally {
+      if (current === generation.current) setLoading(false)
+    }
+  }, [fetchPage, key])
+
+  const loadMore = useCallback(async () => {
+    if (!cursor || loadingMore) return
+    const current = generation.current
+    setLoadingMore(true)
+    try {
+      const data = await fetchPage(cursor)
+      if (current !== generation.current) return
+      setItems((loaded) => [...loaded, ...(data[key] || [])])
+      setCursor(data.next_cursor || null)
+    } catch (error) {
+      console.error(`Failed to fetch more ${key}:`, error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }, [cursor, loadingMore, fetchPage, key])
+
+  useEffect(() => {
+    if (token) reload()
+  }, [token, reload])
+
+  return { items, extras, loading, loadingMore, hasMore: Boolean(cursor), loadMore, reload }
+}
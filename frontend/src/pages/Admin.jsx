@@ -2,6 +2,7 @@ import React, { useState, useEffect } from "react";
 import { Link, useNavigate, useLocation } from "react-router-dom";
 import axios from "axios";
 import { useAuth } from "../contexts/AuthContext";
+import { useCursorPages } from "../hooks/use-cursor-pages";
 import { Button } from "../components/ui/button";
 import {
   Card,
@@ -20,6 +21,14 @@ import {
   DialogFooter,
 } from "../components/ui/dialog";
 import { Textarea } from "../components/ui/textarea";
+import { Tabs, TabsList, TabsTrigger } from "../components/ui/tabs";
+import {
+  Select,
+  SelectContent,
+  SelectItem,
+  SelectTrigger,
+  SelectValue,
+} from "../components/ui/select";
 import {
   TrendingUp,
   Users,
@@ -59,6 +68,42 @@ const StatusBadge = ({ status }) => {
   return <span className={styles[status] || "badge-pending"}>{status}</span>;
 };
 
+// Fetches the next page of a useCursorPages list; hidden once the last page is in
+const LoadMoreButton = ({ pages, testId }) =>
+  pages.hasMore ? (
+    <div className="flex justify-center">
+      <Button
+        onClick={pages.loadMore}
+        className="btn-secondary"
+        disabled={pages.loadingMore}
+        data-testid={testId}
+      >
+        {pages.loadingMore ? (
+          <Loader2 className="w-4 h-4 animate-spin mr-2" />
+        ) : null}
+        Load more
+      </Button>
+    </div>
+  ) : null;
+
+// Status tabs for an admin queue; the totals are the maintained counters the first page returns
+const QueueTabs = ({ statuses, value, onChange, counts }) => (
+  <Tabs value={value} onValueChange={onChange}>
+    <TabsList className="bg-slate-900/60 border border-slate-800 p-1">
+      {statuses.map((status) => (
+        <TabsTrigger
+          key={status}
+          value={status}
+          className="capitalize data-[state=active]:bg-emerald-500 data-[state=active]:text-slate-950"
+          data-testid={`queue-tab-${status}`}
+        >
+          {status} ({Number(counts?.[status] || 0).toLocaleString()})
+        </TabsTrigger>
+      ))}
+    </TabsList>
+  </Tabs>
+);
+
 // Admin Login Page
 export const AdminLoginPage = () => {
   const navigate = useNavigate();
@@ -448,29 +493,32 @@ export const AdminDashboard = () => {
 // Admin Users Page
 export const AdminUsersPage = () => {
   const { adminToken } = useAuth();
-  const [users, setUsers] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const [search, setSearch] = useState("");
+  const [prefix, setPrefix] = useState("");
+  const [verified, setVerified] = useState("all");
+  const [sort, setSort] = useState("created_at");
   const [creditModal, setCreditModal] = useState({ open: false, user: null });
   const [creditAmount, setCreditAmount] = useState("");
   const [creditReason, setCreditReason] = useState("");
   const [submitting, setSubmitting] = useState(false);
 
-  useEffect(() => {
-    fetchUsers();
-  }, [adminToken]);
+  // Filtering and sorting happen on the server; only the pages asked for are loaded
+  const pages = useCursorPages(`${API_URL}/admin/users`, "users", {
+    token: adminToken,
+    params: {
+      limit: 50,
+      sort,
+      ...(verified === "all" ? {} : { verified: verified === "verified" }),
+      ...(prefix ? { search: prefix } : {}),
+    },
+  });
+  const { items: users, loading, reload: fetchUsers } = pages;
 
-  const fetchUsers = async () => {
-    try {
-      const response = await axios.get(`${API_URL}/admin/users`, {
-        headers: { Authorization: `Bearer ${adminToken}` },
-      });
-      setUsers(response.data.users || []);
-    } catch (error) {
-      console.error("Failed to fetch users:", error);
-    } finally {
-      setLoading(false);
-    }
-  };
+  // The search is a prefix match on email, name or phone; wait for a pause in typing
+  useEffect(() => {
+    const timer = setTimeout(() => setPrefix(search.trim()), 300);
+    return () => clearTimeout(timer);
+  }, [search]);
 
   const handleCreditWallet = async () => {
     if (!creditAmount || !creditReason) {
@@ -513,6 +561,51 @@ export const AdminUsersPage = () => {
           <p className="text-slate-400">Manage platform users</p>
         </div>
 
+        <div className="flex flex-col md:flex-row gap-3">
+          <Input
+            value={search}
+            onChange={(e) => setSearch(e.target.value)}
+            placeholder="Search by email, name or phone"
+            className="bg-slate-950/50 border-slate-800 text-white md:max-w-sm"
+            data-testid="users-search"
+          />
+          <Select value={verified} onValueChange={setVerified}>
+            <SelectTrigger
+              className="bg-slate-950/50 border-slate-800 text-white md:w-44"
+              data-testid="users-verified-filter"
+            >
+              <SelectValue />
+            </SelectTrigger>
+            <SelectContent className="bg-slate-900 border-slate-800">
+              <SelectItem value="all" className="text-white hover:bg-slate-800">
+                All users
+              </SelectItem>
+              <SelectItem value="verified" className="text-white hover:bg-slate-800">
+                Verified
+              </SelectItem>
+              <SelectItem value="unverified" className="text-white hover:bg-slate-800">
+                Unverified
+              </SelectItem>
+            </SelectContent>
+          </Select>
+          <Select value={sort} onValueChange={setSort}>
+            <SelectTrigger
+              className="bg-slate-950/50 border-slate-800 text-white md:w-44"
+              data-testid="users-sort"
+            >
+              <SelectValue />
+            </SelectTrigger>
+            <SelectContent className="bg-slate-900 border-slate-800">
+              <SelectItem value="created_at" className="text-white hover:bg-slate-800">
+                Newest first
+              </SelectItem>
+              <SelectItem value="balance" className="text-white hover:bg-slate-800">
+                Highest balance
+              </SelectItem>
+            </SelectContent>
+          </Select>
+        </div>
+
         {loading ? (
           <div className="flex justify-center py-12">
             <Loader2 className="w-8 h-8 animate-spin text-emerald-500" />
@@ -541,6 +634,13 @@ export const AdminUsersPage = () => {
                   </tr>
                 </thead>
                 <tbody>
+                  {users.length === 0 && (
+                    <tr>
+                      <td colSpan={5} className="py-8 px-6 text-center text-slate-400">
+                        No users found
+                      </td>
+                    </tr>
+                  )}
                   {users.map((user) => (
                     <tr
                       key={user.id}
@@ -583,6 +683,8 @@ export const AdminUsersPage = () => {
           </Card>
         )}
 
+        {!loading && <LoadMoreButton pages={pages} testId="load-more-users" />}
+
         {/* Credit Wallet Modal */}
         <Dialog
           open={creditModal.open}
@@ -649,8 +751,7 @@ export const AdminUsersPage = () => {
 // Admin Deposits Page
 export const AdminDepositsPage = () => {
   const { adminToken } = useAuth();
-  const [deposits, setDeposits] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const [status, setStatus] = useState("pending");
   const [proofModal, setProofModal] = useState({
     open: false,
     deposit: null,
@@ -664,22 +765,12 @@ export const AdminDepositsPage = () => {
   const [reason, setReason] = useState("");
   const [submitting, setSubmitting] = useState(false);
 
-  useEffect(() => {
-    fetchDeposits();
-  }, [adminToken]);
-
-  const fetchDeposits = async () => {
-    try {
-      const response = await axios.get(`${API_URL}/admin/deposits`, {
-        headers: { Authorization: `Bearer ${adminToken}` },
-      });
-      setDeposits(response.data.deposits || []);
-    } catch (error) {
-      console.error("Failed to fetch deposits:", error);
-    } finally {
-      setLoading(false);
-    }
-  };
+  // One status at a time, so the queue walks its (status, created_at) index a page at a time
+  const pages = useCursorPages(`${API_URL}/admin/deposits`, "deposits", {
+    token: adminToken,
+    params: { status, limit: 50 },
+  });
+  const { items: deposits, extras, loading, reload: fetchDeposits } = pages;
 
   const viewProof = async (deposit) => {
     try {
@@ -734,6 +825,13 @@ export const AdminDepositsPage = () => {
           <p className="text-slate-400">Review and approve funding requests</p>
         </div>
 
+        <QueueTabs
+          statuses={["pending", "approved", "rejected"]}
+          value={status}
+          onChange={setStatus}
+          counts={extras.counts}
+        />
+
         {loading ? (
           <div className="flex justify-center py-12">
             <Loader2 className="w-8 h-8 animate-spin text-emerald-500" />
@@ -762,6 +860,13 @@ export const AdminDepositsPage = () => {
                   </tr>
                 </thead>
                 <tbody>
+                  {deposits.length === 0 && (
+                    <tr>
+                      <td colSpan={5} className="py-8 px-6 text-center text-slate-400">
+                        No {status} deposits
+                      </td>
+                    </tr>
+                  )}
                   {deposits.map((deposit) => (
                     <tr
                       key={deposit.id}
@@ -839,6 +944,8 @@ export const AdminDepositsPage = () => {
           </Card>
         )}
 
+        {!loading && <LoadMoreButton pages={pages} testId="load-more-deposits" />}
+
         {/* Proof Modal */}
         <Dialog
           open={proofModal.open}
@@ -933,4 +1040,4 @@ export const AdminDepositsPage = () => {
   );
 };
 
-export { AdminLayout };
+export { AdminLayout, LoadMoreButton, QueueTabs };
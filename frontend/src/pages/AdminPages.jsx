@@ -1,7 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import axios from 'axios';
 import { useAuth } from '../contexts/AuthContext';
-import { AdminLayout } from './Admin';
+import { useCursorPages } from '../hooks/use-cursor-pages';
+import { AdminLayout, LoadMoreButton, QueueTabs } from './Admin';
 import { Button } from '../components/ui/button';
 import { Card } from '../components/ui/card';
 import { Dialog, DialogContent, DialogDescription, DialogHeader, DialogTitle, DialogFooter } from '../components/ui/dialog';
@@ -31,28 +32,17 @@ const StatusBadge = ({ status }) => {
 // Admin Withdrawals Page
 export const AdminWithdrawalsPage = () => {
   const { adminToken } = useAuth();
-  const [withdrawals, setWithdrawals] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const [status, setStatus] = useState('pending');
   const [actionModal, setActionModal] = useState({ open: false, withdrawal: null, action: null });
   const [reason, setReason] = useState('');
   const [submitting, setSubmitting] = useState(false);
 
-  useEffect(() => {
-    fetchWithdrawals();
-  }, [adminToken]);
-
-  const fetchWithdrawals = async () => {
-    try {
-      const response = await axios.get(`${API_URL}/admin/withdrawals`, {
-        headers: { Authorization: `Bearer ${adminToken}` }
-      });
-      setWithdrawals(response.data.withdrawals || []);
-    } catch (error) {
-      console.error('Failed to fetch withdrawals:', error);
-    } finally {
-      setLoading(false);
-    }
-  };
+  // One status at a time, so the queue walks its (status, created_at) index a page at a time
+  const pages = useCursorPages(`${API_URL}/admin/withdrawals`, 'withdrawals', {
+    token: adminToken,
+    params: { status, limit: 50 }
+  });
+  const { items: withdrawals, extras, loading, reload: fetchWithdrawals } = pages;
 
   const handleAction = async () => {
     if (actionModal.action === 'rejected' && !reason) {
@@ -87,6 +77,8 @@ export const AdminWithdrawalsPage = () => {
           <p className="text-slate-400">Review and process withdrawal requests</p>
         </div>
 
+        <QueueTabs statuses={['pending', 'approved', 'rejected']} value={status} onChange={setStatus} counts={extras.counts} />
+
         {loading ? (
           <div className="flex justify-center py-12">
             <Loader2 className="w-8 h-8 animate-spin text-emerald-500" />
@@ -106,6 +98,11 @@ export const AdminWithdrawalsPage = () => {
                   </tr>
                 </thead>
                 <tbody>
+                  {withdrawals.length === 0 && (
+                    <tr>
+                      <td colSpan={6} className="py-8 px-6 text-center text-slate-400">No {status} withdrawals</td>
+                    </tr>
+                  )}
                   {withdrawals.map((withdrawal) => (
                     <tr key={withdrawal.id} className="border-b border-slate-800/50 hover:bg-slate-800/30">
                       <td className="py-4 px-6">
@@ -152,6 +149,8 @@ export const AdminWithdrawalsPage = () => {
           </Card>
         )}
 
+        {!loading && <LoadMoreButton pages={pages} testId="load-more-withdrawals" />}
+
         {/* Action Modal */}
         <Dialog open={actionModal.open} onOpenChange={(open) => setActionModal({ ...actionModal, open })}>
           <DialogContent className="bg-slate-900 border-slate-800 text-white">
@@ -209,28 +208,13 @@ export const AdminWithdrawalsPage = () => {
 // Admin Investments Page
 export const AdminInvestmentsPage = () => {
   const { adminToken } = useAuth();
-  const [investments, setInvestments] = useState([]);
-  const [loading, setLoading] = useState(true);
-
-  useEffect(() => {
-    const fetchInvestments = async () => {
-      try {
-        // Get all users first, then their investments
-        const usersRes = await axios.get(`${API_URL}/admin/users`, {
-          headers: { Authorization: `Bearer ${adminToken}` }
-        });
-        
-        // For now, we'll show users with their wallet balances
-        // In a real app, you'd have an admin endpoint to list all investments
-        setInvestments(usersRes.data.users || []);
-      } catch (error) {
-        console.error('Failed to fetch investments:', error);
-      } finally {
-        setLoading(false);
-      }
-    };
-    fetchInvestments();
-  }, [adminToken]);
+  // For now, we'll show users with their wallet balances, largest first, a page at a time
+  // In a real app, you'd have an admin endpoint to list all investments
+  const pages = useCursorPages(`${API_URL}/admin/users`, 'users', {
+    token: adminToken,
+    params: { limit: 50, sort: 'balance' }
+  });
+  const { items: investments, loading } = pages;
 
   return (
     <AdminLayout>
@@ -276,6 +260,8 @@ export const AdminInvestmentsPage = () => {
             </div>
           </Card>
         )}
+
+        {!loading && <LoadMoreButton pages={pages} testId="load-more-investments" />}
       </div>
     </AdminLayout>
   );
@@ -284,28 +270,16 @@ export const AdminInvestmentsPage = () => {
 // Admin Complaints Page
 export const AdminComplaintsPage = () => {
   const { adminToken } = useAuth();
-  const [complaints, setComplaints] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const [status, setStatus] = useState('open');
   const [responseModal, setResponseModal] = useState({ open: false, complaint: null });
   const [response, setResponse] = useState('');
   const [submitting, setSubmitting] = useState(false);
 
-  useEffect(() => {
-    fetchComplaints();
-  }, [adminToken]);
-
-  const fetchComplaints = async () => {
-    try {
-      const res = await axios.get(`${API_URL}/admin/complaints`, {
-        headers: { Authorization: `Bearer ${adminToken}` }
-      });
-      setComplaints(res.data.complaints || []);
-    } catch (error) {
-      console.error('Failed to fetch complaints:', error);
-    } finally {
-      setLoading(false);
-    }
-  };
+  const pages = useCursorPages(`${API_URL}/admin/complaints`, 'complaints', {
+    token: adminToken,
+    params: { status, limit: 50 }
+  });
+  const { items: complaints, extras, loading, reload: fetchComplaints } = pages;
 
   const handleRespond = async () => {
     setSubmitting(true);
@@ -332,6 +306,8 @@ export const AdminComplaintsPage = () => {
           <p className="text-slate-400">View and respond to user complaints</p>
         </div>
 
+        <QueueTabs statuses={['open', 'resolved']} value={status} onChange={setStatus} counts={extras.counts} />
+
         {loading ? (
           <div className="flex justify-center py-12">
             <Loader2 className="w-8 h-8 animate-spin text-emerald-500" />
@@ -340,7 +316,7 @@ export const AdminComplaintsPage = () => {
           <Card className="bg-slate-900/60 backdrop-blur-md border-slate-800">
             <div className="p-8 text-center">
               <MessageSquare className="w-12 h-12 text-slate-600 mx-auto mb-4" />
-              <div className="text-slate-400">No complaints yet</div>
+              <div className="text-slate-400">No {status} complaints</div>
             </div>
           </Card>
         ) : (
@@ -379,6 +355,8 @@ export const AdminComplaintsPage = () => {
           </div>
         )}
 
+        {!loading && <LoadMoreButton pages={pages} testId="load-more-complaints" />}
+
         {/* Response Modal */}
         <Dialog open={responseModal.open} onOpenChange={(open) => setResponseModal({ ...responseModal, open })}>
           <DialogContent className="bg-slate-900 border-slate-800 text-white">
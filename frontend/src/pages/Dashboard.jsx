@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link, useNavigate, useLocation } from 'react-router-dom';
 import axios from 'axios';
 import { useAuth } from '../contexts/AuthContext';
+import { useCursorPages } from '../hooks/use-cursor-pages';
 import { Button } from '../components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Input } from '../components/ui/input';
@@ -11,7 +12,7 @@ import { Progress } from '../components/ui/progress';
 import { 
   TrendingUp, Wallet, Home, Package, History, LogOut, Menu, X, 
   Banknote, Upload, Plus, ArrowUpRight, ArrowDownLeft, Clock, 
-  CheckCircle, XCircle, ChevronRight, HelpCircle, MessageSquare
+  CheckCircle, XCircle, ChevronRight, HelpCircle, MessageSquare, Loader2
 } from 'lucide-react';
 import { toast } from 'sonner';
 
@@ -33,6 +34,16 @@ const StatusBadge = ({ status }) => {
   return <span className={styles[status] || 'badge-pending'}>{status}</span>;
 };
 
+// Fetches the next page of a useCursorPages list; hidden once the last page is in
+const LoadMoreButton = ({ pages, testId }) => pages.hasMore ? (
+  <div className="flex justify-center mt-4">
+    <Button onClick={pages.loadMore} className="btn-secondary" disabled={pages.loadingMore} data-testid={testId}>
+      {pages.loadingMore ? <Loader2 className="w-4 h-4 animate-spin mr-2" /> : null}
+      Load more
+    </Button>
+  </div>
+) : null;
+
 const Sidebar = ({ isOpen, setIsOpen }) => {
   const { logout, user } = useAuth();
   const navigate = useNavigate();
@@ -315,24 +326,23 @@ export const InvestmentsPage = () => {
   const { token, user, refreshProfile } = useAuth();
   const [packages, setPackages] = useState([]);
   const [activeInvestments, setActiveInvestments] = useState([]);
-  const [allInvestments, setAllInvestments] = useState([]);
   const [loading, setLoading] = useState(true);
   const [selectedPackage, setSelectedPackage] = useState(null);
   const [showConfirmModal, setShowConfirmModal] = useState(false);
   const [investing, setInvesting] = useState(false);
+  const history = useCursorPages(`${API_URL}/investments/history`, 'investments', { token });
+  const allInvestments = history.items;
 
   useEffect(() => {
     const fetchAll = async () => {
       setLoading(true);
       try {
-        const [pkg, active, all] = await Promise.all([
+        const [pkg, active] = await Promise.all([
           axios.get(`${API_URL}/investments/packages`),
-          axios.get(`${API_URL}/investments/active`, { headers: { Authorization: `Bearer ${token}` } }),
-          axios.get(`${API_URL}/investments/history`, { headers: { Authorization: `Bearer ${token}` } })
+          axios.get(`${API_URL}/investments/active`, { headers: { Authorization: `Bearer ${token}` } })
         ]);
         setPackages(pkg.data.packages || []);
         setActiveInvestments(active.data.investments || []);
-        setAllInvestments(all.data.investments || []);
       } catch (err) {
         console.error(err);
       }
@@ -357,12 +367,11 @@ export const InvestmentsPage = () => {
       setShowConfirmModal(false);
       await refreshProfile();
       // Refresh investments on page
-      const [active, all] = await Promise.all([
+      const [active] = await Promise.all([
         axios.get(`${API_URL}/investments/active`, { headers: { Authorization: `Bearer ${token}` } }),
-        axios.get(`${API_URL}/investments/history`, { headers: { Authorization: `Bearer ${token}` } })
+        history.reload()
       ]);
       setActiveInvestments(active.data.investments || []);
-      setAllInvestments(all.data.investments || []);
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Failed to start investment');
     } finally {
@@ -490,6 +499,7 @@ export const InvestmentsPage = () => {
                 </table>
               </div>
             </Card>
+            <LoadMoreButton pages={history} testId="load-more-investments" />
           </div>
         )}
         {/* Confirm Investment Dialog */}
@@ -542,4 +552,4 @@ export const InvestmentsPage = () => {
   );
 };
 
-export { DashboardLayout };
+export { DashboardLayout, LoadMoreButton };
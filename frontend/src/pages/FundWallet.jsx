@@ -1,7 +1,8 @@
-import React, { useState, useEffect, useRef } from "react";
+import React, { useState, useRef } from "react";
 import axios from "axios";
 import { useAuth } from "../contexts/AuthContext";
-import { DashboardLayout } from "./Dashboard";
+import { useCursorPages } from "../hooks/use-cursor-pages";
+import { DashboardLayout, LoadMoreButton } from "./Dashboard";
 import { Button } from "../components/ui/button";
 import {
   Card,
@@ -49,8 +50,6 @@ export const FundWalletPage = () => {
   const { token, refreshProfile } = useAuth();
   // Override companyBank with the static bank info
   const [companyBank] = useState(STATIC_BANK);
-  const [deposits, setDeposits] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [showUploadModal, setShowUploadModal] = useState(false);
   const [amount, setAmount] = useState("");
   const [proofFile, setProofFile] = useState(null);
@@ -59,22 +58,11 @@ export const FundWalletPage = () => {
   const [copied, setCopied] = useState(false);
   const fileInputRef = useRef(null);
 
-  useEffect(() => {
-    const fetchDeposits = async () => {
-      try {
-        // Fetch only deposits, bank info is static
-        const depositsRes = await axios.get(`${API_URL}/deposits/history`, {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        setDeposits(depositsRes.data.deposits || []);
-      } catch (error) {
-        setDeposits([]);
-      } finally {
-        setLoading(false);
-      }
-    };
-    fetchDeposits();
-  }, [token]);
+  // Bank info is static; only the deposit history is fetched, a page at a time
+  const history = useCursorPages(`${API_URL}/deposits/history`, "deposits", {
+    token,
+  });
+  const deposits = history.items;
 
   const handleCopy = (text) => {
     navigator.clipboard.writeText(text);
@@ -123,10 +111,7 @@ export const FundWalletPage = () => {
       setProofPreview(null);
 
       // Refresh deposits
-      const depositsRes = await axios.get(`${API_URL}/deposits/history`, {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      setDeposits(depositsRes.data.deposits || []);
+      await history.reload();
     } catch (error) {
       toast.error(
         error?.response?.data?.detail || "Failed to submit deposit request",
@@ -316,6 +301,7 @@ export const FundWalletPage = () => {
               </div>
             </Card>
           )}
+          <LoadMoreButton pages={history} testId="load-more-deposits" />
         </div>
 
         {/* Upload Modal */}
@@ -1,7 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { useAuth } from '../contexts/AuthContext';
-import { DashboardLayout } from './Dashboard';
+import { useCursorPages } from '../hooks/use-cursor-pages';
+import { DashboardLayout, LoadMoreButton } from './Dashboard';
 import { Button } from '../components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Input } from '../components/ui/input';
@@ -24,20 +25,17 @@ const StatusBadge = ({ status }) => {
 export const SupportPage = () => {
   const { token } = useAuth();
   const [supportLinks, setSupportLinks] = useState(null);
-  const [complaints, setComplaints] = useState([]);
   const [loading, setLoading] = useState(true);
   const [submitting, setSubmitting] = useState(false);
   const [form, setForm] = useState({ subject: '', message: '' });
+  const history = useCursorPages(`${API_URL}/complaints/history`, 'complaints', { token });
+  const complaints = history.items;
 
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [linksRes, complaintsRes] = await Promise.all([
-          axios.get(`${API_URL}/support/links`),
-          axios.get(`${API_URL}/complaints/history`, { headers: { Authorization: `Bearer ${token}` } })
-        ]);
+        const linksRes = await axios.get(`${API_URL}/support/links`);
         setSupportLinks(linksRes.data.links);
-        setComplaints(complaintsRes.data.complaints || []);
       } catch (error) {
         console.error('Failed to fetch data:', error);
       } finally {
@@ -63,8 +61,7 @@ export const SupportPage = () => {
       setForm({ subject: '', message: '' });
       
       // Refresh complaints
-      const complaintsRes = await axios.get(`${API_URL}/complaints/history`, { headers: { Authorization: `Bearer ${token}` } });
-      setComplaints(complaintsRes.data.complaints || []);
+      await history.reload();
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Failed to submit complaint');
     } finally {
@@ -221,6 +218,7 @@ export const SupportPage = () => {
                 </Card>
               ))}
             </div>
+            <LoadMoreButton pages={history} testId="load-more-complaints" />
           </div>
         )}
       </div>
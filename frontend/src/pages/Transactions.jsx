@@ -1,7 +1,7 @@
-import React, { useState, useEffect } from 'react';
-import axios from 'axios';
+import React from 'react';
 import { useAuth } from '../contexts/AuthContext';
-import { DashboardLayout } from './Dashboard';
+import { useCursorPages } from '../hooks/use-cursor-pages';
+import { DashboardLayout, LoadMoreButton } from './Dashboard';
 import { Card, CardContent } from '../components/ui/card';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '../components/ui/tabs';
 import { ArrowUpRight, ArrowDownLeft, TrendingUp, Clock } from 'lucide-react';
@@ -22,39 +22,26 @@ const StatusBadge = ({ status }) => {
   return <span className={styles[status] || 'badge-pending'}>{status}</span>;
 };
 
+const FEED_STYLES = {
+  deposit: { icon: ArrowDownLeft, color: 'emerald' },
+  withdrawal: { icon: ArrowUpRight, color: 'red' },
+  investment: { icon: TrendingUp, color: 'blue' },
+  credit: { icon: ArrowDownLeft, color: 'emerald' },
+};
+
 export const TransactionsPage = () => {
   const { token } = useAuth();
-  const [deposits, setDeposits] = useState([]);
-  const [withdrawals, setWithdrawals] = useState([]);
-  const [investments, setInvestments] = useState([]);
-  const [loading, setLoading] = useState(true);
-
-  useEffect(() => {
-    const fetchData = async () => {
-      try {
-        const [depositsRes, withdrawalsRes, investmentsRes] = await Promise.all([
-          axios.get(`${API_URL}/deposits/history`, { headers: { Authorization: `Bearer ${token}` } }),
-          axios.get(`${API_URL}/withdrawals/history`, { headers: { Authorization: `Bearer ${token}` } }),
-          axios.get(`${API_URL}/investments/history`, { headers: { Authorization: `Bearer ${token}` } })
-        ]);
-        setDeposits(depositsRes.data.deposits || []);
-        setWithdrawals(withdrawalsRes.data.withdrawals || []);
-        setInvestments(investmentsRes.data.investments || []);
-      } catch (error) {
-        console.error('Failed to fetch data:', error);
-      } finally {
-        setLoading(false);
-      }
-    };
-    fetchData();
-  }, [token]);
+  // The server merges deposits, withdrawals, investments and credits newest first, a page at a time
+  const feed = useCursorPages(`${API_URL}/transactions/feed`, 'transactions', { token });
+  const depositFeed = useCursorPages(`${API_URL}/transactions/feed`, 'transactions', { token, params: { types: 'deposit' } });
+  const withdrawalFeed = useCursorPages(`${API_URL}/transactions/feed`, 'transactions', { token, params: { types: 'withdrawal' } });
+  // The feed has no progress or earnings, so the investments tab reads the investment history
+  const investmentHistory = useCursorPages(`${API_URL}/investments/history`, 'investments', { token });
 
-  // Combine all transactions
-  const allTransactions = [
-    ...deposits.map(d => ({ ...d, type: 'deposit', icon: ArrowDownLeft, color: 'emerald' })),
-    ...withdrawals.map(w => ({ ...w, type: 'withdrawal', icon: ArrowUpRight, color: 'red' })),
-    ...investments.map(i => ({ ...i, type: 'investment', icon: TrendingUp, color: 'blue', amount: i.capital }))
-  ].sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+  const allTransactions = feed.items.map(tx => ({ ...tx, ...FEED_STYLES[tx.type] }));
+  const deposits = depositFeed.items;
+  const withdrawals = withdrawalFeed.items;
+  const investments = investmentHistory.items;
 
   return (
     <DashboardLayout>
@@ -111,8 +98,8 @@ export const TransactionsPage = () => {
                         </div>
                         <div className="text-right">
                           <div className={`font-heading font-bold ${
-                            tx.type === 'deposit' ? 'text-emerald-400' : 
-                            tx.type === 'withdrawal' ? 'text-red-400' : 'text-blue-400'
+                            tx.color === 'emerald' ? 'text-emerald-400' : 
+                            tx.color === 'red' ? 'text-red-400' : 'text-blue-400'
                           }`}>
                             {tx.type === 'withdrawal' ? '-' : '+'}{formatCurrency(tx.amount)}
                           </div>
@@ -124,6 +111,7 @@ export const TransactionsPage = () => {
                 ))}
               </div>
             )}
+            <LoadMoreButton pages={feed} testId="load-more-all" />
           </TabsContent>
 
           <TabsContent value="deposits" className="mt-6">
@@ -151,7 +139,7 @@ export const TransactionsPage = () => {
                           <td className="py-4 px-6 text-emerald-400 font-medium">{formatCurrency(deposit.amount)}</td>
                           <td className="py-4 px-6 text-slate-300">{new Date(deposit.created_at).toLocaleDateString()}</td>
                           <td className="py-4 px-6"><StatusBadge status={deposit.status} /></td>
-                          <td className="py-4 px-6 text-slate-400 text-sm">{deposit.admin_note || '-'}</td>
+                          <td className="py-4 px-6 text-slate-400 text-sm">{deposit.description || '-'}</td>
                         </tr>
                       ))}
                     </tbody>
@@ -159,6 +147,7 @@ export const TransactionsPage = () => {
                 </div>
               </Card>
             )}
+            <LoadMoreButton pages={depositFeed} testId="load-more-deposits" />
           </TabsContent>
 
           <TabsContent value="withdrawals" className="mt-6">
@@ -184,7 +173,7 @@ export const TransactionsPage = () => {
                       {withdrawals.map((withdrawal) => (
                         <tr key={withdrawal.id} className="border-b border-slate-800/50 hover:bg-slate-800/30">
                           <td className="py-4 px-6 text-red-400 font-medium">{formatCurrency(withdrawal.amount)}</td>
-                          <td className="py-4 px-6 text-slate-300">{withdrawal.bank_name}</td>
+                          <td className="py-4 px-6 text-slate-300">{withdrawal.description}</td>
                           <td className="py-4 px-6 text-slate-300">{new Date(withdrawal.created_at).toLocaleDateString()}</td>
                           <td className="py-4 px-6"><StatusBadge status={withdrawal.status} /></td>
                         </tr>
@@ -194,6 +183,7 @@ export const TransactionsPage = () => {
                 </div>
               </Card>
             )}
+            <LoadMoreButton pages={withdrawalFeed} testId="load-more-withdrawals" />
           </TabsContent>
 
           <TabsContent value="investments" className="mt-6">
@@ -231,6 +221,7 @@ export const TransactionsPage = () => {
                 </div>
               </Card>
             )}
+            <LoadMoreButton pages={investmentHistory} testId="load-more-investments" />
           </TabsContent>
         </Tabs>
       </div>
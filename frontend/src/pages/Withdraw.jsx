@@ -1,7 +1,8 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
 import { useAuth } from "../contexts/AuthContext";
-import { DashboardLayout } from "./Dashboard";
+import { useCursorPages } from "../hooks/use-cursor-pages";
+import { DashboardLayout, LoadMoreButton } from "./Dashboard";
 import { Button } from "../components/ui/button";
 import {
   Card,
@@ -83,7 +84,6 @@ const NIGERIAN_BANKS = [
 export const WithdrawPage = () => {
   const { token, user, refreshProfile } = useAuth();
   const [bankAccount, setBankAccount] = useState(null);
-  const [withdrawals, setWithdrawals] = useState([]);
   const [loading, setLoading] = useState(true);
   const [showBankModal, setShowBankModal] = useState(false);
   const [showWithdrawModal, setShowWithdrawModal] = useState(false);
@@ -94,20 +94,18 @@ export const WithdrawPage = () => {
   });
   const [withdrawAmount, setWithdrawAmount] = useState("");
   const [submitting, setSubmitting] = useState(false);
+  const history = useCursorPages(`${API_URL}/withdrawals/history`, "withdrawals", {
+    token,
+  });
+  const withdrawals = history.items;
 
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [bankRes, withdrawalsRes] = await Promise.all([
-          axios.get(`${API_URL}/user/bank-account`, {
-            headers: { Authorization: `Bearer ${token}` },
-          }),
-          axios.get(`${API_URL}/withdrawals/history`, {
-            headers: { Authorization: `Bearer ${token}` },
-          }),
-        ]);
+        const bankRes = await axios.get(`${API_URL}/user/bank-account`, {
+          headers: { Authorization: `Bearer ${token}` },
+        });
         setBankAccount(bankRes.data);
-        setWithdrawals(withdrawalsRes.data.withdrawals || []);
         if (bankRes.data) {
           setBankForm({
             bank_name: bankRes.data.bank_name,
@@ -183,10 +181,7 @@ export const WithdrawPage = () => {
       await refreshProfile();
 
       // Refresh withdrawals
-      const withdrawalsRes = await axios.get(`${API_URL}/withdrawals/history`, {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      setWithdrawals(withdrawalsRes.data.withdrawals || []);
+      await history.reload();
     } catch (error) {
       toast.error(
         error.response?.data?.detail || "Failed to submit withdrawal request",
@@ -359,6 +354,7 @@ export const WithdrawPage = () => {
               </div>
             </Card>
           )}
+          <LoadMoreButton pages={history} testId="load-more-withdrawals" />
         </div>
 
         {/* Bank Account Modal */}